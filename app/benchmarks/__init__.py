@@ -0,0 +1 @@
+# Convierte el directorio en un paquete de Python
@@ -0,0 +1,94 @@
+import os
+import sys
+import cv2
+import time
+import json
+import argparse
+import numpy as np
+
+# Permitir importar los módulos de la aplicación (core, engine) al ejecutar como script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import tracker
+from engine import infer_batch, read_batches, PLAYERS_MODEL_PATH, KEYPOINTS_MODEL_PATH
+
+"""
+Compara frames/seg de la inferencia por lotes frente al camino de una imagen a la vez.
+Uso:
+    python app/benchmarks/batch_inference.py resources/demo_1.mp4 --frames 200 --batch-sizes 1 4 8
+"""
+
+def run_inference(video_path, model_players, model_keypoints, batch_size, max_frames, p_conf, k_conf):
+    """
+    Ejecuta detección + tracking sobre los primeros frames del video con un tamaño de lote dado.
+    Args:
+        video_path: Ruta del video
+        model_players: Modelo YOLO de jugadores
+        model_keypoints: Modelo YOLO de keypoints
+        batch_size: Frames por llamada a los modelos
+        max_frames: Número de frames a procesar
+        p_conf: Confianza para jugadores
+        k_conf: Confianza para keypoints
+    Returns:
+        fps: Frames por segundo de la inferencia (sin decodificación)
+        ids_per_frame: Lista de IDs de tracking por frame (para verificar que coinciden)
+    """
+    cap = cv2.VideoCapture(video_path)
+    tot_nbr_frames = min(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), max_frames)
+    batches = list(read_batches(cap, tot_nbr_frames, batch_size)) # Decodificar antes de medir
+    cap.release()
+
+    players_tracker = tracker.create_tracker("botsort.yaml")
+    ids_per_frame = []
+    nbr_frames = 0
+    start_time = time.perf_counter()
+    for batch in batches:
+        for detections in infer_batch([frame for _, frame in batch], model_players, model_keypoints,
+                                      players_tracker, p_conf, k_conf):
+            ids_per_frame.append([int(i) for i in detections['ids_p']])
+            nbr_frames += 1
+    elapsed = time.perf_counter() - start_time
+    return nbr_frames / elapsed, ids_per_frame
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de inferencia por lotes.')
+    parser.add_argument('video', help='Ruta del video de entrada')
+    parser.add_argument('--frames', type=int, default=200, help='Número de frames a procesar')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8], help='Tamaños de lote a comparar')
+    parser.add_argument('--players-model', default=PLAYERS_MODEL_PATH)
+    parser.add_argument('--keypoints-model', default=KEYPOINTS_MODEL_PATH)
+    parser.add_argument('--p-conf', type=float, default=0.4)
+    parser.add_argument('--k-conf', type=float, default=0.7)
+    parser.add_argument('--json', default=None, help='Guardar resultados en un archivo JSON')
+    args = parser.parse_args(argv)
+
+    from ultralytics import YOLO
+    model_players = YOLO(args.players_model)
+    model_keypoints = YOLO(args.keypoints_model)
+
+    # Calentamiento para no medir la primera inferencia
+    warmup = np.zeros((640, 640, 3), dtype=np.uint8)
+    model_players.predict(warmup, verbose=False)
+    model_keypoints.predict(warmup, verbose=False)
+
+    results = {}
+    baseline_ids = None
+    for batch_size in args.batch_sizes:
+        fps, ids_per_frame = run_inference(args.video, model_players, model_keypoints, batch_size,
+                                           args.frames, args.p_conf, args.k_conf)
+        if baseline_ids is None:
+            baseline_ids = ids_per_frame
+        results[batch_size] = {'fps': fps, 'same_ids': ids_per_frame == baseline_ids}
+
+    baseline_fps = results[args.batch_sizes[0]]['fps']
+    print(f'{"lote":>6} {"fps":>8} {"speedup":>8} {"mismos IDs":>11}')
+    for batch_size, res in results.items():
+        print(f'{batch_size:>6} {res["fps"]:>8.2f} {res["fps"] / baseline_fps:>7.2f}x {str(res["same_ids"]):>11}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
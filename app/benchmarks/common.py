@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import timeit
+import platform
+import subprocess
+
+"""
+Utilidades comunes de los benchmarks: medición, formato JSON de resultados y comparación con una línea base.
+Formato de resultados:
+    {'environment': {...}, 'benchmarks': {nombre: {'value': float, 'unit': str, 'higher_is_better': bool, ...}}}
+"""
+
+def best_time(func, number, repeat=5):
+    """
+    Mejor tiempo medio por llamada (segundos) sobre varias repeticiones.
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+def environment_info():
+    """
+    Descripción de la máquina y del código medidos (para no comparar resultados de máquinas distintas sin saberlo).
+    """
+    import cv2
+    import numpy as np
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__
+    }
+
+def make_results(benchmarks):
+    """
+    Agrega la descripción del entorno a los resultados.
+    """
+    return {'environment': environment_info(), 'benchmarks': benchmarks}
+
+def save_results(results, path):
+    """
+    Guarda los resultados en un archivo JSON.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+def load_results(path):
+    """
+    Carga resultados (o una línea base) de un archivo JSON.
+    """
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def compare_with_baseline(results, baseline, tolerance=0.1):
+    """
+    Compara los resultados con una línea base y detecta regresiones.
+    Args:
+        results: Resultados actuales (ver make_results)
+        baseline: Resultados de referencia con el mismo formato
+        tolerance: Empeoramiento relativo permitido (0.1 = 10 %)
+    Returns:
+        comparison: Lista de diccionarios {'name', 'value', 'baseline', 'change', 'regression'} de los benchmarks comunes;
+            change es la mejora relativa (negativa si empeoró)
+    """
+    comparison = []
+    for name, bench in results['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if base is None or not base.get('value') or bench.get('value') is None:
+            continue
+        ratio = bench['value'] / base['value']
+        change = ratio - 1 if bench.get('higher_is_better') else 1 / ratio - 1
+        comparison.append({'name': name, 'value': bench['value'], 'baseline': base['value'], 'change': change,
+                           'regression': change < -tolerance})
+    return comparison
+
+def print_comparison(comparison, unit_width=12):
+    """
+    Imprime la comparación con la línea base.
+    Returns:
+        nbr_regressions: Número de regresiones
+    """
+    print(f'{"benchmark":<32} {"actual":>{unit_width}} {"base":>{unit_width}} {"cambio":>8}')
+    for row in comparison:
+        flag = '  REGRESIÓN' if row['regression'] else ''
+        print(f'{row["name"]:<32} {row["value"]:>{unit_width}.4g} {row["baseline"]:>{unit_width}.4g} {row["change"]:>+7.1%}{flag}')
+    return sum(row['regression'] for row in comparison)
+
+def finish(results, json_path=None, baseline_path=None, save_baseline_path=None, tolerance=0.1):
+    """
+    Cierre común de los scripts: guardar resultados, comparar con la línea base y devolver el código de salida.
+    Returns:
+        exit_code: 1 si hay regresiones respecto de la línea base, 0 en caso contrario
+    """
+    if json_path:
+        save_results(results, json_path)
+    if save_baseline_path:
+        save_results(results, save_baseline_path)
+        print(f'Línea base guardada en {save_baseline_path}')
+    if baseline_path:
+        if not os.path.isfile(baseline_path):
+            print(f'No existe la línea base {baseline_path}', file=sys.stderr)
+            return 0
+        nbr_regressions = print_comparison(compare_with_baseline(results, load_results(baseline_path), tolerance))
+        if nbr_regressions:
+            print(f'{nbr_regressions} regresión(es) de más del {tolerance:.0%}', file=sys.stderr)
+            return 1
+    return 0
@@ -0,0 +1,137 @@
+import os
+import sys
+import cv2
+import time
+import argparse
+
+# Permitir importar los módulos de la aplicación (core, engine) al ejecutar como script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import profiling
+from engine import process_video
+from benchmarks import common, stubs, synthetic
+
+"""
+Benchmark de extremo a extremo: frames/seg de engine.process_video sobre un video sintético
+con modelos simulados (o sobre un video real con detecciones grabadas), en varios escenarios.
+Los resultados se guardan en JSON y se comparan con una línea base para detectar regresiones.
+Uso:
+    python app/benchmarks/end_to_end.py --save-baseline ./cache/benchmarks/baseline.json
+    python app/benchmarks/end_to_end.py --baseline ./cache/benchmarks/baseline.json
+    python app/benchmarks/end_to_end.py --video partido.mp4 --record ./cache/benchmarks/partido  # con los modelos reales
+    python app/benchmarks/end_to_end.py --video partido.mp4 --replay ./cache/benchmarks/partido
+"""
+
+BENCHMARK_DIR = './cache/benchmarks/'
+
+# Escenarios: parámetros de process_video que se agregan a los comunes
+SCENARIOS = {
+    'secuencial': {'pipelined': False},
+    'pipeline': {},
+    'lote_4': {'batch_size': 4},
+    'keypoints_5': {'keypoints_interval': 5},
+    'submuestreo_3': {'frame_step': 3},
+    'equipos_auto': {'auto_teams': True}
+}
+
+def run_scenario(video_path, model_players, model_keypoints, params, max_frames=None, save_outputs=False):
+    """
+    Procesa el video con process_video y mide los frames por segundo y la latencia de cada etapa.
+    Args:
+        video_path: Ruta del video
+        model_players: Modelo (o sustituto) de jugadores
+        model_keypoints: Modelo (o sustituto) de keypoints
+        params: Parámetros adicionales de process_video
+        max_frames: Procesar solo los primeros frames (None: todo el video)
+        save_outputs: Si escribir los videos procesado y táctico (se eliminan al terminar)
+    Returns:
+        result: Diccionario {'fps', 'frames', 'elapsed_s', 'metrics'} (metrics: ver profiling.metrics_summary)
+    """
+    cap = cv2.VideoCapture(video_path)
+    tot_nbr_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    nbr_frames = min(tot_nbr_frames, max_frames) if max_frames else tot_nbr_frames
+    metrics = profiling.create_metrics()
+    start = time.perf_counter()
+    try:
+        names = process_video(cap, model_players, model_keypoints, {0: 0.4, 1: 0.7, 2: 7}, {0: 30, 1: 100, 2: 35},
+                              {0: False, 1: True, 2: True, 3: True}, output_file_name='benchmark_end_to_end',
+                              save_processed_separately=save_outputs, save_tactical_separately=save_outputs,
+                              video_path=video_path, frame_range=(1, nbr_frames), metrics=metrics, **params)
+    finally:
+        cap.release()
+    elapsed = time.perf_counter() - start
+    for name in names:
+        if name is not None and os.path.isfile(f'./outputs/{name}'):
+            os.remove(f'./outputs/{name}')
+    return {'fps': nbr_frames / elapsed, 'frames': nbr_frames, 'elapsed_s': elapsed, 'metrics': profiling.metrics_summary(metrics)}
+
+def _load_models(args):
+    # Sustitutos según el modo: verdad del video sintético, grabación o modelos reales grabando
+    if args.record:
+        from core import models
+        from engine import PLAYERS_MODEL_PATH, KEYPOINTS_MODEL_PATH
+        return (stubs.RecordingModel(models.load_model(args.players_model or PLAYERS_MODEL_PATH), record_conf=0.1),
+                stubs.RecordingModel(models.load_model(args.keypoints_model or KEYPOINTS_MODEL_PATH), record_conf=0.1))
+    latency = args.model_latency / 1000
+    if args.replay:
+        return (stubs.ReplayModel(f'{args.replay}_players.npz', latency),
+                stubs.ReplayModel(f'{args.replay}_keypoints.npz', latency))
+    scene = synthetic.load_scene(args.video)
+    return stubs.SyntheticModel(scene, 'players', latency), stubs.SyntheticModel(scene, 'keypoints', latency)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de extremo a extremo del pipeline (frames/seg).')
+    parser.add_argument('--video', default=None,
+                        help='Video de entrada (por defecto uno sintético en ./cache/benchmarks/, generado si no existe)')
+    parser.add_argument('--frames', type=int, default=300, help='Frames del video sintético / frames a procesar')
+    parser.add_argument('--size', type=int, nargs=2, metavar=('ANCHO', 'ALTO'), default=(1280, 720), help='Tamaño del video sintético')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS), help='Escenarios a medir')
+    parser.add_argument('--model-latency', type=float, default=0.0, metavar='MS',
+                        help='Latencia simulada de los modelos por imagen (ms), para emular el coste de la inferencia')
+    parser.add_argument('--outputs', action='store_true', help='Incluir la escritura de los videos de salida')
+    parser.add_argument('--record', default=None, metavar='PREFIJO',
+                        help='Ejecutar los modelos reales y grabar sus detecciones en PREFIJO_players.npz / PREFIJO_keypoints.npz')
+    parser.add_argument('--replay', default=None, metavar='PREFIJO', help='Reproducir detecciones grabadas con --record')
+    parser.add_argument('--players-model', default=None, help='Pesos del modelo de jugadores (con --record)')
+    parser.add_argument('--keypoints-model', default=None, help='Pesos del modelo de keypoints (con --record)')
+    parser.add_argument('--json', default=None, help='Guardar resultados en un archivo JSON')
+    parser.add_argument('--baseline', default=None, help='Comparar con una línea base JSON (código de salida 1 si hay regresiones)')
+    parser.add_argument('--save-baseline', default=None, help='Guardar los resultados como línea base')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Pérdida relativa de frames/seg permitida frente a la línea base')
+    args = parser.parse_args(argv)
+
+    if args.video is None:
+        args.video = os.path.join(BENCHMARK_DIR, f'synthetic_{args.frames}_{args.size[0]}x{args.size[1]}.mp4')
+        if not os.path.isfile(args.video) or not os.path.isfile(f'{args.video}.npz'):
+            print(f'Generando video sintético {args.video}...')
+            synthetic.make_synthetic_video(args.video, args.frames, *args.size)
+    model_players, model_keypoints = _load_models(args)
+    scenarios = ['pipeline'] if args.record else args.scenarios # Grabar una vez basta para todos los escenarios
+
+    # Calentamiento (importaciones, tracker, primeras asignaciones) fuera de la medición
+    run_scenario(args.video, model_players, model_keypoints, {}, max_frames=10)
+
+    benchmarks = {}
+    print(f'{"escenario":<16} {"frames":>7} {"tiempo (s)":>11} {"fps":>8}')
+    for name in scenarios:
+        result = run_scenario(args.video, model_players, model_keypoints, SCENARIOS[name], args.frames, args.outputs)
+        benchmarks[f'fps_{name}'] = {'value': result['fps'], 'unit': 'frames/s', 'higher_is_better': True,
+                                     'frames': result['frames'], 'elapsed_s': result['elapsed_s'], 'params': SCENARIOS[name],
+                                     'stages': result['metrics']['stages'], 'homography': result['metrics']['homography'],
+                                     'peak_rss_bytes': result['metrics']['peak_rss_bytes']}
+        print(f'{name:<16} {result["frames"]:>7} {result["elapsed_s"]:>11.2f} {result["fps"]:>8.2f}')
+
+    if args.record:
+        model_players.save(f'{args.record}_players.npz')
+        model_keypoints.save(f'{args.record}_keypoints.npz')
+        print(f'Detecciones grabadas en {args.record}_players.npz y {args.record}_keypoints.npz')
+    elif args.replay and (model_players.nbr_missing or model_keypoints.nbr_missing):
+        print(f'Aviso: {model_players.nbr_missing + model_keypoints.nbr_missing} imágenes sin detecciones grabadas', file=sys.stderr)
+
+    results = common.make_results(benchmarks)
+    results['video'] = {'path': args.video, 'model_latency_ms': args.model_latency,
+                        'mode': 'record' if args.record else 'replay' if args.replay else 'synthetic'}
+    return common.finish(results, args.json, args.baseline, args.save_baseline, args.tolerance)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Permitir importar los módulos de la aplicación (core, engine) al ejecutar como script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import annotations, balltrack, config, homography, output, prediction
+from engine import COLOR_RGB_MAP, PLAYER_COLORS_LIST, load_tactical_map
+from benchmarks import common, synthetic
+
+"""
+Microbenchmarks de las funciones por frame del pipeline sobre un frame sintético realista
+(22 jugadores, árbitro, balón y keypoints visibles): transform_points, calculate_homography,
+update_ball_track, annotate_frame, annotate_tactical_map, combine_frames, extract_player_palettes
+y los escritores de video de core.output.
+Uso:
+    python app/benchmarks/micro.py --json micro.json --baseline micro_base.json
+"""
+
+def _frame_inputs(width, height):
+    # Entradas de un frame sintético, con la forma que tienen dentro de engine.process_video
+    scene = synthetic.synthetic_scene(1, width, height)
+    tac_map = load_tactical_map()
+    frame = synthetic.render_frame(scene, 0, tac_map)
+    keypoints_map_pos, classes_names_dic, labels_dic = config.get_labels_dics()
+    keypoints_dst = config.get_keypoints_map_array(keypoints_map_pos, classes_names_dic)
+
+    players = scene['players'][0]
+    bboxes_p, confs_p, labels_p = players[:, :4].astype(np.float64), players[:, 4], players[:, 5].astype(int)
+    keypoints = scene['keypoints'][0]
+    bboxes_k, labels_k = keypoints[:, :4], keypoints[:, 5].astype(int)
+    bboxes_k_c = np.column_stack([(bboxes_k[:, :2] + bboxes_k[:, 2:]) / 2, bboxes_k[:, 2:] - bboxes_k[:, :2]])
+    keypoints_src, keypoints_mask = homography.keypoints_to_slots(labels_k, bboxes_k_c, len(keypoints_dst))
+    homog = np.linalg.inv(scene['homographies'][0]) # Frame -> mapa, como la calculada por el pipeline
+
+    feet = np.column_stack([(bboxes_p[:, 0] + bboxes_p[:, 2]) / 2, bboxes_p[:, 3]])
+    is_player = labels_p == synthetic.PLAYER
+    colors_dic = {f"{i}": [COLOR_RGB_MAP[PLAYER_COLORS_LIST[i]]] for i in range(len(PLAYER_COLORS_LIST))}
+    return {
+        'frame': frame, 'tac_map': tac_map, 'labels_dic': labels_dic, 'keypoints_dst': keypoints_dst,
+        'bboxes_p': bboxes_p, 'confs_p': confs_p, 'labels_p': labels_p, 'bboxes_k': bboxes_k,
+        'keypoints_src': keypoints_src, 'keypoints_mask': keypoints_mask, 'homog': homog,
+        'feet': feet[is_player], 'ball_src': feet[labels_p == synthetic.BALL][0],
+        'players_teams_list': [i % 2 for i in range(len(bboxes_p))], 'player_ids': list(range(1, len(bboxes_p) + 1)),
+        'colors_dic': colors_dic
+    }
+
+def _bench_writers(inputs, nbr_frames, repeat):
+    # Tiempo por frame de cada escritor de core.output (archivos temporales en ./outputs/, eliminados al terminar)
+    frame, tac_map = inputs['frame'], inputs['tac_map']
+    final_img = annotations.combine_frames(frame, tac_map, False, None, None)
+    writers = {'write_processed_video': (output.write_processed_video, frame, 'processed'),
+               'write_tactical_video': (output.write_tactical_video, tac_map, 'tactical'),
+               'write_combined_video': (output.write_combined_video, final_img, 'combined')}
+    os.makedirs('./outputs/', exist_ok=True)
+    benchmarks = {}
+    for name, (write, image, suffix) in writers.items():
+        path = f'./outputs/benchmark_micro_{suffix}.mp4'
+        best, opened = None, False
+        for _ in range(repeat):
+            writer = write(None, image, 'benchmark_micro', 25.0, True) # El primer frame crea el VideoWriter
+            opened = writer.isOpened()
+            start = time.perf_counter()
+            for _ in range(nbr_frames):
+                writer = write(writer, image, 'benchmark_micro', 25.0, True)
+            elapsed = (time.perf_counter() - start) / nbr_frames
+            writer.release()
+            best = elapsed if best is None else min(best, elapsed)
+        if os.path.isfile(path):
+            os.remove(path)
+        # Sin el códec (avc1) el VideoWriter no se abre y la escritura no hace nada: no hay medición
+        benchmarks[name] = {'value': best if opened else None, 'unit': 's', 'higher_is_better': False}
+    return benchmarks
+
+def run_microbenchmarks(width=1280, height=720, repeat=5, writer_frames=50):
+    """
+    Ejecuta todos los microbenchmarks.
+    Args:
+        width: Ancho del frame sintético
+        height: Alto del frame sintético
+        repeat: Repeticiones de cada medición (se toma la mejor)
+        writer_frames: Frames escritos por repetición en los benchmarks de escritores
+    Returns:
+        benchmarks: Diccionario nombre -> {'value' (segundos por llamada), 'unit', 'higher_is_better'}
+    """
+    inputs = _frame_inputs(width, height)
+    frame, tac_map = inputs['frame'], inputs['tac_map']
+    ball_dst = homography.transform_points(inputs['homog'], inputs['ball_src'][None])[0]
+    ball_track = balltrack.create_ball_track(35)
+    annotated_buffer = np.empty_like(frame)
+    tac_canvas = tac_map.copy()
+    compositor = annotations.create_compositor(frame.shape, tac_map.shape)
+    palettes = prediction.extract_player_palettes(frame, inputs['bboxes_p'], inputs['labels_p'], 3)
+    pred_dst_pts = homography.transform_points(inputs['homog'], inputs['feet'])
+
+    cases = {
+        'transform_points': (lambda: homography.transform_points(inputs['homog'], inputs['feet']), 2000),
+        'calculate_homography': (lambda: homography.calculate_homography(
+            inputs['keypoints_src'], inputs['keypoints_mask'], inputs['keypoints_dst']), 200),
+        'update_ball_track': (lambda: balltrack.update_ball_track(ball_track, inputs['ball_src'], ball_dst, inputs['homog'],
+                                                                  100, 30), 2000),
+        'annotate_frame': (lambda: annotations.annotate_frame(
+            frame, inputs['bboxes_p'], inputs['labels_p'], inputs['confs_p'], inputs['players_teams_list'],
+            inputs['colors_dic'], palettes, inputs['labels_dic'], True, True, True, inputs['bboxes_k'],
+            out=annotated_buffer), 50),
+        'annotate_tactical_map': (lambda: annotations.annotate_tactical_map(
+            tac_canvas, pred_dst_pts, ball_dst, inputs['players_teams_list'], inputs['colors_dic'], inputs['player_ids']), 200),
+        'combine_frames': (lambda: annotations.combine_frames(frame, tac_map, False, None, None), 50),
+        'combine_frames_compositor': (lambda: annotations.combine_frames(
+            frame, tac_map, False, None, None, annotations.next_composite(compositor)), 50),
+        'extract_player_palettes': (lambda: prediction.extract_player_palettes(
+            frame, inputs['bboxes_p'], inputs['labels_p'], 3), 20)
+    }
+    benchmarks = {}
+    for name, (func, number) in cases.items():
+        benchmarks[name] = {'value': common.best_time(func, number, repeat), 'unit': 's', 'higher_is_better': False}
+    benchmarks.update(_bench_writers(inputs, writer_frames, repeat))
+    return benchmarks
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Microbenchmarks de las funciones por frame del pipeline.')
+    parser.add_argument('--size', type=int, nargs=2, metavar=('ANCHO', 'ALTO'), default=(1280, 720), help='Tamaño del frame')
+    parser.add_argument('--repeat', type=int, default=5, help='Repeticiones de cada medición')
+    parser.add_argument('--json', default=None, help='Guardar resultados en un archivo JSON')
+    parser.add_argument('--baseline', default=None, help='Comparar con una línea base JSON (código de salida 1 si hay regresiones)')
+    parser.add_argument('--save-baseline', default=None, help='Guardar los resultados como línea base')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Empeoramiento relativo permitido frente a la línea base')
+    args = parser.parse_args(argv)
+
+    benchmarks = run_microbenchmarks(*args.size, repeat=args.repeat)
+    print(f'{"función":<28} {"µs/llamada":>12}')
+    for name, bench in benchmarks.items():
+        if bench['value'] is None:
+            print(f'{name:<28} {"n/d":>12}  (VideoWriter sin abrir: códec no disponible)')
+        else:
+            print(f'{name:<28} {bench["value"] * 1e6:>12.1f}')
+    return common.finish(common.make_results(benchmarks), args.json, args.baseline, args.save_baseline, args.tolerance)
+
+if __name__ == '__main__':
+    sys.exit(main())
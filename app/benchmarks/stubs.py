@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import numpy as np
+
+# Permitir importar los módulos de la aplicación (core, engine) al ejecutar como script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import decode_frame_index
+
+"""
+Sustitutos de model_players y model_keypoints para medir el pipeline sin los pesos entrenados.
+Exponen la misma interfaz que usa engine.infer_batch (predict y llamada directa con listas de imágenes)
+y devuelven objetos Results de Ultralytics, por lo que el tracker y el resto del pipeline no cambian.
+- SyntheticModel: devuelve la verdad de un video sintético (ver synthetic.py), con una latencia simulada opcional.
+- RecordingModel: envuelve un modelo real y graba sus detecciones por imagen.
+- ReplayModel: reproduce una grabación de RecordingModel sin el modelo.
+"""
+
+def _view_origin(image):
+    # Imagen original y posición (x, y) de un recorte hecho por slicing (p. ej. la ventana del balón o el campo)
+    root = image
+    while isinstance(root.base, np.ndarray):
+        root = root.base
+    if root is image or root.ndim != image.ndim:
+        return image, 0, 0
+    offset = image.__array_interface__['data'][0] - root.__array_interface__['data'][0]
+    y, remainder = divmod(offset, root.strides[0])
+    return root, int(remainder // root.strides[1]), int(y)
+
+def _filter(data, conf, classes):
+    keep = data[:, 4] >= (conf if conf is not None else 0.25)
+    if classes is not None:
+        keep &= np.isin(data[:, 5], classes)
+    return data[keep]
+
+def make_results(image, data, names):
+    """
+    Construye un Results de Ultralytics a partir de cajas [x1, y1, x2, y2, conf, clase].
+    Args:
+        image: Imagen de entrada (orig_img del resultado)
+        data: Array (N,6)
+        names: Diccionario de nombres de clases
+    Returns:
+        result: ultralytics.engine.results.Results
+    """
+    import torch
+    from ultralytics.engine.results import Results
+    return Results(image, path='', names=names, boxes=torch.from_numpy(np.ascontiguousarray(data, dtype=np.float32)))
+
+class SyntheticModel:
+    """
+    Modelo simulado que devuelve la verdad de la escena de un video sintético.
+    El frame se identifica por su código de barras; los recortes (ventana del balón, rectángulo del campo)
+    se ubican en su frame a partir de la memoria compartida con él.
+    """
+    def __init__(self, scene, kind, latency=0.0):
+        """
+        Args:
+            scene: Escena del video (ver synthetic.load_scene)
+            kind: 'players' o 'keypoints'
+            latency: Segundos simulados de inferencia por imagen (libera el GIL como la inferencia real)
+        """
+        self.scene = scene
+        self.kind = kind
+        self.names = scene[f'{kind}_names']
+        self.latency = latency
+        self.nbr_images = 0
+
+    def predict(self, source, conf=None, classes=None, imgsz=None, verbose=False, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        if self.latency:
+            time.sleep(self.latency * len(images))
+        self.nbr_images += len(images)
+        return [self._result(image, conf, classes) for image in images]
+
+    __call__ = predict
+
+    def _result(self, image, conf, classes):
+        root, x, y = _view_origin(image)
+        data = self.scene[self.kind][decode_frame_index(root)].copy()
+        data[:, [0, 2]] -= x
+        data[:, [1, 3]] -= y
+        height, width = image.shape[:2]
+        data[:, [0, 2]] = np.clip(data[:, [0, 2]], 0, width)
+        data[:, [1, 3]] = np.clip(data[:, [1, 3]], 0, height)
+        visible = (data[:, 2] - data[:, 0] >= 2) & (data[:, 3] - data[:, 1] >= 2) # Dentro de la imagen
+        return make_results(image, _filter(data[visible], conf, classes), self.names)
+
+def image_digest(image):
+    """
+    Huella del contenido de una imagen (clave de las grabaciones).
+    """
+    image = np.ascontiguousarray(image)
+    return hashlib.sha1(image.data).hexdigest() + 'x'.join(map(str, image.shape))
+
+class RecordingModel:
+    """
+    Envuelve un modelo YOLO real y graba las detecciones de cada imagen para reproducirlas con ReplayModel.
+    Grabar con un umbral de confianza bajo permite reproducir luego cualquier umbral mayor.
+    """
+    def __init__(self, model, record_conf=None):
+        """
+        Args:
+            model: Modelo YOLO
+            record_conf: Umbral con el que se ejecuta el modelo al grabar (None: el de cada llamada)
+        """
+        self.model = model
+        self.record_conf = record_conf
+        self.names = model.names
+        self.recording = {}
+
+    def predict(self, source, conf=None, classes=None, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        record_conf = self.record_conf if self.record_conf is not None else conf
+        if record_conf is not None:
+            kwargs['conf'] = record_conf
+        results = self.model.predict(images, **kwargs) # Todas las clases: el filtro se aplica al reproducir
+        for image, result in zip(images, results):
+            self.recording[image_digest(image)] = result.boxes.data.cpu().numpy()[:, :6].astype(np.float32)
+        return [make_results(image, _filter(self.recording[image_digest(image)], conf, classes), self.names)
+                for image in images]
+
+    __call__ = predict
+
+    def save(self, path):
+        """
+        Guarda la grabación en un archivo .npz.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez_compressed(path, names=json.dumps({int(k): v for k, v in self.names.items()}), **self.recording)
+
+class ReplayModel:
+    """
+    Reproduce las detecciones grabadas con RecordingModel; una imagen no grabada no tiene detecciones.
+    """
+    def __init__(self, path, latency=0.0):
+        """
+        Args:
+            path: Grabación .npz
+            latency: Segundos simulados de inferencia por imagen
+        """
+        with np.load(path) as data:
+            self.names = {int(k): v for k, v in json.loads(str(data['names'])).items()}
+            self.recording = {key: data[key] for key in data.files if key != 'names'}
+        self.latency = latency
+        self.nbr_missing = 0
+
+    def predict(self, source, conf=None, classes=None, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        if self.latency:
+            time.sleep(self.latency * len(images))
+        results = []
+        for image in images:
+            data = self.recording.get(image_digest(image))
+            if data is None:
+                self.nbr_missing += 1
+                data = np.zeros((0, 6), dtype=np.float32)
+            results.append(make_results(image, _filter(data, conf, classes), self.names))
+        return results
+
+    __call__ = predict
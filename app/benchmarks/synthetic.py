@@ -0,0 +1,220 @@
+import os
+import sys
+import cv2
+import argparse
+import numpy as np
+
+# Permitir importar los módulos de la aplicación (core, engine) al ejecutar como script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import config
+from engine import load_tactical_map
+
+"""
+Generador de videos sintéticos de un partido: el mapa táctico visto por una cámara que se desplaza,
+con jugadores, árbitro y balón en movimiento. Junto al video se guarda la verdad de cada frame
+(cajas de jugadores y keypoints) para los modelos simulados de benchmarks/stubs.py.
+Cada frame lleva su número codificado en un código de barras en la esquina superior izquierda.
+Uso:
+    python app/benchmarks/synthetic.py ./cache/benchmarks/synthetic.mp4 --frames 300
+"""
+
+BARCODE_BITS = 16 # Bits del número de frame (hasta 65535 frames)
+BARCODE_BLOCK = 8 # Lado (píxeles) de cada bit
+
+# Clases del modelo de jugadores (ver config/players_dataset.yaml)
+PLAYER, REFEREE, BALL = 0, 1, 2
+# Colores (BGR) de camiseta: equipo 1, equipo 2, porteros y árbitro
+_KIT_COLORS = [(40, 40, 220), (220, 120, 30), (30, 220, 220), (200, 60, 200), (20, 20, 20)]
+
+def encode_frame_index(frame, frame_idx):
+    """
+    Dibuja el número de frame como código de barras (bloques blancos y negros) en la esquina superior izquierda.
+    """
+    for bit in range(BARCODE_BITS):
+        value = 255 if (frame_idx >> bit) & 1 else 0
+        frame[:BARCODE_BLOCK, bit * BARCODE_BLOCK:(bit + 1) * BARCODE_BLOCK] = value
+
+def decode_frame_index(frame):
+    """
+    Lee el número de frame del código de barras (robusto a la compresión del video).
+    Args:
+        frame: Frame completo del video sintético
+    Returns:
+        frame_idx: Índice del frame (desde 0)
+    """
+    blocks = frame[:BARCODE_BLOCK, :BARCODE_BITS * BARCODE_BLOCK].reshape(BARCODE_BLOCK, BARCODE_BITS, -1)
+    bits = blocks.mean(axis=(0, 2)) > 127
+    return int(np.sum(bits.astype(np.int64) << np.arange(BARCODE_BITS)))
+
+def _camera_homography(frame_idx, nbr_frames, width, height, map_shape):
+    # Cámara que recorre el campo a lo largo (vertical en el mapa) con un poco de perspectiva;
+    # devuelve la homografía mapa -> frame y el punto del mapa al que apunta
+    map_height, map_width = map_shape[:2]
+    view_height = 0.5 * map_height
+    phase = 0.5 - 0.5 * np.cos(2 * np.pi * frame_idx / max(1, nbr_frames))
+    center_y = view_height / 2 + phase * (map_height - view_height)
+    center_x = map_width / 2 + 0.05 * map_width * np.sin(2 * np.pi * frame_idx / 150)
+    far_half, near_half = 0.65 * map_width, 0.5 * map_width
+    map_quad = np.float32([[center_x - far_half, center_y - view_height / 2], [center_x + far_half, center_y - view_height / 2],
+                           [center_x + near_half, center_y + view_height / 2], [center_x - near_half, center_y + view_height / 2]])
+    frame_quad = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    return cv2.getPerspectiveTransform(map_quad, frame_quad), np.array([center_x, center_y])
+
+def _project(homog, points):
+    points = cv2.perspectiveTransform(np.asarray(points, dtype=np.float64).reshape(-1, 1, 2), homog)
+    return points.reshape(-1, 2)
+
+def synthetic_scene(nbr_frames=300, width=1280, height=720, nbr_players=22, seed=0):
+    """
+    Simula la verdad de un partido: homografía de cámara y cajas de jugadores, árbitro, balón y keypoints por frame.
+    Args:
+        nbr_frames: Número de frames
+        width: Ancho del frame
+        height: Alto del frame
+        nbr_players: Jugadores en el campo (incluidos los dos porteros)
+        seed: Semilla del movimiento
+    Returns:
+        scene: Diccionario con 'homographies' (mapa -> frame), 'players' y 'keypoints' (listas por frame de
+            arrays (N,6) [x1, y1, x2, y2, conf, clase]), 'teams' (equipo de cada objeto de 'players') y los nombres de clases
+    """
+    rng = np.random.default_rng(seed)
+    tac_map = load_tactical_map()
+    keypoints_map_pos, classes_names_dic, labels_dic = config.get_labels_dics()
+    keypoints_dst = config.get_keypoints_map_array(keypoints_map_pos, classes_names_dic)
+    map_height, map_width = tac_map.shape[:2]
+
+    # Trayectorias suaves en el mapa: posición base + oscilaciones de frecuencia y fase aleatorias
+    nbr_objects = nbr_players + 2 # + árbitro y balón
+    base = np.column_stack([rng.uniform(40, map_width - 40, nbr_objects), rng.uniform(40, map_height - 40, nbr_objects)])
+    amplitude = rng.uniform(10, 60, (nbr_objects, 2))
+    amplitude[-1] = [0.3 * map_width, 0.15 * map_height] # El balón se mueve más
+    freq = rng.uniform(0.2, 1.0, (nbr_objects, 2)) * 2 * np.pi / 250
+    phase = rng.uniform(0, 2 * np.pi, (nbr_objects, 2))
+    classes = np.array([PLAYER] * nbr_players + [REFEREE, BALL])
+    teams = np.array([k % 2 for k in range(nbr_players)] + [4, -1])
+    teams[:2] += 2 # Porteros
+    confs = rng.uniform(0.6, 0.95, nbr_objects)
+
+    scene = {'width': width, 'height': height, 'nbr_frames': nbr_frames, 'homographies': [], 'players': [], 'keypoints': [],
+             'teams': teams, 'players_names': labels_dic, 'keypoints_names': classes_names_dic}
+    for frame_idx in range(nbr_frames):
+        homog, camera_center = _camera_homography(frame_idx, nbr_frames, width, height, tac_map.shape)
+        pos = base + amplitude * np.sin(freq * frame_idx + phase)
+        pos[-1] += camera_center - base[-1] # La cámara sigue al balón
+        pos = np.clip(pos, [5, 5], [map_width - 5, map_height - 5])
+        feet = _project(homog, pos)
+        # Tamaño aparente: escala local de la homografía alrededor de cada posición
+        scale = np.linalg.norm(_project(homog, pos + [4.0, 0.0]) - feet, axis=1)
+        box_height = np.where(classes == BALL, 0.6, 5.0) * scale
+        box_width = np.where(classes == BALL, 0.6, 2.0) * scale
+        boxes = np.column_stack([feet[:, 0] - box_width / 2, feet[:, 1] - box_height,
+                                 feet[:, 0] + box_width / 2, feet[:, 1]])
+        boxes[classes == BALL, 1::2] += box_height[classes == BALL, None] / 2
+        scene['players'].append(np.column_stack([boxes, confs, classes]).astype(np.float32))
+
+        keypoints = _project(homog, keypoints_dst)
+        keypoints_boxes = np.column_stack([keypoints - 6, keypoints + 6, np.full(len(keypoints), 0.9), np.arange(len(keypoints))])
+        visible = (keypoints[:, 0] >= 0) & (keypoints[:, 0] < width) & (keypoints[:, 1] >= 0) & (keypoints[:, 1] < height)
+        scene['keypoints'].append(keypoints_boxes[visible].astype(np.float32))
+        scene['homographies'].append(homog)
+    return scene
+
+def render_frame(scene, frame_idx, tac_map=None):
+    """
+    Dibuja un frame del video sintético: el mapa táctico en perspectiva, los jugadores y el balón.
+    Args:
+        scene: Escena de synthetic_scene
+        frame_idx: Índice del frame
+        tac_map: Imagen del mapa táctico (por defecto la de la aplicación)
+    Returns:
+        frame: Imagen BGR (height, width, 3)
+    """
+    tac_map = load_tactical_map() if tac_map is None else tac_map
+    frame = cv2.warpPerspective(tac_map, scene['homographies'][frame_idx], (scene['width'], scene['height']),
+                                borderMode=cv2.BORDER_CONSTANT, borderValue=(60, 140, 60))
+    players = scene['players'][frame_idx]
+    for (x1, y1, x2, y2, _, cls), team in zip(players, scene['teams']):
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        if cls == BALL:
+            cv2.circle(frame, ((x1 + x2) // 2, (y1 + y2) // 2), max(2, (x2 - x1) // 2), (255, 255, 255), -1)
+            continue
+        shirt_bottom = y1 + int(0.55 * (y2 - y1))
+        cv2.rectangle(frame, (x1, y1), (x2, shirt_bottom), _KIT_COLORS[team], -1) # Camiseta
+        cv2.rectangle(frame, (x1, shirt_bottom), (x2, y2), (235, 235, 235) if team % 2 else (30, 30, 30), -1) # Pantalón
+    encode_frame_index(frame, frame_idx)
+    return frame
+
+def make_synthetic_video(path, nbr_frames=300, width=1280, height=720, fps=25.0, seed=0):
+    """
+    Genera un video sintético y guarda su escena (verdad de cada frame) en <path>.npz.
+    Args:
+        path: Ruta del video de salida (.mp4 con mp4v, .avi con MJPG)
+        nbr_frames: Número de frames
+        width: Ancho
+        height: Alto
+        fps: FPS del video
+        seed: Semilla del movimiento
+    Returns:
+        scene: Escena del video (ver synthetic_scene)
+    """
+    if nbr_frames >= 1 << BARCODE_BITS:
+        raise ValueError(f'Como máximo {(1 << BARCODE_BITS) - 1} frames')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    scene = synthetic_scene(nbr_frames, width, height, seed=seed)
+    tac_map = load_tactical_map()
+    fourcc = cv2.VideoWriter_fourcc(*('MJPG' if path.lower().endswith('.avi') else 'mp4v'))
+    writer = cv2.VideoWriter(path, fourcc, fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f'No se pudo crear el video: {path}')
+    try:
+        for frame_idx in range(nbr_frames):
+            writer.write(render_frame(scene, frame_idx, tac_map))
+    finally:
+        writer.release()
+    save_scene(scene, f'{path}.npz')
+    return scene
+
+def save_scene(scene, path):
+    """
+    Guarda una escena en un archivo .npz (listas por frame concatenadas con sus desplazamientos).
+    """
+    np.savez_compressed(
+        path, width=scene['width'], height=scene['height'], nbr_frames=scene['nbr_frames'],
+        homographies=np.array(scene['homographies']), teams=scene['teams'],
+        players=np.concatenate(scene['players']), players_offsets=np.cumsum([0] + [len(p) for p in scene['players']]),
+        keypoints=np.concatenate(scene['keypoints']), keypoints_offsets=np.cumsum([0] + [len(k) for k in scene['keypoints']]))
+
+def load_scene(path):
+    """
+    Carga la escena de un video sintético (ruta del video o del .npz).
+    Returns:
+        scene: Escena con la misma estructura que synthetic_scene
+    """
+    path = path if path.endswith('.npz') else f'{path}.npz'
+    _, classes_names_dic, labels_dic = config.get_labels_dics()
+    with np.load(path) as data:
+        def split(name):
+            offsets = data[f'{name}_offsets']
+            return [data[name][offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        return {'width': int(data['width']), 'height': int(data['height']), 'nbr_frames': int(data['nbr_frames']),
+                'homographies': list(data['homographies']), 'teams': data['teams'],
+                'players': split('players'), 'keypoints': split('keypoints'),
+                'players_names': labels_dic, 'keypoints_names': classes_names_dic}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Genera un video sintético de partido con su verdad por frame.')
+    parser.add_argument('output', help='Ruta del video de salida (.mp4 o .avi)')
+    parser.add_argument('--frames', type=int, default=300, help='Número de frames')
+    parser.add_argument('--size', type=int, nargs=2, metavar=('ANCHO', 'ALTO'), default=(1280, 720), help='Tamaño del frame')
+    parser.add_argument('--fps', type=float, default=25.0, help='FPS del video')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla del movimiento')
+    args = parser.parse_args(argv)
+
+    scene = make_synthetic_video(args.output, args.frames, *args.size, fps=args.fps, seed=args.seed)
+    nbr_keypoints = [len(keypoints) for keypoints in scene['keypoints']]
+    print(f'{args.output}: {args.frames} frames, keypoints visibles por frame {min(nbr_keypoints)}-{max(nbr_keypoints)}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
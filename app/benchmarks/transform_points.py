@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import timeit
+import argparse
+import numpy as np
+
+# Permitir importar los módulos de la aplicación (core) al ejecutar como script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import homography
+
+"""
+Microbenchmarks de homography.transform_points (1, 22 y 10⁶ puntos) y de transform_points_bulk.
+Uso:
+    python app/benchmarks/transform_points.py
+"""
+
+HOMOG = np.array([[2.0, 0.1, 30.0], [0.05, 1.2, 20.0], [0.0001, 0.0002, 1.0]])
+
+def transform_points_loop(homog, points):
+    """
+    Implementación anterior punto a punto (referencia para comparar).
+    """
+    transformed_points = []
+    for pt in points:
+        pt_homog = np.append(np.array(pt), np.array([1]), axis=0)
+        dest_point = np.matmul(homog, np.transpose(pt_homog))
+        dest_point = dest_point / dest_point[2]
+        transformed_points.append(list(np.transpose(dest_point)[:2]))
+    return np.array(transformed_points)
+
+def best_time(func, number, repeat=5):
+    """
+    Mejor tiempo medio por llamada (segundos) sobre varias repeticiones.
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Microbenchmarks de transform_points.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 22, 1_000_000], help='Números de puntos')
+    parser.add_argument('--frames', type=int, default=135_000, help='Frames (homografías) para el caso bulk')
+    parser.add_argument('--json', default=None, help='Guardar resultados en un archivo JSON')
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    results = {}
+    print(f'{"puntos":>9} {"bucle (s)":>12} {"vectorizado (s)":>16} {"con out (s)":>12} {"speedup":>9}')
+    for size in args.sizes:
+        points = rng.uniform(0, 1280, (size, 2))
+        out = np.empty((size, 2))
+        number = max(1, 20_000 // size)
+        loop_time = best_time(lambda: transform_points_loop(HOMOG, points), number, repeat=1 if size > 10_000 else 5)
+        vec_time = best_time(lambda: homography.transform_points(HOMOG, points), number * 10)
+        out_time = best_time(lambda: homography.transform_points(HOMOG, points, out=out), number * 10)
+        results[size] = {'loop': loop_time, 'vectorized': vec_time, 'out': out_time}
+        print(f'{size:>9} {loop_time:>12.3e} {vec_time:>16.3e} {out_time:>12.3e} {loop_time / out_time:>8.1f}x')
+
+    # Re-proyección de un partido completo: 22 jugadores por frame, una homografía por frame
+    homogs = HOMOG * rng.uniform(0.99, 1.01, (args.frames, 3, 3))
+    frame_idx = np.repeat(np.arange(args.frames), 22)
+    points = rng.uniform(0, 1280, (frame_idx.shape[0], 2))
+    out = np.empty_like(points)
+    bulk_time = best_time(lambda: homography.transform_points_bulk(homogs, points, frame_idx, out=out), 1, repeat=3)
+    results['bulk'] = {'frames': args.frames, 'points': int(points.shape[0]), 'time': bulk_time}
+    print(f'bulk: {points.shape[0]} puntos en {args.frames} frames -> {bulk_time:.3f} s '
+          f'({points.shape[0] / bulk_time / 1e6:.1f} M puntos/s)')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
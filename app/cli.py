@@ -0,0 +1,203 @@
+import sys
+import cv2
+import time
+import argparse
+import json
+from core import cache, config, models, profiling
+from engine import process_video, PLAYERS_MODEL_PATH, KEYPOINTS_MODEL_PATH, DETECTION_CACHE_DIR, MODEL_EXPORT_DIR
+
+"""
+Punto de entrada de línea de comandos para procesar videos sin Streamlit.
+Uso:
+    python app/cli.py resources/demo_1.mp4 --output-name demo --combined
+"""
+
+def parse_args(argv=None):
+    """
+    Define y analiza los argumentos de la línea de comandos.
+    Args:
+        argv: Lista de argumentos (por defecto sys.argv[1:])
+    Returns:
+        args: Namespace con los argumentos
+    """
+    parser = argparse.ArgumentParser(description='Detección y mapa táctico de videos de fútbol sin interfaz.')
+    parser.add_argument('video', help='Ruta del video de entrada')
+    parser.add_argument('--output-name', default=None, help='Nombre base de los archivos de salida en ./outputs/')
+    parser.add_argument('--players-model', default=PLAYERS_MODEL_PATH, help='Pesos del modelo de jugadores')
+    parser.add_argument('--keypoints-model', default=KEYPOINTS_MODEL_PATH, help='Pesos del modelo de keypoints')
+
+    # Hiperparámetros de detección
+    parser.add_argument('--p-conf', type=float, default=0.4, help='Umbral de confianza de jugadores')
+    parser.add_argument('--k-conf', type=float, default=0.7, help='Umbral de confianza de keypoints')
+    parser.add_argument('--k-d-tol', type=float, default=7, help='Tolerancia RMSE de desplazamiento de keypoints (píxeles)')
+
+    parser.add_argument('--pitch-roi', action='store_true',
+                        help='Detectar jugadores solo en el rectángulo del campo y descartar los que tienen los pies fuera del mapa')
+    parser.add_argument('--frame-step', type=int, default=1,
+                        help='Ejecutar los modelos cada K frames e interpolar las detecciones de los intermedios por ID de tracking')
+    parser.add_argument('--keypoints-interval', type=int, default=1,
+                        help='Ejecutar el modelo de keypoints cada K frames y propagar la homografía con el movimiento de cámara')
+    parser.add_argument('--motion-thresh', type=float, default=40.0,
+                        help='Movimiento de cámara acumulado (píxeles) que fuerza una nueva inferencia de keypoints')
+
+    # Clasificación de equipos
+    parser.add_argument('--team1', nargs=3, metavar=('NOMBRE', 'COLOR_JUGADORES', 'COLOR_PORTERO'), default=None,
+                        help='Equipo 1 y colores de camiseta (p. ej. Local "#FFFFFF" "#00FF00"); requiere --team2')
+    parser.add_argument('--team2', nargs=3, metavar=('NOMBRE', 'COLOR_JUGADORES', 'COLOR_PORTERO'), default=None,
+                        help='Equipo 2 y colores de camiseta; requiere --team1. Sin --team1/--team2 cada ID recibe un color distinto')
+    parser.add_argument('--auto-teams', action='store_true',
+                        help='Separar equipos automáticamente agrupando los colores de las camisetas (sin --team1/--team2)')
+    parser.add_argument('--palette-colors', type=int, default=3, help='Colores de paleta extraídos por jugador')
+    parser.add_argument('--team-recheck-interval', type=int, default=25,
+                        help='Frames entre verificaciones del equipo de un mismo ID de tracking')
+
+    # Seguimiento del balón
+    parser.add_argument('--no-ball-frames', type=int, default=30, help='Frames sin balón antes de reiniciar el seguimiento')
+    parser.add_argument('--ball-dist', type=float, default=100, help='Distancia máxima entre detecciones de balón (píxeles)')
+    parser.add_argument('--ball-track-length', type=int, default=35, help='Longitud máxima del seguimiento del balón')
+    parser.add_argument('--ball-roi', type=int, default=None, metavar='PIXELES',
+                        help='Buscar el balón en una ventana de este lado alrededor de su posición predicha (frame completo tras --no-ball-frames fallos)')
+
+    # Anotaciones
+    parser.add_argument('--show-keypoints', action='store_true', help='Dibujar detecciones de keypoints')
+    parser.add_argument('--hide-players', action='store_true', help='No dibujar detecciones de jugadores')
+    parser.add_argument('--hide-palettes', action='store_true', help='No dibujar paletas de color')
+    parser.add_argument('--hide-ball', action='store_true', help='No dibujar el seguimiento del balón')
+
+    # Salidas
+    parser.add_argument('--no-processed', action='store_true', help='No guardar el video procesado')
+    parser.add_argument('--no-tactical', action='store_true', help='No guardar el video táctico')
+    parser.add_argument('--combined', action='store_true', help='Guardar el video combinado')
+    parser.add_argument('--tracking', action='store_true', help='Guardar los datos de tracking por frame en Parquet')
+    parser.add_argument('--resize', type=int, nargs=2, metavar=('ANCHO', 'ALTO'), default=None,
+                        help='Redimensionar la imagen combinada')
+    parser.add_argument('--batch-size', type=int, default=1, help='Frames consecutivos por llamada a los modelos')
+    parser.add_argument('--sequential', action='store_true', help='Procesar todas las etapas en un solo hilo')
+    parser.add_argument('--progress-interval', type=float, default=5.0, help='Segundos entre mensajes de progreso')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='Dividir el video en N tramos procesados en paralelo (un proceso por tramo) y unir las salidas; '
+                             'los IDs se reconcilian solo en el tracking: los videos muestran los IDs (y colores por ID) de cada tramo')
+    parser.add_argument('--shard-overlap', type=int, default=None, metavar='FRAMES',
+                        help='Frames de solapamiento entre tramos para reconciliar los IDs (por defecto 2 segundos)')
+
+    # Backend de inferencia
+    parser.add_argument('--backend', choices=models.BACKENDS, default='torch', help='Backend de inferencia en CPU de ambos modelos')
+    parser.add_argument('--imgsz', type=int, default=None, help='Tamaño de entrada de los modelos (por defecto 640)')
+    parser.add_argument('--threads', type=int, default=None, help='Hilos de inferencia en CPU')
+    parser.add_argument('--model-cache-dir', default=MODEL_EXPORT_DIR, help='Directorio de los modelos exportados')
+    parser.add_argument('--compare-backends', type=int, default=None, metavar='FRAMES',
+                        help='Comparar velocidad y detecciones de todos los backends sobre los primeros FRAMES frames e imprimir un informe JSON')
+
+    # Caché de detecciones
+    parser.add_argument('--cache-dir', default=DETECTION_CACHE_DIR, help='Directorio de la caché de detecciones')
+    parser.add_argument('--cache-max-mb', type=int, default=2048, help='Tamaño máximo de la caché de detecciones (MB)')
+    parser.add_argument('--no-cache', action='store_true', help='No leer ni escribir la caché de detecciones')
+
+    # Checkpoints
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help='Guardar checkpoints en este directorio; si contiene uno de la misma ejecución, continuar desde él')
+    parser.add_argument('--checkpoint-interval', type=int, default=1500, help='Frames entre dos checkpoints')
+
+    # Métricas por etapa
+    parser.add_argument('--metrics-json', default=None, help='Guardar un resumen JSON de las latencias por etapa, homografías y memoria')
+    parser.add_argument('--metrics-prom', default=None,
+                        help='Guardar las métricas en formato de texto de Prometheus (actualizado con cada mensaje de progreso)')
+    args = parser.parse_args(argv)
+    if (args.team1 is None) != (args.team2 is None):
+        parser.error('--team1 y --team2 deben indicarse juntos')
+    if args.ball_roi and args.backend in models.FIXED_IMGSZ_BACKENDS and args.ball_roi != (args.imgsz or 640):
+        parser.error(f'--ball-roi requiere un backend con tamaño de entrada variable (no {args.backend})')
+    return args
+
+def print_progress(frame_nbr, tot_nbr_frames, final_img):
+    """
+    Imprime el progreso de la detección en la salida estándar.
+    """
+    percent_complete = int(frame_nbr / tot_nbr_frames * 100)
+    print(f'Detección en progreso: {frame_nbr}/{tot_nbr_frames} frames ({percent_complete}%)', flush=True)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        print(f'No se pudo abrir el video: {args.video}', file=sys.stderr)
+        return 1
+
+    if args.compare_backends:
+        frames = []
+        while len(frames) < args.compare_backends:
+            success, frame = cap.read()
+            if not success:
+                break
+            frames.append(frame)
+        cap.release()
+        report = {name: models.compare_backends(path, frames, imgsz=args.imgsz or 640, threads=args.threads,
+                                                export_dir=args.model_cache_dir)
+                  for name, path in (('players', args.players_model), ('keypoints', args.keypoints_model))}
+        print(json.dumps(report, indent=2))
+        return 0
+
+    hyper_params = {0: args.p_conf, 1: args.k_conf, 2: args.k_d_tol}
+    ball_track_hyperparams = {0: args.no_ball_frames, 1: args.ball_dist, 2: args.ball_track_length}
+    plot_hyperparams = {0: args.show_keypoints, 1: not args.hide_palettes, 2: not args.hide_ball, 3: not args.hide_players}
+    output_width, output_height = args.resize if args.resize else (None, None)
+    team_colors_dic = None
+    if args.team1 and args.team2:
+        team_colors_dic, _ = config.create_colors_info(*args.team1, *args.team2)
+    detection_cache = None if args.no_cache else cache.open_detection_cache(args.cache_dir, args.cache_max_mb << 20)
+
+    params = dict(output_file_name=args.output_name,
+                  save_processed_separately=not args.no_processed,
+                  save_tactical_separately=not args.no_tactical,
+                  save_combined=args.combined,
+                  save_tracking=args.tracking,
+                  enable_resize=args.resize is not None, output_width=output_width, output_height=output_height,
+                  progress_callback=print_progress, progress_interval=args.progress_interval,
+                  pipelined=not args.sequential, batch_size=args.batch_size,
+                  keypoints_interval=args.keypoints_interval, motion_thresh=args.motion_thresh,
+                  detection_cache=detection_cache,
+                  team_colors_dic=team_colors_dic, num_pal_colors=args.palette_colors,
+                  team_recheck_interval=args.team_recheck_interval, auto_teams=args.auto_teams,
+                  ball_roi_size=args.ball_roi, pitch_roi=args.pitch_roi, frame_step=args.frame_step,
+                  checkpoint_dir=args.checkpoint_dir, checkpoint_interval=args.checkpoint_interval)
+
+    metrics = profiling.create_metrics() if args.metrics_json or args.metrics_prom else None
+    if metrics is not None and args.metrics_prom:
+        def on_progress(frame_nbr, tot_nbr_frames, final_img):
+            print_progress(frame_nbr, tot_nbr_frames, final_img)
+            profiling.save_prometheus(metrics, args.metrics_prom)
+        params['progress_callback'] = on_progress
+
+    start_time = time.time()
+    if args.shards > 1:
+        if metrics is not None:
+            print('Aviso: las métricas por etapa no están disponibles con --shards', file=sys.stderr)
+        # Cada proceso carga sus propios modelos
+        cap.release()
+        from sharding import process_video_sharded
+        names = process_video_sharded(args.video, hyper_params, ball_track_hyperparams, plot_hyperparams, args.shards,
+                                      overlap=args.shard_overlap, players_model_path=args.players_model,
+                                      keypoints_model_path=args.keypoints_model, backend=args.backend, imgsz=args.imgsz,
+                                      threads=args.threads, export_dir=args.model_cache_dir, **params)
+    else:
+        model_players = models.load_model(args.players_model, args.backend, args.imgsz, args.threads, args.model_cache_dir)
+        model_keypoints = models.load_model(args.keypoints_model, args.backend, args.imgsz, args.threads, args.model_cache_dir)
+        try:
+            names = process_video(cap, model_players, model_keypoints, hyper_params, ball_track_hyperparams, plot_hyperparams,
+                                  video_path=args.video, metrics=metrics, **params)
+        finally:
+            cap.release()
+        if args.metrics_json:
+            profiling.save_metrics_json(metrics, args.metrics_json, {'video': args.video})
+        if args.metrics_prom:
+            profiling.save_prometheus(metrics, args.metrics_prom)
+
+    print(f'Detección finalizada en {time.time() - start_time:.1f} s')
+    for name in names:
+        if name is not None:
+            print(f'  ./outputs/{name}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
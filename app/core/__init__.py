@@ -2,6 +2,21 @@
 
 from .annotations import *
 from .config import *
+from .export import *
 from .homography import *
 from .output import *
 from .prediction import *
+from .pipeline import *
+from .tracker import *
+from .motion import *
+from .balltrack import *
+from .cache import *
+from .teams import *
+from .clustering import *
+from .uploads import *
+from .models import *
+from .pitch import *
+from .stitching import *
+from .jobs import *
+from .checkpoint import *
+from .profiling import *
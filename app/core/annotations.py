@@ -1,8 +1,13 @@
 import cv2
 import numpy as np
+from .balltrack import ball_track_points
+
+# Bordes (arriba, abajo, izquierda, derecha) del frame anotado y del mapa táctico en la imagen combinada
+_FRAME_BORDER = (40, 10, 10, 10)
+_TAC_MAP_BORDER = (70, 50, 10, 10)
 
 def annotate_frame(frame, bboxes_p, labels_p, confs_p, players_teams_list, colors_dic,
-                  obj_palette_list, labels_dic, show_pal, show_p, show_k, bboxes_k):
+                  obj_palette_list, labels_dic, show_pal, show_p, show_k, bboxes_k, out=None):
     """
     Anota el frame con bounding boxes, colores de equipo y etiquetas de texto.
     Args:
@@ -18,10 +23,15 @@ def annotate_frame(frame, bboxes_p, labels_p, confs_p, players_teams_list, color
         show_p: Si mostrar anotaciones de jugadores
         show_k: Si mostrar bounding boxes de keypoints
         bboxes_k: Bounding boxes de keypoints
+        out: Buffer opcional del tamaño del frame donde anotar (p. ej. una vista del lienzo del compositor)
     Returns:
         annotated_frame: Frame con anotaciones
     """
-    annotated_frame = frame.copy()
+    if out is None:
+        annotated_frame = frame.copy()
+    else:
+        annotated_frame = out
+        np.copyto(annotated_frame, frame)
     palette_box_size = 10 # Establecer tamaño de caja de color en píxeles (para visualización)
     j = 0 # Inicializando contador de jugadores detectados
 
@@ -67,63 +77,200 @@ def annotate_frame(frame, bboxes_p, labels_p, confs_p, players_teams_list, color
 
     return annotated_frame
 
-def annotate_tactical_map(tac_map_copy, pred_dst_pts, detected_ball_dst_pos, players_teams_list, colors_dic, player_ids=None):
+def _mark_dirty(dirty, x0, y0, x1, y1):
+    # Registrar un rectángulo (x0, y0, x1, y1) modificado en el lienzo
+    if dirty is not None:
+        dirty.append((x0, y0, x1, y1))
+
+def _mark_text_dirty(dirty, text, org, font_scale, thickness):
+    # Rectángulo que cubre un texto de cv2.putText con origen (esquina inferior izquierda) en org
+    if dirty is not None:
+        (w, h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        pad = thickness + 2
+        dirty.append((org[0] - pad, org[1] - h - pad, org[0] + w + pad, org[1] + baseline + pad))
+
+def restore_regions(canvas, background, dirty):
+    """
+    Restaura desde el fondo solo las regiones del lienzo modificadas (rectángulos sucios).
+    Args:
+        canvas: Lienzo a restaurar (se modifica in place)
+        background: Imagen de fondo original, del mismo tamaño que canvas
+        dirty: Lista de rectángulos (x0, y0, x1, y1), se vacía al restaurar
+    """
+    height, width = canvas.shape[:2]
+    for x0, y0, x1, y1 in dirty:
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1 + 1, width), min(y1 + 1, height)
+        if x0 < x1 and y0 < y1:
+            canvas[y0:y1, x0:x1] = background[y0:y1, x0:x1]
+    dirty.clear()
+
+def annotate_tactical_map(tac_map_canvas, pred_dst_pts, detected_ball_dst_pos, players_teams_list, colors_dic,
+                          player_ids=None, dirty=None):
     """
-    Anota el mapa táctico con posiciones de jugadores y balón.
+    Anota el mapa táctico con posiciones de jugadores y balón (dibuja in place, sin copiar).
     Args:
-        tac_map_copy: Copia del mapa táctico
+        tac_map_canvas: Lienzo del mapa táctico
         pred_dst_pts: Posiciones de jugadores en el mapa táctico
         detected_ball_dst_pos: Posición del balón en el mapa táctico
         players_teams_list: Índices de equipos predichos
         colors_dic: Diccionario de colores de equipos
         player_ids: Lista de IDs de jugadores (opcional)
+        dirty: Lista opcional donde registrar los rectángulos dibujados
     Returns:
-        annotated_tactical_map: Mapa táctico con anotaciones
+        annotated_tactical_map: Mapa táctico con anotaciones (el mismo lienzo)
     """
-    annotated_tactical_map = tac_map_copy.copy()
+    annotated_tactical_map = tac_map_canvas
     ball_color_bgr = (0, 0, 255) # Color (BGR) para anotación del balón en el mapa táctico
+    team_names = list(colors_dic.keys())
 
     # Anotar posiciones de jugadores
     if pred_dst_pts is not None:
         for j, pt in enumerate(pred_dst_pts):
-            team_name = list(colors_dic.keys())[players_teams_list[j]]
+            team_name = team_names[players_teams_list[j]]
             color_rgb = colors_dic[team_name][0]
             color_bgr = color_rgb[::-1]
-            annotated_tactical_map = cv2.circle(annotated_tactical_map, (int(pt[0]), int(pt[1])),
-                                        radius=10, color=color_bgr, thickness=-1)
-            annotated_tactical_map = cv2.circle(annotated_tactical_map, (int(pt[0]), int(pt[1])),
-                                        radius=10, color=(0, 0, 0), thickness=1)
+            center = (int(pt[0]), int(pt[1]))
+            cv2.circle(annotated_tactical_map, center, radius=10, color=color_bgr, thickness=-1)
+            cv2.circle(annotated_tactical_map, center, radius=10, color=(0, 0, 0), thickness=1)
+            _mark_dirty(dirty, center[0] - 12, center[1] - 12, center[0] + 12, center[1] + 12)
             # Agregar ID del jugador si está disponible
             if player_ids is not None and j < len(player_ids):
-                annotated_tactical_map = cv2.putText(annotated_tactical_map, str(player_ids[j]),
-                            (int(pt[0]) + 10, int(pt[1]) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                org = (center[0] + 10, center[1] - 10)
+                cv2.putText(annotated_tactical_map, str(player_ids[j]), org, cv2.FONT_HERSHEY_SIMPLEX, 0.5,
                             (0, 0, 0), 2)
+                _mark_text_dirty(dirty, str(player_ids[j]), org, 0.5, 2)
 
     # Anotar posición del balón
     if detected_ball_dst_pos is not None:
-        annotated_tactical_map = cv2.circle(annotated_tactical_map, (int(detected_ball_dst_pos[0]),
-                                            int(detected_ball_dst_pos[1])), radius=5,
-                                            color=ball_color_bgr, thickness=3)
+        center = (int(detected_ball_dst_pos[0]), int(detected_ball_dst_pos[1]))
+        cv2.circle(annotated_tactical_map, center, radius=5, color=ball_color_bgr, thickness=3)
+        _mark_dirty(dirty, center[0] - 9, center[1] - 9, center[0] + 9, center[1] + 9)
 
     return annotated_tactical_map
 
-def draw_ball_trajectory(tac_map_copy, ball_track_history):
+def draw_ball_trajectory(tac_map_canvas, ball_track, dirty=None):
     """
-    Dibuja la trayectoria del balón en el mapa táctico.
+    Dibuja la trayectoria del balón en el mapa táctico (in place, sin copiar).
     Args:
-        tac_map_copy: Mapa táctico
-        ball_track_history: Historial de seguimiento del balón
+        tac_map_canvas: Lienzo del mapa táctico
+        ball_track: Seguimiento del balón (ver balltrack.create_ball_track)
+        dirty: Lista opcional donde registrar el rectángulo dibujado
+    Returns:
+        tac_map_with_trajectory: Mapa táctico con trayectoria (el mismo lienzo)
+    """
+    if ball_track['length'] > 0:
+        points = ball_track_points(ball_track) # Vista contigua (N,1,2) int32, sin copia
+        cv2.polylines(tac_map_canvas, [points], isClosed=False, color=(0, 0, 100), thickness=2)
+        x_min, y_min = points.min(axis=(0, 1))
+        x_max, y_max = points.max(axis=(0, 1))
+        _mark_dirty(dirty, int(x_min) - 3, int(y_min) - 3, int(x_max) + 3, int(y_max) + 3)
+    return tac_map_canvas
+
+def create_tactical_renderer(tac_map, nbr_canvases=1, canvases=None):
+    """
+    Crea el renderizador del mapa táctico con lienzos persistentes.
+    En cada frame solo se restauran desde el fondo las regiones dibujadas la vez anterior
+    y se dibujan los marcadores nuevos encima, en lugar de copiar el mapa completo.
+    Con varios lienzos (usados por turnos) un lienzo ya entregado no se modifica hasta que
+    se hayan renderizado nbr_canvases - 1 frames más, por ejemplo mientras espera en una cola de escritura.
+    Args:
+        tac_map: Imagen original del mapa táctico (no se modifica)
+        nbr_canvases: Número de lienzos que pueden estar en uso a la vez
+        canvases: Lista opcional de buffers preasignados a usar como lienzos (p. ej. los del compositor)
     Returns:
-        tac_map_with_trajectory: Mapa táctico con trayectoria
+        renderer: Diccionario con el fondo, los lienzos y sus regiones sucias
     """
-    tac_map_with_trajectory = tac_map_copy.copy()
-    if len(ball_track_history['src']) > 0:
-        points = np.hstack(ball_track_history['dst']).astype(np.int32).reshape((-1, 1, 2))
-        tac_map_with_trajectory = cv2.polylines(tac_map_with_trajectory, [points], isClosed=False,
-                                               color=(0, 0, 100), thickness=2)
-    return tac_map_with_trajectory
+    if canvases is None:
+        canvases = [tac_map.copy() for _ in range(max(1, int(nbr_canvases)))]
+    else:
+        for canvas in canvases:
+            np.copyto(canvas, tac_map)
+    return {
+        'background': tac_map,
+        'canvases': canvases,
+        'dirty': [[] for _ in canvases], # Rectángulos dibujados en cada lienzo
+        'next': 0 # Siguiente lienzo a usar
+    }
 
-def combine_frames(annotated_frame, tac_map_copy, enable_resize, output_width, output_height):
+def render_tactical_map(renderer, pred_dst_pts, detected_ball_dst_pos, players_teams_list, colors_dic,
+                        player_ids=None, ball_track=None):
+    """
+    Renderiza el mapa táctico de un frame sobre el siguiente lienzo persistente.
+    Args:
+        renderer: Renderizador creado con create_tactical_renderer
+        pred_dst_pts: Posiciones de jugadores en el mapa táctico
+        detected_ball_dst_pos: Posición del balón en el mapa táctico
+        players_teams_list: Índices de equipos predichos
+        colors_dic: Diccionario de colores de equipos
+        player_ids: Lista de IDs de jugadores (opcional)
+        ball_track: Seguimiento del balón a dibujar (opcional)
+    Returns:
+        tac_map_canvas: Lienzo con el mapa anotado (válido hasta que se reutilice, ver create_tactical_renderer)
+    """
+    i = renderer['next']
+    renderer['next'] = (i + 1) % len(renderer['canvases'])
+    canvas, dirty = renderer['canvases'][i], renderer['dirty'][i]
+
+    restore_regions(canvas, renderer['background'], dirty)
+    annotate_tactical_map(canvas, pred_dst_pts, detected_ball_dst_pos, players_teams_list, colors_dic, player_ids, dirty)
+    if ball_track is not None:
+        draw_ball_trajectory(canvas, ball_track, dirty)
+    return canvas
+
+def create_compositor(frame_shape, tac_map_shape, nbr_buffers=1, enable_resize=False, output_width=None, output_height=None):
+    """
+    Preasigna los buffers de la imagen combinada (frame anotado + mapa táctico) una sola vez.
+    Cada buffer expone vistas donde se escriben directamente el frame anotado y el mapa táctico,
+    de modo que combine_frames no asigna imágenes nuevas por frame. Los buffers se usan por turnos,
+    igual que los lienzos de create_tactical_renderer.
+    Args:
+        frame_shape: Forma de los frames del video (alto, ancho, canales)
+        tac_map_shape: Forma del mapa táctico
+        nbr_buffers: Número de imágenes combinadas que pueden estar en uso a la vez
+        enable_resize: Si redimensionar la imagen final
+        output_width: Ancho objetivo
+        output_height: Alto objetivo
+    Returns:
+        compositor: Diccionario con los buffers y el índice del siguiente a usar
+    """
+    frame_h, frame_w = frame_shape[:2]
+    tac_h, tac_w = tac_map_shape[:2]
+    f_top, f_bottom, f_left, f_right = _FRAME_BORDER
+    t_top, t_bottom, t_left, t_right = _TAC_MAP_BORDER
+    final_h = frame_h + f_top + f_bottom
+    left_w = frame_w + f_left + f_right
+    right_w = tac_w + t_left + t_right
+
+    resized_size = None
+    if enable_resize and output_width and output_height:
+        scale = min(output_width / (left_w + right_w), output_height / final_h)
+        resized_size = (int((left_w + right_w) * scale), int(final_h * scale))
+
+    buffers = []
+    for _ in range(max(1, int(nbr_buffers))):
+        canvas = np.zeros((final_h, left_w + right_w, 3), dtype=np.uint8)
+        tac_bordered = np.zeros((tac_h + t_top + t_bottom, right_w, 3), dtype=np.uint8)
+        buffers.append({
+            'canvas': canvas, # Imagen combinada (bordes en negro)
+            'frame': canvas[f_top:f_top + frame_h, f_left:f_left + frame_w], # Vista del frame anotado
+            'tac_bordered': tac_bordered, # Mapa táctico con bordes, antes de ajustar su alto
+            'tac': tac_bordered[t_top:t_top + tac_h, t_left:t_left + tac_w], # Vista del mapa táctico
+            'tac_dst': canvas[:, left_w:], # Vista del mapa con bordes redimensionado
+            'header': canvas[:f_top, :left_w], # Borde superior del frame (texto de FPS)
+            'resized': np.zeros((resized_size[1], resized_size[0], 3), dtype=np.uint8) if resized_size else None
+        })
+    return {'buffers': buffers, 'next': 0}
+
+def next_composite(compositor):
+    """
+    Devuelve el siguiente buffer de la imagen combinada (ver create_compositor).
+    """
+    composite = compositor['buffers'][compositor['next']]
+    compositor['next'] = (compositor['next'] + 1) % len(compositor['buffers'])
+    return composite
+
+def combine_frames(annotated_frame, tac_map_copy, enable_resize, output_width, output_height, composite=None):
     """
     Combina el frame anotado y el mapa táctico en la imagen final.
     Args:
@@ -132,13 +279,29 @@ def combine_frames(annotated_frame, tac_map_copy, enable_resize, output_width, o
         enable_resize: Si redimensionar la imagen final
         output_width: Ancho objetivo
         output_height: Alto objetivo
+        composite: Buffer preasignado opcional (ver next_composite); si annotated_frame y tac_map_copy
+            ya son sus vistas, no se copia ningún píxel y la imagen final es el propio buffer
     Returns:
         final_img: Imagen final combinada
     """
+    if composite is not None:
+        if annotated_frame is not composite['frame']:
+            np.copyto(composite['frame'], annotated_frame)
+        if tac_map_copy is not composite['tac']:
+            np.copyto(composite['tac'], tac_map_copy)
+        composite['header'][:] = 0 # Borrar el texto de FPS del uso anterior del buffer
+        final_img = composite['canvas']
+        cv2.resize(composite['tac_bordered'], composite['tac_dst'].shape[1::-1],
+                   dst=composite['tac_dst']) # Redimensionar mapa táctico directamente en el lienzo
+        cv2.putText(final_img, "Mapa Táctico", (1370, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2)
+        if composite['resized'] is not None:
+            final_img = cv2.resize(final_img, composite['resized'].shape[1::-1], dst=composite['resized'])
+        return final_img
+
     border_color = [0, 0, 0] # Establecer color del borde (BGR)
-    annotated_frame = cv2.copyMakeBorder(annotated_frame, 40, 10, 10, 10, # Agregar bordes al frame anotado
+    annotated_frame = cv2.copyMakeBorder(annotated_frame, *_FRAME_BORDER, # Agregar bordes al frame anotado
                                         cv2.BORDER_CONSTANT, value=border_color)
-    tac_map_copy = cv2.copyMakeBorder(tac_map_copy, 70, 50, 10, 10, cv2.BORDER_CONSTANT, # Agregar bordes al mapa táctico
+    tac_map_copy = cv2.copyMakeBorder(tac_map_copy, *_TAC_MAP_BORDER, cv2.BORDER_CONSTANT, # Agregar bordes al mapa táctico
                                     value=border_color)
     tac_map_copy = cv2.resize(tac_map_copy, (tac_map_copy.shape[1], annotated_frame.shape[0])) # Redimensionar mapa táctico
     final_img = cv2.hconcat((annotated_frame, tac_map_copy)) # Concatenar ambas imágenes
@@ -0,0 +1,215 @@
+import numpy as np
+from .homography import transform_points
+
+# Modelo de velocidad constante (dt = 1 frame) para el filtro de Kalman del balón
+_KF_F = np.array([[1., 0., 1., 0.],
+                  [0., 1., 0., 1.],
+                  [0., 0., 1., 0.],
+                  [0., 0., 0., 1.]])
+_KF_H = np.array([[1., 0., 0., 0.],
+                  [0., 1., 0., 0.]])
+_KF_Q = np.array([[.25, 0., .5, 0.],
+                  [0., .25, 0., .5],
+                  [.5, 0., 1., 0.],
+                  [0., .5, 0., 1.]])
+
+def create_ball_track(capacity, process_noise=4.0, measurement_noise=4.0):
+    """
+    Crea el almacenamiento del seguimiento del balón: un buffer circular de capacidad fija
+    con posiciones fuente (frame) y destino (mapa), más un filtro de Kalman de velocidad constante.
+    Cada punto se escribe dos veces (en i y en i+capacity) para que los últimos puntos
+    siempre formen una vista contigua, dibujable sin construir un array nuevo.
+    Args:
+        capacity: Longitud máxima del seguimiento (número de puntos)
+        process_noise: Varianza de aceleración del modelo de movimiento (píxeles²)
+        measurement_noise: Varianza de la detección (píxeles²)
+    Returns:
+        ball_track: Diccionario con buffers y estado del filtro
+    """
+    capacity = max(1, int(capacity))
+    return {
+        'capacity': capacity,
+        'src': np.zeros((2 * capacity, 2), dtype=np.float64), # Posiciones en el frame
+        'dst': np.zeros((2 * capacity, 2), dtype=np.float64), # Posiciones en el mapa táctico
+        'dst_draw': np.zeros((2 * capacity, 1, 2), dtype=np.int32), # Posiciones en el mapa listas para cv2.polylines
+        'head': 0, # Siguiente índice de escritura
+        'length': 0, # Número de puntos válidos
+        'nbr_missed': 0, # Frames consecutivos sin detección
+        'kf_x': np.zeros(4), # Estado del filtro [x, y, vx, vy]
+        'kf_P': np.eye(4), # Covarianza del estado
+        'kf_Q': _KF_Q * process_noise,
+        'kf_R': np.eye(2) * measurement_noise
+    }
+
+def reset_ball_track(ball_track):
+    """
+    Vacía el seguimiento del balón sin liberar los buffers.
+    """
+    ball_track['length'] = 0
+    ball_track['nbr_missed'] = 0
+
+def ball_track_points(ball_track, key='dst_draw'):
+    """
+    Devuelve los puntos del seguimiento en orden cronológico como vista contigua (sin copia).
+    Args:
+        ball_track: Seguimiento del balón
+        key: Buffer a consultar ('src', 'dst' o 'dst_draw')
+    Returns:
+        points: Vista de los últimos ball_track['length'] puntos
+    """
+    end = ball_track['head'] + ball_track['capacity']
+    return ball_track[key][end - ball_track['length']:end]
+
+def _push(ball_track, src_pos, dst_pos):
+    # Escribir el punto en ambas mitades del buffer circular
+    capacity = ball_track['capacity']
+    head = ball_track['head']
+    for i in (head, head + capacity):
+        ball_track['src'][i] = src_pos
+        ball_track['dst'][i] = dst_pos
+        ball_track['dst_draw'][i, 0] = dst_pos # Conversión a int32 (truncado, como antes)
+    ball_track['head'] = (head + 1) % capacity
+    ball_track['length'] = min(ball_track['length'] + 1, capacity)
+
+def _kalman_init(ball_track, src_pos):
+    ball_track['kf_x'][:] = (src_pos[0], src_pos[1], 0., 0.)
+    ball_track['kf_P'] = np.diag([ball_track['kf_R'][0, 0], ball_track['kf_R'][1, 1], 100., 100.])
+
+def _kalman_predict(ball_track):
+    ball_track['kf_x'] = _KF_F @ ball_track['kf_x']
+    ball_track['kf_P'] = _KF_F @ ball_track['kf_P'] @ _KF_F.T + ball_track['kf_Q']
+
+def _kalman_update(ball_track, src_pos):
+    x, P = ball_track['kf_x'], ball_track['kf_P']
+    innovation = src_pos - _KF_H @ x
+    S = _KF_H @ P @ _KF_H.T + ball_track['kf_R']
+    K = P @ _KF_H.T @ np.linalg.inv(S)
+    ball_track['kf_x'] = x + K @ innovation
+    ball_track['kf_P'] = (np.eye(4) - K @ _KF_H) @ P
+
+def update_ball_track(ball_track, detected_ball_src_pos, detected_ball_dst_pos, homog,
+                      ball_track_dist_thresh, nbr_frames_no_ball_thresh):
+    """
+    Actualiza el seguimiento del balón con la detección del frame (o su ausencia).
+    Una detección a más de ball_track_dist_thresh píxeles de la posición predicha inicia un nuevo
+    seguimiento. Sin detección, el filtro de Kalman predice la posición durante hasta
+    nbr_frames_no_ball_thresh frames en lugar de reiniciar; después el seguimiento se vacía.
+    Args:
+        ball_track: Seguimiento del balón (ver create_ball_track), se actualiza in place
+        detected_ball_src_pos: Posición del balón en el frame (o None)
+        detected_ball_dst_pos: Posición del balón en el mapa (o None)
+        homog: Homografía del frame actual, usada para proyectar posiciones predichas
+        ball_track_dist_thresh: Umbral de distancia para continuar el seguimiento
+        nbr_frames_no_ball_thresh: Frames sin balón que se rellenan antes de reiniciar
+    Returns:
+        predicted_ball_dst_pos: Posición predicha en el mapa si se rellenó un hueco (o None)
+    """
+    if ball_track['length'] > 0:
+        _kalman_predict(ball_track)
+
+    if detected_ball_src_pos is not None and detected_ball_dst_pos is not None:
+        detected_ball_src_pos = np.asarray(detected_ball_src_pos, dtype=np.float64)
+        if (ball_track['length'] == 0 or
+                np.linalg.norm(detected_ball_src_pos - ball_track['kf_x'][:2]) >= ball_track_dist_thresh):
+            # Nuevo seguimiento
+            reset_ball_track(ball_track)
+            _kalman_init(ball_track, detected_ball_src_pos)
+        else:
+            _kalman_update(ball_track, detected_ball_src_pos)
+        ball_track['nbr_missed'] = 0
+        _push(ball_track, detected_ball_src_pos, detected_ball_dst_pos)
+        return None
+
+    if ball_track['length'] == 0:
+        return None
+
+    ball_track['nbr_missed'] += 1
+    if ball_track['nbr_missed'] > nbr_frames_no_ball_thresh:
+        reset_ball_track(ball_track)
+        return None
+
+    # Rellenar el hueco con la posición predicha
+    predicted_ball_src_pos = ball_track['kf_x'][:2].copy()
+    predicted_ball_dst_pos = transform_points(homog, predicted_ball_src_pos)[0]
+    _push(ball_track, predicted_ball_src_pos, predicted_ball_dst_pos)
+    return predicted_ball_dst_pos
+
+def create_ball_search(roi_size=640, nbr_frames_no_ball_thresh=30, process_noise=4.0, measurement_noise=4.0):
+    """
+    Crea el estado de la búsqueda del balón por ventana (ROI) para la etapa de inferencia.
+    Mientras el balón se encontró hace menos de nbr_frames_no_ball_thresh frames, el detector solo
+    se ejecuta sobre una ventana de roi_size píxeles (resolución original) alrededor de la posición
+    predicha por un filtro de Kalman propio; después se vuelve a buscar en el frame completo.
+    Es independiente del seguimiento del mapa (create_ball_track), que se actualiza en la etapa de anotación.
+    Args:
+        roi_size: Lado de la ventana de búsqueda (píxeles del frame)
+        nbr_frames_no_ball_thresh: Frames sin balón tras los que se busca en el frame completo
+        process_noise: Varianza de aceleración del modelo de movimiento (píxeles²)
+        measurement_noise: Varianza de la detección (píxeles²)
+    Returns:
+        ball_search: Diccionario con el estado de la búsqueda
+    """
+    return {
+        'roi_size': int(roi_size),
+        'max_missed': nbr_frames_no_ball_thresh,
+        'active': False, # Si hay una posición predicha en la que buscar
+        'nbr_missed': 0, # Frames consecutivos sin balón
+        'kf_x': np.zeros(4),
+        'kf_P': np.eye(4),
+        'kf_Q': _KF_Q * process_noise,
+        'kf_R': np.eye(2) * measurement_noise,
+        'nbr_roi': 0, # Frames buscados por ventana
+        'nbr_full': 0 # Frames buscados en el frame completo
+    }
+
+def predict_ball_rois(ball_search, frame_shape, nbr_frames):
+    """
+    Calcula las ventanas de búsqueda de los próximos nbr_frames frames extrapolando el filtro,
+    para poder procesar todas las ventanas de un lote en una sola llamada al modelo.
+    Las ventanas se desplazan (sin reducirse) para quedar dentro del frame.
+    Args:
+        ball_search: Estado de la búsqueda (ver create_ball_search)
+        frame_shape: Forma de los frames (alto, ancho, ...)
+        nbr_frames: Número de frames del lote
+    Returns:
+        rois: Lista de ventanas (x1,y1,x2,y2) enteras, o None en los frames que se buscan en el frame completo
+    """
+    if not ball_search['active']:
+        return [None] * nbr_frames
+    height, width = frame_shape[:2]
+    roi_w, roi_h = min(ball_search['roi_size'], width), min(ball_search['roi_size'], height)
+    rois = []
+    x = ball_search['kf_x']
+    for k in range(nbr_frames):
+        if ball_search['nbr_missed'] + k >= ball_search['max_missed']:
+            rois.append(None) # La búsqueda por ventana habrá expirado en este frame
+            continue
+        x = _KF_F @ x
+        x1 = int(min(max(round(x[0] - roi_w / 2), 0), width - roi_w))
+        y1 = int(min(max(round(x[1] - roi_h / 2), 0), height - roi_h))
+        rois.append((x1, y1, x1 + roi_w, y1 + roi_h))
+    return rois
+
+def update_ball_search(ball_search, ball_src_pos, searched_roi):
+    """
+    Actualiza la búsqueda con el resultado de un frame.
+    Args:
+        ball_search: Estado de la búsqueda (se actualiza in place)
+        ball_src_pos: Posición del balón encontrada en el frame (o None)
+        searched_roi: Si el frame se buscó por ventana (para las estadísticas)
+    """
+    ball_search['nbr_roi' if searched_roi else 'nbr_full'] += 1
+    if ball_search['active']:
+        _kalman_predict(ball_search)
+    if ball_src_pos is not None:
+        ball_src_pos = np.asarray(ball_src_pos, dtype=np.float64)
+        if ball_search['active']:
+            _kalman_update(ball_search, ball_src_pos)
+        else:
+            _kalman_init(ball_search, ball_src_pos)
+            ball_search['active'] = True
+        ball_search['nbr_missed'] = 0
+    elif ball_search['active']:
+        ball_search['nbr_missed'] += 1
+        if ball_search['nbr_missed'] >= ball_search['max_missed']:
+            ball_search['active'] = False # Volver a buscar en el frame completo
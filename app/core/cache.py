@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+from .tracker import xyxy_to_xywh
+
+# Versión del formato; cambiarla invalida las entradas existentes
+DETECTION_CACHE_VERSION = 1
+
+# Huellas de archivos ya calculadas en este proceso: (ruta, tamaño, mtime) -> sha256
+_file_digests = {}
+
+def file_digest(path, block_size=1 << 20):
+    """
+    Calcula el SHA-256 del contenido de un archivo leyéndolo por bloques.
+    El resultado se recuerda mientras el archivo no cambie de tamaño ni de fecha de modificación.
+    Args:
+        path: Ruta del archivo
+        block_size: Tamaño de bloque de lectura (bytes)
+    Returns:
+        digest: Hash hexadecimal del contenido
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_digests:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                sha.update(block)
+        _file_digests[memo_key] = sha.hexdigest()
+    return _file_digests[memo_key]
+
+def remember_file_digest(path, digest):
+    """
+    Registra el hash ya conocido de un archivo (p. ej. calculado al subirlo) para no volver a leerlo.
+    Args:
+        path: Ruta del archivo
+        digest: SHA-256 hexadecimal de su contenido
+    """
+    stat = os.stat(path)
+    _file_digests[(os.path.realpath(path), stat.st_size, stat.st_mtime_ns)] = digest
+
+def model_digest(model):
+    """
+    Huella de los pesos de un modelo YOLO (hash del archivo de checkpoint).
+    Para los modelos compartidos (ver models.get_model) incluye también el backend y el tamaño de entrada:
+    con el backend 'torch' el archivo es el mismo .pt para cualquier imgsz, pero las detecciones no.
+    Args:
+        model: Modelo YOLO cargado desde un archivo .pt
+    Returns:
+        digest: Hash del checkpoint, o None si el modelo no proviene de un archivo (no se puede cachear)
+    """
+    ckpt_path = getattr(model, 'ckpt_path', None)
+    if not ckpt_path or not os.path.isfile(ckpt_path):
+        return None
+    backend = getattr(model, 'backend', None)
+    imgsz = getattr(model, 'imgsz', None)
+    if backend in (None, 'torch') and imgsz is None:
+        return file_digest(ckpt_path) # Mismas detecciones que el .pt cargado directamente
+    return hashlib.sha256(json.dumps([file_digest(ckpt_path), backend, imgsz]).encode()).hexdigest()
+
+def detection_cache_key(video_path, model_players, model_keypoints, params):
+    """
+    Construye la clave de caché de las detecciones de un video.
+    Args:
+        video_path: Ruta del video de entrada
+        model_players: Modelo YOLO de jugadores
+        model_keypoints: Modelo YOLO de keypoints
+        params: Diccionario de parámetros que afectan a la salida de los modelos (p_conf, k_conf, ...)
+    Returns:
+        key: Clave hexadecimal, o None si alguna entrada no se puede identificar por su contenido
+    """
+    players_digest = model_digest(model_players)
+    keypoints_digest = model_digest(model_keypoints)
+    if video_path is None or not os.path.isfile(video_path) or players_digest is None or keypoints_digest is None:
+        return None
+    description = json.dumps({
+        'version': DETECTION_CACHE_VERSION,
+        'video': file_digest(video_path),
+        'players': players_digest,
+        'keypoints': keypoints_digest,
+        'params': params
+    }, sort_keys=True)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+def open_detection_cache(cache_dir, max_bytes=2 << 30, chunk_frames=500):
+    """
+    Abre (creando si hace falta) el directorio de caché de detecciones.
+    Cada entrada es un subdirectorio con las detecciones en bloques .npz y un meta.json;
+    la fecha de modificación de meta.json marca el último uso para el desalojo LRU.
+    Args:
+        cache_dir: Directorio de la caché
+        max_bytes: Tamaño máximo total; al superarlo se eliminan las entradas usadas hace más tiempo
+        chunk_frames: Frames por bloque (la memoria de lectura/escritura queda acotada a un bloque)
+    Returns:
+        detection_cache: Diccionario de configuración de la caché
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    return {'dir': cache_dir, 'max_bytes': max_bytes, 'chunk_frames': chunk_frames}
+
+def _entry_path(detection_cache, key):
+    return os.path.join(detection_cache['dir'], key)
+
+def has_detections(detection_cache, key):
+    """
+    Indica si hay una entrada completa para la clave.
+    """
+    return detection_cache is not None and key is not None and os.path.isfile(os.path.join(_entry_path(detection_cache, key), 'meta.json'))
+
+def _pack_chunk(frames):
+    # frames: lista de (frame_nbr, detections); concatenar los campos de tamaño variable
+    def cat(name, shape, dtype):
+        return np.concatenate([np.asarray(detections[name], dtype=dtype).reshape(shape) for _, detections in frames])
+
+    camera_motion = np.full((len(frames), 3, 3), np.nan)
+    for i, (_, detections) in enumerate(frames):
+        if detections['camera_motion'] is not None:
+            camera_motion[i] = detections['camera_motion']
+    return {
+        'frame_nbr': np.array([frame_nbr for frame_nbr, _ in frames], dtype=np.int64),
+        'nbr_p': np.array([len(detections['labels_p']) for _, detections in frames], dtype=np.int64),
+        'nbr_k': np.array([len(detections['labels_k']) for _, detections in frames], dtype=np.int64),
+        'bboxes_p': cat('bboxes_p', (-1, 4), np.float64),
+        'labels_p': cat('labels_p', (-1,), np.int64),
+        'confs_p': cat('confs_p', (-1,), np.float64),
+        'ids_p': cat('ids_p', (-1,), np.float64),
+        'ids_fallback': np.array([detections['ids_fallback'] for _, detections in frames], dtype=bool),
+        'bboxes_k': cat('bboxes_k', (-1, 4), np.float32),
+        'bboxes_k_c': cat('bboxes_k_c', (-1, 4), np.float32),
+        'labels_k': cat('labels_k', (-1,), np.int64),
+        'keypoints_inferred': np.array([detections['keypoints_inferred'] for _, detections in frames], dtype=bool),
+        'camera_motion': camera_motion
+    }
+
+def _unpack_chunk(chunk):
+    # Inverso de _pack_chunk: reconstruir (frame_nbr, detections) con los mismos campos que extract_detections
+    offsets_p = np.concatenate([[0], np.cumsum(chunk['nbr_p'])])
+    offsets_k = np.concatenate([[0], np.cumsum(chunk['nbr_k'])])
+    for i, frame_nbr in enumerate(chunk['frame_nbr']):
+        p = slice(offsets_p[i], offsets_p[i + 1])
+        k = slice(offsets_k[i], offsets_k[i + 1])
+        bboxes_p = chunk['bboxes_p'][p]
+        camera_motion = chunk['camera_motion'][i]
+        yield int(frame_nbr), {
+            'bboxes_p': bboxes_p,
+            'bboxes_p_c': xyxy_to_xywh(bboxes_p.astype(np.float32)), # Misma precisión que la salida del tracker
+            'labels_p': [int(label) for label in chunk['labels_p'][p]],
+            'confs_p': list(chunk['confs_p'][p]),
+            'ids_p': np.arange(bboxes_p.shape[0]) if chunk['ids_fallback'][i] else chunk['ids_p'][p],
+            'ids_fallback': bool(chunk['ids_fallback'][i]),
+            'bboxes_k': chunk['bboxes_k'][k],
+            'bboxes_k_c': chunk['bboxes_k_c'][k],
+            'labels_k': [int(label) for label in chunk['labels_k'][k]],
+            'keypoints_inferred': bool(chunk['keypoints_inferred'][i]),
+            'camera_motion': None if np.isnan(camera_motion).any() else camera_motion
+        }
+
+def load_detections(detection_cache, key):
+    """
+    Lee las detecciones cacheadas bloque a bloque y marca la entrada como usada recientemente.
+    Args:
+        detection_cache: Caché abierta con open_detection_cache
+        key: Clave de la entrada (ver detection_cache_key)
+    Yields:
+        (frame_nbr, detections) en orden de frame
+    """
+    entry = _entry_path(detection_cache, key)
+    meta_path = os.path.join(entry, 'meta.json')
+    with open(meta_path) as f:
+        meta = json.load(f)
+    os.utime(meta_path) # Actualizar el último uso (LRU)
+    for chunk_idx in range(meta['nbr_chunks']):
+        with np.load(os.path.join(entry, f'chunk_{chunk_idx:06d}.npz')) as chunk:
+            yield from _unpack_chunk({name: chunk[name] for name in chunk.files})
+
+def begin_detections(detection_cache, key):
+    """
+    Inicia la escritura de una entrada en un directorio temporal; solo se publica con commit_detections.
+    Args:
+        detection_cache: Caché abierta con open_detection_cache
+        key: Clave de la entrada
+    Returns:
+        cache_writer: Diccionario de estado de escritura
+    """
+    tmp_dir = os.path.join(detection_cache['dir'], f'{key}.tmp-{os.getpid()}-{time.monotonic_ns()}')
+    os.makedirs(tmp_dir)
+    return {'cache': detection_cache, 'key': key, 'dir': tmp_dir, 'pending': [], 'nbr_chunks': 0, 'nbr_frames': 0}
+
+def _flush_detections(cache_writer):
+    if not cache_writer['pending']:
+        return
+    path = os.path.join(cache_writer['dir'], f"chunk_{cache_writer['nbr_chunks']:06d}.npz")
+    np.savez_compressed(path, **_pack_chunk(cache_writer['pending']))
+    cache_writer['nbr_chunks'] += 1
+    cache_writer['pending'] = []
+
+def record_detections(cache_writer, frame_nbr, detections):
+    """
+    Agrega las detecciones de un frame a la entrada en escritura.
+    Args:
+        cache_writer: Estado de escritura (o None si la caché está deshabilitada)
+        frame_nbr: Número del frame
+        detections: Detecciones del frame (ver engine.extract_detections)
+    """
+    if cache_writer is None:
+        return
+    cache_writer['pending'].append((frame_nbr, detections))
+    cache_writer['nbr_frames'] += 1
+    if len(cache_writer['pending']) >= cache_writer['cache']['chunk_frames']:
+        _flush_detections(cache_writer)
+
+def commit_detections(cache_writer):
+    """
+    Publica la entrada escrita (renombrado atómico) y aplica el límite de tamaño de la caché.
+    """
+    if cache_writer is None:
+        return
+    _flush_detections(cache_writer)
+    with open(os.path.join(cache_writer['dir'], 'meta.json'), 'w') as f:
+        json.dump({'version': DETECTION_CACHE_VERSION, 'nbr_chunks': cache_writer['nbr_chunks'],
+                   'nbr_frames': cache_writer['nbr_frames']}, f)
+    entry = _entry_path(cache_writer['cache'], cache_writer['key'])
+    try:
+        os.replace(cache_writer['dir'], entry)
+    except OSError:
+        # Otra ejecución publicó la misma entrada primero
+        shutil.rmtree(cache_writer['dir'], ignore_errors=True)
+    evict_detections(cache_writer['cache'], keep=cache_writer['key'])
+
+def discard_detections(cache_writer):
+    """
+    Descarta una entrada incompleta (p. ej. si el procesamiento se interrumpió).
+    """
+    if cache_writer is not None:
+        shutil.rmtree(cache_writer['dir'], ignore_errors=True)
+
+def evict_detections(detection_cache, keep=None):
+    """
+    Elimina las entradas usadas hace más tiempo hasta que la caché quepa en max_bytes.
+    Args:
+        detection_cache: Caché abierta con open_detection_cache
+        keep: Clave que nunca se elimina (la recién escrita)
+    """
+    entries = []
+    for name in os.listdir(detection_cache['dir']):
+        meta_path = os.path.join(detection_cache['dir'], name, 'meta.json')
+        if not os.path.isfile(meta_path):
+            continue # Entradas en escritura
+        entry = os.path.join(detection_cache['dir'], name)
+        size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+        entries.append((os.path.getmtime(meta_path), size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= detection_cache['max_bytes']:
+            break
+        if name == keep:
+            continue
+        shutil.rmtree(os.path.join(detection_cache['dir'], name), ignore_errors=True)
+        total -= size
@@ -0,0 +1,170 @@
+import os
+import glob
+import json
+import pickle
+import shutil
+import hashlib
+from .output import concat_videos, concat_videos_copy
+from .stitching import merge_tracking_files
+
+# Versión del formato; cambiarla invalida los checkpoints existentes
+CHECKPOINT_VERSION = 1
+
+def checkpoint_fingerprint(video_path, params):
+    """
+    Huella de una ejecución: un checkpoint solo se reanuda con el mismo video y los mismos parámetros.
+    Args:
+        video_path: Ruta del video de entrada (o None)
+        params: Diccionario de parámetros que afectan al estado o a las salidas (serializable a JSON)
+    Returns:
+        fingerprint: Hash hexadecimal
+    """
+    video = None
+    if video_path is not None and os.path.isfile(video_path):
+        stat = os.stat(video_path) # Sin leer el video entero: tamaño y fecha de modificación
+        video = [os.path.realpath(video_path), stat.st_size, stat.st_mtime_ns]
+    description = json.dumps({'version': CHECKPOINT_VERSION, 'video': video, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+def plan_checkpoint_segments(first_frame, last_frame, interval, frame_step=1):
+    """
+    Divide el rango de frames en segmentos tras los que se guarda un checkpoint.
+    Con submuestreo cada segmento termina en un frame clave, para que la interpolación continúe igual al reanudar.
+    Args:
+        first_frame: Primer frame (desde 1, inclusivo)
+        last_frame: Último frame (inclusivo)
+        interval: Frames por segmento (None: un único segmento)
+        frame_step: Frames entre dos frames clave (ver engine.read_segments)
+    Returns:
+        segments: Lista de tuplas (primero, último) inclusivas
+    """
+    if not interval or last_frame < first_frame:
+        return [(first_frame, last_frame)]
+    interval = -(-max(1, int(interval)) // frame_step) * frame_step # Múltiplo de frame_step
+    ends = list(range(first_frame + interval, last_frame, interval)) + [last_frame]
+    return [(start, end) for start, end in zip([first_frame] + [end + 1 for end in ends[:-1]], ends)]
+
+def _checkpoint_path(checkpoint_dir):
+    return os.path.join(checkpoint_dir, 'checkpoint.pkl')
+
+def save_checkpoint(checkpoint_dir, checkpoint):
+    """
+    Guarda un checkpoint de forma atómica (un corte durante la escritura conserva el anterior).
+    Args:
+        checkpoint_dir: Directorio del checkpoint de la ejecución
+        checkpoint: Diccionario con el estado a reanudar (serializable con pickle)
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = _checkpoint_path(checkpoint_dir)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_checkpoint(checkpoint_dir, fingerprint):
+    """
+    Carga el checkpoint de una ejecución si existe y corresponde a la misma huella.
+    Args:
+        checkpoint_dir: Directorio del checkpoint de la ejecución (o None)
+        fingerprint: Huella esperada (ver checkpoint_fingerprint)
+    Returns:
+        checkpoint: Diccionario guardado con save_checkpoint, o None si no hay nada que reanudar
+    """
+    if checkpoint_dir is None or not os.path.isfile(_checkpoint_path(checkpoint_dir)):
+        return None
+    try:
+        with open(_checkpoint_path(checkpoint_dir), 'rb') as f:
+            checkpoint = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None # Checkpoint ilegible o de otra versión del código: empezar de cero
+    if checkpoint.get('fingerprint') != fingerprint:
+        return None
+    return checkpoint
+
+def join_checkpoint_segments(segments, output_names, fps, outputs_dir='./outputs/'):
+    """
+    Une las salidas de los segmentos cerrados, en orden, en las salidas finales y elimina los segmentos.
+    Un único segmento se renombra; varios se unen por copia de flujo sin recodificar (ver output.concat_videos_copy)
+    o, si no es posible (sin ffmpeg), recodificándolos (ver output.concat_videos).
+    Args:
+        segments: Lista (por segmento) de nombres (procesado, táctico, combinado, tracking), como los devuelve process_video
+        output_names: Nombres finales con la misma estructura (None: salida deshabilitada)
+        fps: FPS de los videos de salida
+        outputs_dir: Directorio de los segmentos y de las salidas
+    Returns:
+        joined_names: Nombres de las salidas producidas (los mismos que output_names)
+    """
+    joined_names = []
+    for i, name in enumerate(output_names):
+        if name is None:
+            joined_names.append(None)
+            continue
+        output_path = os.path.join(outputs_dir, name)
+        paths = [os.path.join(outputs_dir, names[i]) for names in segments if names[i] is not None]
+        paths = [path for path in paths if os.path.isfile(path)]
+        if i < 3:
+            if len(paths) == 1:
+                os.replace(paths[0], output_path)
+            elif len(paths) > 1 and not concat_videos_copy(paths, output_path):
+                concat_videos(paths, output_path, fps)
+        else:
+            merge_tracking_files([{'path': path, 'output_from': 0, 'id_map': {}} for path in paths], output_path)
+        for path in paths:
+            if os.path.isfile(path):
+                os.remove(path)
+        joined_names.append(name)
+    return tuple(joined_names)
+
+def segment_file_name(output_file_name, segment_idx):
+    """
+    Nombre base de las salidas de un segmento (en el mismo directorio que las salidas finales).
+    """
+    return f'{output_file_name}_seg{segment_idx:04d}'
+
+def checkpoint_video_paths(checkpoint_root):
+    """
+    Videos de entrada de los checkpoints existentes bajo un directorio (ejecuciones que pueden reanudarse).
+    Args:
+        checkpoint_root: Directorio raíz de los checkpoints (se recorre entero: trabajos y tramos)
+    Returns:
+        paths: Conjunto de rutas absolutas
+    """
+    paths = set()
+    if checkpoint_root is None or not os.path.isdir(checkpoint_root):
+        return paths
+    for dir_path, _, file_names in os.walk(checkpoint_root):
+        if 'checkpoint.pkl' not in file_names:
+            continue
+        try:
+            with open(os.path.join(dir_path, 'checkpoint.pkl'), 'rb') as f:
+                video_path = pickle.load(f).get('video_path')
+        except Exception:
+            continue # Checkpoint ilegible: no se reanudará
+        if video_path:
+            paths.add(os.path.abspath(video_path))
+    return paths
+
+def discard_checkpoint(checkpoint_dir, outputs_dir='./outputs/', remove_segments=True):
+    """
+    Elimina el checkpoint de una ejecución y los archivos de sus segmentos (cerrados o a medio escribir).
+    Args:
+        checkpoint_dir: Directorio del checkpoint de la ejecución
+        outputs_dir: Directorio donde se escriben los segmentos
+        remove_segments: Si eliminar también los segmentos (False tras join_checkpoint_segments, que ya los eliminó)
+    """
+    if checkpoint_dir is None or not os.path.isdir(checkpoint_dir):
+        return
+    if not remove_segments:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        return
+    try:
+        with open(_checkpoint_path(checkpoint_dir), 'rb') as f:
+            output_file_name = pickle.load(f).get('output_file_name')
+    except Exception:
+        output_file_name = None
+    if output_file_name:
+        for path in glob.glob(os.path.join(glob.escape(outputs_dir), f'{glob.escape(output_file_name)}_seg[0-9][0-9][0-9][0-9]_*')):
+            os.remove(path)
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
@@ -0,0 +1,153 @@
+import numpy as np
+import skimage.color
+from .prediction import colors_to_lab, extract_palettes_batch
+
+# Nombres y colores (RGB) de los grupos mientras el agrupamiento no está inicializado
+AUTO_TEAM_NAMES = ['Equipo 1', 'Equipo 2', 'Otros']
+_AUTO_TEAM_DEFAULT_COLORS = [(255, 0, 0), (0, 0, 255), (128, 128, 128)]
+
+def create_team_clusterer(nbr_clusters=3, warmup_samples=120, max_count=500, sample_interval=5, seed=0):
+    """
+    Crea el agrupamiento incremental de colores de camiseta (k-means mini-batch en espacio Lab).
+    Los primeros warmup_samples colores se agrupan con k-means completo; a partir de ahí cada muestra
+    solo desplaza su centro más cercano, con memoria constante (k centros y sus contadores).
+    Los grupos se ordenan por tamaño al inicializar: los dos mayores son los equipos y el resto
+    (porteros u otros colores poco frecuentes) queda en los grupos siguientes.
+    Args:
+        nbr_clusters: Número de grupos (2 equipos + otros)
+        warmup_samples: Muestras acumuladas antes de la inicialización
+        max_count: Tope del contador por centro; mantiene una tasa de aprendizaje mínima de 1/max_count
+            para seguir cambios de iluminación a lo largo del partido
+        sample_interval: Frames entre muestras una vez inicializado
+        seed: Semilla para la inicialización k-means++
+    Returns:
+        clusterer: Diccionario de estado del agrupamiento
+    """
+    return {
+        'nbr_clusters': nbr_clusters,
+        'warmup_samples': warmup_samples,
+        'max_count': max_count,
+        'sample_interval': sample_interval,
+        'rng': np.random.default_rng(seed),
+        'warmup': [], # Muestras Lab acumuladas hasta la inicialización
+        'nbr_warmup': 0,
+        'centers': None, # Centros (k,3) en Lab
+        'counts': np.zeros(nbr_clusters) # Muestras asignadas a cada centro
+    }
+
+def clusterer_ready(clusterer):
+    """
+    Indica si el agrupamiento ya está inicializado.
+    """
+    return clusterer['centers'] is not None
+
+def wants_sample(clusterer, frame_nbr):
+    """
+    Indica si se deben extraer paletas en este frame para alimentar el agrupamiento
+    (todos los frames durante la inicialización, luego cada sample_interval frames).
+    """
+    return not clusterer_ready(clusterer) or frame_nbr % clusterer['sample_interval'] == 0
+
+def _nearest(centers, samples):
+    # Índice del centro más cercano de cada muestra y su distancia al cuadrado
+    dist = ((samples[:, None, :] - centers[None, :, :]) ** 2).sum(axis=-1)
+    return dist.argmin(axis=1), dist.min(axis=1)
+
+def _kmeans(samples, nbr_clusters, rng, nbr_iters=20):
+    # k-means++ seguido de iteraciones de Lloyd
+    centers = [samples[rng.integers(len(samples))]]
+    for _ in range(1, nbr_clusters):
+        _, dist = _nearest(np.array(centers), samples)
+        if dist.sum() == 0:
+            centers.append(samples[rng.integers(len(samples))])
+        else:
+            centers.append(samples[rng.choice(len(samples), p=dist / dist.sum())])
+    centers = np.array(centers)
+    for _ in range(nbr_iters):
+        labels, _ = _nearest(centers, samples)
+        for c in range(nbr_clusters):
+            if np.any(labels == c):
+                centers[c] = samples[labels == c].mean(axis=0)
+    labels, _ = _nearest(centers, samples)
+    return centers, np.bincount(labels, minlength=nbr_clusters).astype(np.float64)
+
+def update_team_clusterer(clusterer, samples_lab):
+    """
+    Agrega colores (Lab) de jugadores al agrupamiento.
+    Args:
+        clusterer: Estado del agrupamiento (se actualiza in place)
+        samples_lab: Array (N,3) de colores de camiseta en Lab
+    Returns:
+        updated: Si los centros cambiaron
+    """
+    samples_lab = np.asarray(samples_lab, dtype=np.float64).reshape(-1, 3)
+    if samples_lab.shape[0] == 0:
+        return False
+
+    if not clusterer_ready(clusterer):
+        clusterer['warmup'].append(samples_lab)
+        clusterer['nbr_warmup'] += samples_lab.shape[0]
+        if clusterer['nbr_warmup'] < clusterer['warmup_samples']:
+            return False
+        samples = np.concatenate(clusterer['warmup'])
+        centers, counts = _kmeans(samples, clusterer['nbr_clusters'], clusterer['rng'])
+        order = np.argsort(-counts, kind='stable') # Grupos de mayor a menor: equipos primero
+        clusterer['centers'] = centers[order]
+        clusterer['counts'] = np.minimum(counts[order], clusterer['max_count'])
+        clusterer['warmup'] = []
+        return True
+
+    # Mini-batch: cada muestra mueve su centro más cercano con tasa 1/contador
+    labels, _ = _nearest(clusterer['centers'], samples_lab)
+    for c in np.unique(labels):
+        batch = samples_lab[labels == c]
+        counts = min(clusterer['counts'][c] + batch.shape[0], clusterer['max_count'])
+        clusterer['centers'][c] += (batch.mean(axis=0) - clusterer['centers'][c]) * batch.shape[0] / counts
+        clusterer['counts'][c] = counts
+    return True
+
+def clusterer_colors_dic(clusterer, colors_dic=None):
+    """
+    Construye (o actualiza in place) el diccionario de colores de los grupos para las anotaciones,
+    con el mismo formato que config.create_colors_info: {nombre: [color RGB]}.
+    Args:
+        clusterer: Estado del agrupamiento
+        colors_dic: Diccionario a actualizar (opcional)
+    Returns:
+        colors_dic: Diccionario de colores por grupo
+    """
+    nbr_clusters = clusterer['nbr_clusters']
+    if nbr_clusters <= 3:
+        names = AUTO_TEAM_NAMES[:nbr_clusters]
+    else:
+        names = AUTO_TEAM_NAMES[:2] + [f'{AUTO_TEAM_NAMES[2]} {i}' for i in range(1, nbr_clusters - 1)]
+    if clusterer_ready(clusterer):
+        colors_rgb = np.clip(skimage.color.lab2rgb(clusterer['centers']) * 255, 0, 255).round().astype(int)
+        colors = [tuple(int(v) for v in color) for color in colors_rgb]
+    else:
+        colors = (_AUTO_TEAM_DEFAULT_COLORS + [_AUTO_TEAM_DEFAULT_COLORS[-1]] * nbr_clusters)[:nbr_clusters]
+    if colors_dic is None:
+        colors_dic = {}
+    for name, color in zip(names, colors):
+        colors_dic[name] = [color]
+    return colors_dic
+
+def sample_team_colors(clusterer, frame, frame_nbr, bboxes_p, labels_p, num_pal_colors):
+    """
+    Alimenta el agrupamiento con el color dominante de la camiseta de cada jugador del frame,
+    solo en los frames de muestreo (ver wants_sample).
+    Args:
+        clusterer: Estado del agrupamiento
+        frame: Frame de entrada (BGR)
+        frame_nbr: Número del frame
+        bboxes_p: Bounding boxes de detecciones (xyxy)
+        labels_p: Etiquetas de detección
+        num_pal_colors: Número de colores de paleta por jugador
+    Returns:
+        updated: Si los centros cambiaron
+    """
+    if not wants_sample(clusterer, frame_nbr):
+        return False
+    palettes, palette_mask = extract_palettes_batch(frame, bboxes_p, labels_p, num_pal_colors)
+    dominant = palettes[palette_mask[:, 0], 0] if palettes.shape[1] > 0 else palettes.reshape(-1, 3)
+    return update_team_clusterer(clusterer, colors_to_lab(dominant))
@@ -1,6 +1,7 @@
 import os
 import json
 import yaml
+import numpy as np
 import skimage
 from PIL import ImageColor
 
@@ -30,6 +31,17 @@ def get_labels_dics():
     labels_dic = labels_dic['names']
     return keypoints_map_pos, classes_names_dic, labels_dic
 
+def get_keypoints_map_array(keypoints_map_pos, classes_names_dic):
+    """
+    Convierte las posiciones de keypoints del mapa táctico a un array indexado por etiqueta numérica.
+    Args:
+        keypoints_map_pos: Diccionario de posiciones de keypoints en el mapa táctico
+        classes_names_dic: Diccionario que mapea etiquetas numéricas a alfabéticas
+    Returns:
+        keypoints_dst: Array (K,2) con la posición en el mapa de cada clase de keypoint
+    """
+    return np.array([keypoints_map_pos[classes_names_dic[i]] for i in range(len(classes_names_dic))], dtype=np.float64)
+
 def create_colors_info(team1_name, team1_p_color, team1_gk_color, team2_name, team2_p_color, team2_gk_color):
     """
     Crea diccionario de información de colores para equipos.
@@ -0,0 +1,125 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Esquema de una fila por objeto (jugador o balón) y frame
+TRACKING_SCHEMA = pa.schema([
+    ('frame', pa.int32()), # Número de frame (desde 1)
+    ('time_s', pa.float64()), # Tiempo en el video (segundos)
+    ('label', pa.int8()), # Etiqueta de detección (0 jugador, 2 balón)
+    ('track_id', pa.int64()), # ID de tracking (-1 para el balón)
+    ('team', pa.int16()), # Índice de equipo/color asignado (-1 para el balón)
+    ('conf', pa.float32()), # Confianza de la detección
+    ('src_x', pa.float32()), # Posición en el frame (pies del jugador / centro del balón)
+    ('src_y', pa.float32()),
+    ('map_x', pa.float32()), # Posición en el mapa táctico (NaN sin homografía)
+    ('map_y', pa.float32())
+])
+
+def frame_tracking_rows(frame_nbr, detections, pred_dst_pts, detected_ball_dst_pos, player_ids, players_teams_list):
+    """
+    Construye las columnas de tracking de un frame a partir de las detecciones y posiciones proyectadas.
+    Args:
+        frame_nbr: Número del frame
+        detections: Detecciones del frame (bboxes_p_c, labels_p, confs_p)
+        pred_dst_pts: Posiciones de jugadores en el mapa (o None sin homografía)
+        detected_ball_dst_pos: Posición del balón en el mapa (o None)
+        player_ids: IDs de tracking de los jugadores
+        players_teams_list: Índices de equipo/color de los jugadores
+    Returns:
+        rows: Diccionario columna -> array de NumPy (sin la columna time_s)
+    """
+    labels_p = np.asarray(detections['labels_p'], dtype=np.int8)
+    bboxes_p_c = detections['bboxes_p_c']
+    confs_p = np.asarray(detections['confs_p'], dtype=np.float32).reshape(-1)
+    players = labels_p == 0
+    balls = np.flatnonzero(labels_p == 2)[:1] # Solo el primer balón detectado (como en el mapa táctico)
+
+    nbr_players = int(players.sum())
+    nbr_rows = nbr_players + balls.shape[0]
+    src = np.empty((nbr_rows, 2), dtype=np.float32)
+    dst = np.full((nbr_rows, 2), np.nan, dtype=np.float32)
+
+    # Jugadores: punto de los pies (x_centro, y_centro+h/2)
+    src[:nbr_players, 0] = bboxes_p_c[players, 0]
+    src[:nbr_players, 1] = bboxes_p_c[players, 1] + bboxes_p_c[players, 3] / 2
+    if pred_dst_pts is not None and len(pred_dst_pts) == nbr_players:
+        dst[:nbr_players] = pred_dst_pts
+    # Balón: centro del bounding box
+    if balls.shape[0] > 0:
+        src[nbr_players:] = bboxes_p_c[balls, :2]
+        if detected_ball_dst_pos is not None:
+            dst[nbr_players:] = detected_ball_dst_pos
+
+    return {
+        'frame': np.full(nbr_rows, frame_nbr, dtype=np.int32),
+        'label': np.concatenate([labels_p[players], labels_p[balls]]),
+        'track_id': np.concatenate([np.asarray(player_ids, dtype=np.int64).reshape(-1), np.full(balls.shape[0], -1, dtype=np.int64)]),
+        'team': np.concatenate([np.asarray(players_teams_list, dtype=np.int16).reshape(-1), np.full(balls.shape[0], -1, dtype=np.int16)]),
+        'conf': np.concatenate([confs_p[players], confs_p[balls]]),
+        'src_x': src[:, 0],
+        'src_y': src[:, 1],
+        'map_x': dst[:, 0],
+        'map_y': dst[:, 1]
+    }
+
+def open_tracking_writer(path, fps, row_group_size=65536):
+    """
+    Abre un escritor de Parquet que acumula filas de tracking y las vuelca por row groups.
+    La memoria queda acotada a row_group_size filas, independientemente de la duración del partido.
+    Args:
+        path: Ruta del archivo Parquet de salida
+        fps: FPS del video (para la columna time_s)
+        row_group_size: Filas por row group
+    Returns:
+        tracking_writer: Diccionario con el escritor y el buffer de filas pendientes
+    """
+    return {
+        'path': path,
+        'fps': fps if fps else 1.0,
+        'row_group_size': row_group_size,
+        'writer': pq.ParquetWriter(path, TRACKING_SCHEMA, compression='zstd'),
+        'pending': [], # Lista de diccionarios de columnas por frame
+        'nbr_pending': 0
+    }
+
+def flush_tracking_writer(tracking_writer):
+    """
+    Escribe las filas pendientes como un record batch de Arrow (un row group).
+    """
+    if tracking_writer['nbr_pending'] == 0:
+        return
+    pending = tracking_writer['pending']
+    columns = {name: np.concatenate([rows[name] for rows in pending]) for name in pending[0]}
+    columns['time_s'] = (columns['frame'] - 1) / tracking_writer['fps']
+    batch = pa.RecordBatch.from_arrays([pa.array(columns[field.name], type=field.type) for field in TRACKING_SCHEMA],
+                                       schema=TRACKING_SCHEMA)
+    tracking_writer['writer'].write_batch(batch, row_group_size=tracking_writer['row_group_size'])
+    tracking_writer['pending'] = []
+    tracking_writer['nbr_pending'] = 0
+
+def write_tracking_rows(tracking_writer, rows):
+    """
+    Agrega las filas de un frame y vuelca un row group cuando se alcanza row_group_size.
+    Args:
+        tracking_writer: Escritor creado con open_tracking_writer (o None si está deshabilitado)
+        rows: Columnas del frame (ver frame_tracking_rows)
+    Returns:
+        tracking_writer
+    """
+    if tracking_writer is None or rows is None:
+        return tracking_writer
+    tracking_writer['pending'].append(rows)
+    tracking_writer['nbr_pending'] += rows['frame'].shape[0]
+    if tracking_writer['nbr_pending'] >= tracking_writer['row_group_size']:
+        flush_tracking_writer(tracking_writer)
+    return tracking_writer
+
+def close_tracking_writer(tracking_writer):
+    """
+    Vuelca las filas pendientes y cierra el archivo Parquet.
+    """
+    if tracking_writer is None:
+        return
+    flush_tracking_writer(tracking_writer)
+    tracking_writer['writer'].close()
@@ -1,40 +1,56 @@
 import cv2
 import numpy as np
-from sklearn.metrics import mean_squared_error
 
-def calculate_homography(detected_labels, detected_labels_src_pts, detected_labels_dst_pts,
-                        detected_labels_prev=None, detected_labels_src_pts_prev=None, k_d_tol=10.0, frame_nbr=1):
+def keypoints_to_slots(labels_k, bboxes_k_c, nbr_slots=28):
+    """
+    Ubica los keypoints detectados en un array de posiciones fijas (una ranura por clase).
+    Args:
+        labels_k: Etiquetas numéricas de keypoints detectados
+        bboxes_k_c: Bounding boxes de keypoints detectados (x,y,w,h)
+        nbr_slots: Número de clases de keypoints del campo
+    Returns:
+        keypoints_src: Array (nbr_slots,2) con la posición en el frame de cada clase (redondeada)
+        keypoints_mask: Array booleano (nbr_slots,) de clases detectadas
+    """
+    keypoints_src = np.zeros((nbr_slots, 2), dtype=np.float64)
+    keypoints_mask = np.zeros(nbr_slots, dtype=bool)
+    labels_k = np.asarray(labels_k, dtype=np.intp)
+    if labels_k.shape[0] > 0:
+        # Orden inverso para que, ante clases repetidas, prevalezca la primera detección
+        keypoints_src[labels_k[::-1]] = np.round(np.asarray(bboxes_k_c)[::-1, :2])
+        keypoints_mask[labels_k] = True
+    return keypoints_src, keypoints_mask
+
+def calculate_homography(keypoints_src, keypoints_mask, keypoints_dst,
+                        keypoints_src_prev=None, keypoints_mask_prev=None, k_d_tol=10.0, frame_nbr=1):
     """
     Calcula la matriz de transformación de homografía cuando se detectan más de 3 keypoints.
+    Los keypoints se representan en ranuras fijas por clase (ver keypoints_to_slots).
     Args:
-        detected_labels: Lista de etiquetas de keypoints detectados para el frame actual
-        detected_labels_src_pts: Puntos fuente (coordenadas del frame) para el frame actual
-        detected_labels_dst_pts: Puntos destino (coordenadas del mapa)
-        detected_labels_prev: Etiquetas del frame anterior
-        detected_labels_src_pts_prev: Puntos fuente del frame anterior
+        keypoints_src: Puntos fuente (coordenadas del frame) por clase para el frame actual (K,2)
+        keypoints_mask: Máscara booleana (K,) de keypoints detectados en el frame actual
+        keypoints_dst: Puntos destino (coordenadas del mapa) por clase (K,2)
+        keypoints_src_prev: Puntos fuente del frame anterior (K,2)
+        keypoints_mask_prev: Máscara de keypoints del frame anterior (K,)
         k_d_tol: Tolerancia para desplazamiento de keypoints
         frame_nbr: Número del frame actual
     Returns:
         homog: Matriz de homografía si es calculable, None en caso contrario
         update_homography: Booleano que indica si la homografía fue actualizada
-        detected_labels_prev: Etiquetas anteriores actualizadas
-        detected_labels_src_pts_prev: Puntos anteriores actualizados
+        keypoints_src_prev: Puntos anteriores actualizados
+        keypoints_mask_prev: Máscara anterior actualizada
     """
     homog = None
     update_homography = False
 
-    if len(detected_labels) > 3:
+    if np.count_nonzero(keypoints_mask) > 3:
         # Siempre calcular la matriz de homografía en el primer frame
-        if frame_nbr > 1 and detected_labels_prev is not None and detected_labels_src_pts_prev is not None:
+        if frame_nbr > 1 and keypoints_src_prev is not None and keypoints_mask_prev is not None:
             # Determinar keypoints comunes del campo detectados entre frames anterior y actual
-            common_labels = set(detected_labels_prev) & set(detected_labels)
+            common_mask = keypoints_mask & keypoints_mask_prev
             # Cuando se detectan al menos 4 keypoints comunes, determinar si están desplazados en promedio más allá de cierto nivel de tolerancia
-            if len(common_labels) > 3:
-                common_label_idx_prev = [detected_labels_prev.index(i) for i in common_labels] # Obtener índices de etiquetas de keypoints comunes detectados del frame anterior
-                common_label_idx_curr = [detected_labels.index(i) for i in common_labels] # Obtener índices de etiquetas de keypoints comunes detectados del frame actual
-                coor_common_label_prev = detected_labels_src_pts_prev[common_label_idx_prev] # Obtener coordenadas de keypoints comunes detectados del frame anterior
-                coor_common_label_curr = detected_labels_src_pts[common_label_idx_curr] # Obtener coordenadas de keypoints comunes detectados del frame actual
-                coor_error = mean_squared_error(coor_common_label_prev, coor_common_label_curr) # Calcular error entre coordenadas de keypoints comunes anteriores y actuales
+            if np.count_nonzero(common_mask) > 3:
+                coor_error = np.square(keypoints_src - keypoints_src_prev)[common_mask].mean() # Error cuadrático medio entre coordenadas comunes
                 update_homography = coor_error > k_d_tol # Verificar si el error superó el nivel de tolerancia predefinido
             else:
                 update_homography = True
@@ -42,60 +58,68 @@ def calculate_homography(detected_labels, detected_labels_src_pts, detected_labe
             update_homography = True
 
         if update_homography:
-            homog, mask = cv2.findHomography(detected_labels_src_pts, detected_labels_dst_pts)
+            homog, mask = cv2.findHomography(keypoints_src[keypoints_mask], keypoints_dst[keypoints_mask])
 
     # Actualizar datos del frame anterior
     if homog is not None:
-        detected_labels_prev = detected_labels.copy()
-        detected_labels_src_pts_prev = detected_labels_src_pts.copy()
+        keypoints_src_prev = keypoints_src.copy()
+        keypoints_mask_prev = keypoints_mask.copy()
 
-    return homog, update_homography, detected_labels_prev, detected_labels_src_pts_prev
+    return homog, update_homography, keypoints_src_prev, keypoints_mask_prev
 
-def transform_points(homog, points):
+def transform_points(homog, points, out=None):
     """
     Transforma puntos del plano fuente al plano destino usando la matriz de homografía.
     Args:
         homog: Matriz de homografía
-        points: Lista de puntos a transformar (x, y)
+        points: Puntos a transformar (x, y), lista o array (N,2)
+        out: Array opcional (N,2) float64 donde escribir el resultado sin reservar memoria nueva
     Returns:
-        transformed_points: Lista de puntos transformados
+        transformed_points: Array (N,2) de puntos transformados (out si se entregó)
     """
-    transformed_points = []
-    for pt in points:
-        pt_homog = np.append(np.array(pt), np.array([1]), axis=0) # Convertir a coordenadas homogéneas
-        dest_point = np.matmul(homog, np.transpose(pt_homog)) # Aplicar transformación de homografía
-        dest_point = dest_point / dest_point[2] # Revertir a coordenadas 2D
-        transformed_points.append(list(np.transpose(dest_point)[:2]))
-    return np.array(transformed_points)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2) # Vista (N,1,2) que espera OpenCV
+    if out is None:
+        out = np.empty((points.shape[0], 2), dtype=np.float64)
+    if points.shape[0] > 0:
+        cv2.perspectiveTransform(points, np.asarray(homog, dtype=np.float64), out.reshape(-1, 1, 2))
+    return out
 
-def update_ball_tracking(ball_track_history, detected_ball_src_pos, detected_ball_dst_pos,
-                        ball_track_dist_thresh, max_track_length):
+def transform_points_bulk(homogs, points, frame_idx, out=None, chunk_size=65536):
     """
-    Actualiza el historial de seguimiento del balón.
+    Transforma puntos de muchos frames en una sola llamada, cada uno con la homografía de su frame.
+    Pensado para re-proyectar offline tracks almacenados de un partido completo.
     Args:
-        ball_track_history: Diccionario con listas 'src' y 'dst'
-        detected_ball_src_pos: Posición del balón en el frame fuente
-        detected_ball_dst_pos: Posición del balón en el mapa destino
-        ball_track_dist_thresh: Umbral de distancia para seguimiento
-        max_track_length: Longitud máxima del historial de seguimiento
+        homogs: Array (F,3,3) con una homografía por frame (NaN si el frame no tiene homografía)
+        points: Array (M,2) de puntos (x, y)
+        frame_idx: Array (M,) con el índice en homogs del frame de cada punto
+        out: Array opcional (M,2) float64 donde escribir el resultado
+        chunk_size: Puntos procesados por bloque (acota la memoria temporal)
     Returns:
-        ball_track_history actualizado
+        transformed_points: Array (M,2) de puntos transformados (NaN donde no hay homografía)
     """
-    if detected_ball_src_pos is not None and detected_ball_dst_pos is not None:
-        if len(ball_track_history['src']) > 0:
-            if np.linalg.norm(detected_ball_src_pos - ball_track_history['src'][-1]) < ball_track_dist_thresh:
-                ball_track_history['src'].append((int(detected_ball_src_pos[0]), int(detected_ball_src_pos[1])))
-                ball_track_history['dst'].append((int(detected_ball_dst_pos[0]), int(detected_ball_dst_pos[1])))
-            else:
-                ball_track_history['src'] = [(int(detected_ball_src_pos[0]), int(detected_ball_src_pos[1]))]
-                ball_track_history['dst'] = [(int(detected_ball_dst_pos[0]), int(detected_ball_dst_pos[1]))]
-        else:
-            ball_track_history['src'].append((int(detected_ball_src_pos[0]), int(detected_ball_src_pos[1])))
-            ball_track_history['dst'].append((int(detected_ball_dst_pos[0]), int(detected_ball_dst_pos[1])))
+    homogs = np.asarray(homogs, dtype=np.float64).reshape(-1, 9)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    frame_idx = np.asarray(frame_idx, dtype=np.intp).reshape(-1)
+    if out is None:
+        out = np.empty((points.shape[0], 2), dtype=np.float64)
 
-    # Limitar longitud del seguimiento
-    if len(ball_track_history['src']) > max_track_length:
-        ball_track_history['src'].pop(0)
-        ball_track_history['dst'].pop(0)
+    for start in range(0, points.shape[0], chunk_size):
+        block = slice(start, start + chunk_size)
+        h = homogs[frame_idx[block]] # Coeficientes de la homografía de cada punto (c,9)
+        x = points[block, 0]
+        y = points[block, 1]
+        w = h[:, 6] * x + h[:, 7] * y + h[:, 8] # Coordenada homogénea
+        out[block, 0] = (h[:, 0] * x + h[:, 1] * y + h[:, 2]) / w
+        out[block, 1] = (h[:, 3] * x + h[:, 4] * y + h[:, 5]) / w
+    return out
 
-    return ball_track_history
+def chain_homography(homog, camera_motion):
+    """
+    Propaga una homografía frame→mapa al frame siguiente usando el movimiento de cámara.
+    Args:
+        homog: Homografía del frame anterior al mapa táctico
+        camera_motion: Homografía del frame anterior al frame actual
+    Returns:
+        homog_chained: Homografía del frame actual al mapa táctico
+    """
+    return homog @ np.linalg.inv(camera_motion)
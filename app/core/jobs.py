@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import sqlite3
+import contextlib
+
+# Estados de un trabajo
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+JOB_FINAL_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    frame_nbr INTEGER NOT NULL DEFAULT 0,
+    tot_nbr_frames INTEGER NOT NULL DEFAULT 0,
+    preview_path TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    started REAL NOT NULL,
+    heartbeat REAL NOT NULL
+);
+"""
+
+class JobCancelled(Exception):
+    """
+    Se lanza desde el callback de progreso cuando se pidió cancelar el trabajo en curso.
+    """
+
+@contextlib.contextmanager
+def _connect(job_queue, write=True):
+    # Una conexión por operación (las conexiones de sqlite3 no se comparten entre hilos ni procesos);
+    # las escrituras van en una transacción con bloqueo inmediato
+    connection = sqlite3.connect(job_queue['path'], timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    try:
+        if write:
+            connection.execute('BEGIN IMMEDIATE')
+        yield connection
+        if write:
+            connection.execute('COMMIT')
+    except BaseException:
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        raise
+    finally:
+        connection.close()
+
+def _row_to_job(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+def open_job_queue(db_path, max_attempts=2, stale_after=120.0):
+    """
+    Abre (creando si hace falta) la cola persistente de trabajos en una base SQLite.
+    La cola sobrevive a recargas de la interfaz y a reinicios: la comparten la aplicación y los workers.
+    Args:
+        db_path: Ruta del archivo SQLite
+        max_attempts: Veces que se lanza un trabajo cuyo worker murió antes de marcarlo como fallido
+        stale_after: Segundos sin latido tras los que un trabajo en curso se considera abandonado
+    Returns:
+        job_queue: Diccionario de configuración de la cola
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    job_queue = {'path': db_path, 'max_attempts': max_attempts, 'stale_after': stale_after}
+    with _connect(job_queue, write=False) as connection:
+        connection.execute('PRAGMA journal_mode=WAL') # Lectores (interfaz) sin bloquear a los workers
+        connection.executescript(_SCHEMA)
+    return job_queue
+
+def submit_job(job_queue, params, kind='detection'):
+    """
+    Encola un trabajo.
+    Args:
+        job_queue: Cola abierta con open_job_queue
+        params: Parámetros del trabajo (serializables a JSON)
+        kind: Tipo de trabajo
+    Returns:
+        job_id: ID del trabajo
+    """
+    with _connect(job_queue) as connection:
+        cursor = connection.execute('INSERT INTO jobs (kind, params, status, created) VALUES (?, ?, ?, ?)',
+                                    (kind, json.dumps(params), JOB_QUEUED, time.time()))
+        return cursor.lastrowid
+
+def claim_job(job_queue, worker_id, max_running=1):
+    """
+    Toma el trabajo en cola más antiguo si hay menos de max_running en curso (en toda la cola,
+    independientemente de cuántos workers haya), de forma atómica entre procesos.
+    Args:
+        job_queue: Cola abierta con open_job_queue
+        worker_id: Identificador del worker
+        max_running: Límite de trabajos en curso a la vez
+    Returns:
+        job: Diccionario del trabajo tomado, o None
+    """
+    with _connect(job_queue) as connection: # Bloqueo de escritura: dos workers no toman el mismo trabajo
+        nbr_running = connection.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (JOB_RUNNING,)).fetchone()[0]
+        row = None
+        if nbr_running < max_running:
+            row = connection.execute('SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1', (JOB_QUEUED,)).fetchone()
+        if row is not None:
+            now = time.time()
+            connection.execute('UPDATE jobs SET status = ?, worker = ?, started = ?, heartbeat = ?, attempts = attempts + 1 '
+                               'WHERE id = ?', (JOB_RUNNING, worker_id, now, now, row['id']))
+            row = connection.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+    return _row_to_job(row)
+
+def update_job_progress(job_queue, job_id, frame_nbr, tot_nbr_frames, preview_path=None):
+    """
+    Registra el progreso de un trabajo en curso (también cuenta como latido).
+    Returns:
+        cancel_requested: Si se pidió cancelar el trabajo
+    """
+    with _connect(job_queue) as connection:
+        connection.execute('UPDATE jobs SET frame_nbr = ?, tot_nbr_frames = ?, heartbeat = ?, '
+                           'preview_path = COALESCE(?, preview_path) WHERE id = ?',
+                           (frame_nbr, tot_nbr_frames, time.time(), preview_path, job_id))
+        row = connection.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    return bool(row is not None and row['cancel_requested'])
+
+def finish_job(job_queue, job_id, status, result=None, error=None):
+    """
+    Marca un trabajo como terminado (JOB_DONE, JOB_FAILED o JOB_CANCELLED).
+    Args:
+        job_queue: Cola abierta con open_job_queue
+        job_id: ID del trabajo
+        status: Estado final
+        result: Resultado serializable a JSON (p. ej. nombres de las salidas)
+        error: Mensaje de error
+    """
+    with _connect(job_queue) as connection:
+        connection.execute('UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE id = ?',
+                           (status, time.time(), json.dumps(result) if result is not None else None, error, job_id))
+
+def release_job(job_queue, job_id):
+    """
+    Devuelve a la cola un trabajo en curso cuyo worker se está deteniendo (se reanudará desde su último checkpoint).
+    """
+    with _connect(job_queue) as connection:
+        connection.execute('UPDATE jobs SET status = ?, worker = NULL, attempts = MAX(attempts - 1, 0) WHERE id = ? AND status = ?',
+                           (JOB_QUEUED, job_id, JOB_RUNNING))
+
+def cancel_job(job_queue, job_id):
+    """
+    Cancela un trabajo: si está en cola no llega a ejecutarse; si está en curso, el worker
+    lo detiene en la siguiente actualización de progreso.
+    """
+    with _connect(job_queue) as connection:
+        connection.execute('UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?',
+                           (JOB_CANCELLED, time.time(), job_id, JOB_QUEUED))
+        connection.execute('UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?', (job_id, JOB_RUNNING))
+
+def get_job(job_queue, job_id):
+    """
+    Devuelve un trabajo por su ID (o None).
+    """
+    with _connect(job_queue, write=False) as connection:
+        return _row_to_job(connection.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+
+def list_jobs(job_queue, limit=20):
+    """
+    Devuelve los trabajos más recientes, del más nuevo al más antiguo.
+    """
+    with _connect(job_queue, write=False) as connection:
+        return [_row_to_job(row) for row in connection.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,))]
+
+def pending_job_videos(job_queue):
+    """
+    Videos de entrada de los trabajos que todavía no terminaron (en cola o en curso).
+    Returns:
+        paths: Conjunto de rutas absolutas
+    """
+    with _connect(job_queue, write=False) as connection:
+        rows = connection.execute(f'SELECT params FROM jobs WHERE status NOT IN ({", ".join("?" * len(JOB_FINAL_STATES))})',
+                                  JOB_FINAL_STATES)
+        paths = {json.loads(row['params']).get('video_path') for row in rows}
+    return {os.path.abspath(path) for path in paths if path}
+
+def queue_position(job_queue, job_id):
+    """
+    Número de trabajos en cola por delante de uno dado.
+    """
+    with _connect(job_queue, write=False) as connection:
+        return connection.execute('SELECT COUNT(*) FROM jobs WHERE status = ? AND id < ?', (JOB_QUEUED, job_id)).fetchone()[0]
+
+def worker_heartbeat(job_queue, worker_id, job_id=None):
+    """
+    Registra que un worker sigue vivo y, si tiene un trabajo en curso, también el latido del trabajo.
+    """
+    now = time.time()
+    with _connect(job_queue) as connection:
+        connection.execute('INSERT INTO workers (id, pid, started, heartbeat) VALUES (?, ?, ?, ?) '
+                           'ON CONFLICT (id) DO UPDATE SET heartbeat = excluded.heartbeat',
+                           (worker_id, os.getpid(), now, now))
+        if job_id is not None:
+            connection.execute('UPDATE jobs SET heartbeat = ? WHERE id = ?', (now, job_id))
+
+def remove_worker(job_queue, worker_id):
+    """
+    Da de baja un worker al terminar.
+    """
+    with _connect(job_queue) as connection:
+        connection.execute('DELETE FROM workers WHERE id = ?', (worker_id,))
+
+def active_workers(job_queue):
+    """
+    Workers con latido reciente.
+    """
+    with _connect(job_queue, write=False) as connection:
+        return [dict(row) for row in connection.execute('SELECT * FROM workers WHERE heartbeat >= ?',
+                                                        (time.time() - job_queue['stale_after'],))]
+
+def requeue_stale_jobs(job_queue):
+    """
+    Recupera los trabajos en curso cuyo worker dejó de dar latidos (proceso terminado o máquina reiniciada):
+    vuelven a la cola (y continúan desde su último checkpoint) o, si ya agotaron sus intentos o se pidió cancelarlos, se cierran.
+    Returns:
+        nbr_recovered: Trabajos recuperados
+    """
+    now = time.time()
+    limit = now - job_queue['stale_after']
+    with _connect(job_queue) as connection:
+        connection.execute('DELETE FROM workers WHERE heartbeat < ?', (limit,))
+        stale = [dict(row) for row in connection.execute('SELECT id, attempts, cancel_requested FROM jobs '
+                                                         'WHERE status = ? AND heartbeat < ?', (JOB_RUNNING, limit))]
+        for job in stale:
+            if job['cancel_requested']:
+                connection.execute('UPDATE jobs SET status = ?, finished = ? WHERE id = ?', (JOB_CANCELLED, now, job['id']))
+            elif job['attempts'] >= job_queue['max_attempts']:
+                connection.execute('UPDATE jobs SET status = ?, finished = ?, error = ? WHERE id = ?',
+                                   (JOB_FAILED, now, 'El worker se detuvo durante el procesamiento', job['id']))
+            else:
+                connection.execute('UPDATE jobs SET status = ?, worker = NULL WHERE id = ?', (JOB_QUEUED, job['id']))
+    return len(stale)
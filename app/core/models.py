@@ -0,0 +1,297 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import numpy as np
+from .cache import file_digest
+
+# Backends de inferencia en CPU: PyTorch eager (.pt), TorchScript, ONNX Runtime y ONNX con pesos INT8 (cuantización dinámica)
+BACKENDS = ('torch', 'torchscript', 'onnx', 'onnx-int8')
+_BACKEND_SUFFIXES = {'torchscript': '.torchscript', 'onnx': '.onnx', 'onnx-int8': '.onnx'}
+# Backends cuyo modelo exportado solo acepta el imgsz de la exportación (TorchScript traza la red e ignora dynamic=True)
+FIXED_IMGSZ_BACKENDS = ('torchscript',)
+
+# Modelos compartidos por todo el proceso: (ruta, backend, imgsz, hilos de ONNX Runtime) -> entrada del pool
+_MODEL_POOL = {}
+_MODEL_POOL_LOCK = threading.Lock()
+
+# Hilos de PyTorch del proceso: torch.set_num_threads es global, por lo que se ajusta una sola vez
+_TORCH_THREADS = {'threads': None}
+_TORCH_THREADS_LOCK = threading.Lock()
+
+class _SharedModel:
+    """
+    Modelo YOLO compartido entre sesiones (solo lectura).
+    El predictor de Ultralytics guarda estado entre llamadas y no es seguro entre hilos,
+    por lo que cada inferencia toma el lock del modelo; el resto de atributos (names, task, ...)
+    se leen directamente del modelo. El estado del tracker no vive aquí: cada trabajo crea el suyo
+    con tracker.create_tracker.
+    """
+    def __init__(self, model, ckpt_path, backend='torch', imgsz=None):
+        self.model = model
+        self.lock = threading.Lock()
+        self.ckpt_path = ckpt_path # Archivo realmente cargado (la caché de detecciones distingue así cada backend)
+        self.backend = backend
+        self.imgsz = imgsz
+
+    def predict(self, *args, **kwargs):
+        if self.imgsz is not None:
+            kwargs.setdefault('imgsz', self.imgsz)
+        with self.lock:
+            return self.model.predict(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        return self.predict(*args, **kwargs)
+
+    def track(self, *args, **kwargs):
+        # model.track guarda el tracker en el modelo y lo compartiría entre sesiones
+        raise RuntimeError('Los modelos compartidos no admiten track(); usar tracker.create_tracker y tracker.update_tracker')
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+def _quantize_onnx_dynamic(onnx_path, int8_path):
+    # Cuantización dinámica de pesos a INT8 (sin datos de calibración) conservando los metadatos de Ultralytics
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp_path = int8_path[:-len('.onnx')] + '.part.onnx'
+    try:
+        quantize_dynamic(onnx_path, tmp_path, weight_type=QuantType.QUInt8)
+        model_int8 = onnx.load(tmp_path)
+        del model_int8.metadata_props[:]
+        model_int8.metadata_props.extend(onnx.load(onnx_path, load_external_data=False).metadata_props)
+        onnx.save(model_int8, tmp_path)
+        os.replace(tmp_path, int8_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def export_model(path, backend, imgsz=640, export_dir='./cache/models/', batch=16):
+    """
+    Exporta los pesos .pt al backend indicado una sola vez; las llamadas siguientes reutilizan el archivo exportado.
+    El nombre del archivo incluye el hash de los pesos, por lo que un modelo reentrenado se vuelve a exportar.
+    Args:
+        path: Ruta del checkpoint (.pt)
+        backend: Uno de BACKENDS ('torch' no exporta y devuelve path)
+        imgsz: Tamaño de entrada del modelo exportado
+        export_dir: Directorio de modelos exportados
+        batch: Tamaño de lote máximo del modelo exportado (ejes dinámicos)
+    Returns:
+        export_path: Ruta del modelo exportado
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f'Backend desconocido: {backend} (opciones: {", ".join(BACKENDS)})')
+    if backend == 'torch':
+        return path
+
+    os.makedirs(export_dir, exist_ok=True)
+    export_path = os.path.join(export_dir, f'{file_digest(path)[:16]}_{backend}_{imgsz}{_BACKEND_SUFFIXES[backend]}')
+    if os.path.isfile(export_path):
+        return export_path
+
+    if backend == 'onnx-int8':
+        _quantize_onnx_dynamic(export_model(path, 'onnx', imgsz, export_dir, batch), export_path)
+        return export_path
+
+    # Ultralytics escribe el archivo exportado junto a los pesos: exportar desde un enlace (o copia) temporal
+    from ultralytics import YOLO # Importación diferida: solo necesaria al exportar
+    with tempfile.TemporaryDirectory(dir=export_dir) as tmp_dir:
+        tmp_weights = os.path.join(tmp_dir, 'model.pt')
+        try:
+            os.link(path, tmp_weights)
+        except OSError:
+            shutil.copyfile(path, tmp_weights)
+        exported = YOLO(tmp_weights).export(format=backend, imgsz=imgsz, dynamic=True, batch=batch, verbose=False)
+        os.replace(exported, export_path)
+    return export_path
+
+def _set_onnx_threads(model, export_path, threads):
+    # Ultralytics no expone las opciones de sesión de ONNX Runtime: recrear la sesión del predictor ya inicializado
+    backend = getattr(getattr(model.predictor, 'model', None), 'backend', None)
+    if getattr(backend, 'session', None) is None:
+        return
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    backend.session = onnxruntime.InferenceSession(export_path, options, providers=['CPUExecutionProvider'])
+
+def _set_torch_threads(threads):
+    # El primer valor pedido queda para todo el proceso: un modelo cargado después no cambia los hilos de los demás
+    with _TORCH_THREADS_LOCK:
+        if _TORCH_THREADS['threads'] is None:
+            import torch
+            torch.set_num_threads(threads)
+            _TORCH_THREADS['threads'] = threads
+
+def supports_imgsz(model, imgsz):
+    """
+    Si un modelo cargado admite inferencia con un tamaño de entrada distinto del suyo (p. ej. la ventana del balón).
+    Args:
+        model: Modelo cargado con load_model o get_model (un modelo YOLO sin envolver se trata como 'torch')
+        imgsz: Tamaño de entrada pedido
+    Returns:
+        supported: False si el backend tiene el tamaño de entrada fijo (ver FIXED_IMGSZ_BACKENDS) y imgsz es otro
+    """
+    return getattr(model, 'backend', 'torch') not in FIXED_IMGSZ_BACKENDS or imgsz == getattr(model, 'imgsz', None)
+
+def warmup_model(model, imgsz=640):
+    """
+    Ejecuta una inferencia sobre un frame negro para que la primera inferencia real no pague
+    la inicialización del predictor (fusión de capas, reserva de memoria, etc.).
+    Args:
+        model: Modelo YOLO
+        imgsz: Tamaño del frame de calentamiento (píxeles)
+    """
+    model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+
+def load_model(path, backend='torch', imgsz=None, threads=None, export_dir='./cache/models/', warmup=True):
+    """
+    Carga un modelo con el backend indicado (exportándolo si hace falta), fuera del pool del proceso.
+    Args:
+        path: Ruta del checkpoint (.pt)
+        backend: Uno de BACKENDS
+        imgsz: Tamaño de entrada (None: el del entrenamiento para 'torch', 640 para los exportados)
+        threads: Hilos de inferencia en CPU (None: los de la librería). En ONNX Runtime se aplican a la sesión del modelo;
+            en PyTorch el ajuste es global al proceso y solo se aplica el del primer modelo que los pide
+        export_dir: Directorio de modelos exportados
+        warmup: Si se ejecuta una inferencia de calentamiento al cargar
+    Returns:
+        model: Modelo listo para inferencia (ver _SharedModel)
+    """
+    if backend != 'torch' and imgsz is None:
+        imgsz = 640 # Tamaño de exportación (fijo en TorchScript, ver FIXED_IMGSZ_BACKENDS)
+    export_path = export_model(path, backend, imgsz, export_dir)
+    if threads:
+        _set_torch_threads(threads)
+
+    from ultralytics import YOLO # Importación diferida: solo necesaria al cargar
+    model = YOLO(export_path, task='detect') if backend != 'torch' else YOLO(path)
+    if warmup or (threads and backend.startswith('onnx')):
+        warmup_model(model, imgsz or 640)
+        if threads and backend.startswith('onnx'):
+            _set_onnx_threads(model, export_path, threads)
+    return _SharedModel(model, export_path, backend, imgsz)
+
+def get_model(path, backend='torch', imgsz=None, threads=None, export_dir='./cache/models/', warmup=True):
+    """
+    Devuelve el modelo del pool del proceso, cargándolo (y calentándolo) la primera vez que se pide.
+    Todas las sesiones reciben la misma instancia, por lo que los pesos se cargan una sola vez.
+    Args:
+        path: Ruta del checkpoint (.pt)
+        backend: Uno de BACKENDS
+        imgsz: Tamaño de entrada (ver load_model)
+        threads: Hilos de inferencia en CPU (ver load_model); solo distinguen modelos del pool con ONNX Runtime,
+            donde son propios de cada sesión
+        export_dir: Directorio de modelos exportados
+        warmup: Si se ejecuta una inferencia de calentamiento al cargar
+    Returns:
+        model: Modelo compartido (ver _SharedModel)
+    """
+    key = (path, backend, imgsz, threads if backend.startswith('onnx') else None)
+    with _MODEL_POOL_LOCK:
+        entry = _MODEL_POOL.setdefault(key, {'lock': threading.Lock(), 'model': None})
+
+    # Lock por modelo: dos sesiones que piden el mismo modelo esperan a una única carga,
+    # sin bloquear la carga de otros modelos
+    with entry['lock']:
+        if entry['model'] is None:
+            entry['model'] = load_model(path, backend, imgsz, threads, export_dir, warmup)
+    return entry['model']
+
+def loaded_models():
+    """
+    Modelos ya cargados en el pool del proceso: lista de (ruta, backend, imgsz, hilos de ONNX Runtime).
+    """
+    with _MODEL_POOL_LOCK:
+        return [key for key, entry in _MODEL_POOL.items() if entry['model'] is not None]
+
+def _box_iou(boxes_a, boxes_b):
+    # IoU entre dos conjuntos de bounding boxes (xyxy): matriz (A,B)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.clip(bottom_right - top_left, 0, None).prod(axis=-1)
+    area_a = (boxes_a[:, 2:] - boxes_a[:, :2]).prod(axis=-1)
+    area_b = (boxes_b[:, 2:] - boxes_b[:, :2]).prod(axis=-1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def detection_agreement(boxes_ref, cls_ref, boxes, cls, iou_thresh=0.5):
+    """
+    Coincidencia entre dos conjuntos de detecciones de un frame: F1 del emparejamiento voraz
+    por IoU (>= iou_thresh) entre detecciones de la misma clase. 1.0 si ambos están vacíos.
+    Args:
+        boxes_ref: Bounding boxes de referencia (xyxy)
+        cls_ref: Clases de referencia
+        boxes: Bounding boxes a comparar (xyxy)
+        cls: Clases a comparar
+        iou_thresh: IoU mínimo para emparejar
+    Returns:
+        agreement: Valor entre 0 y 1
+    """
+    nbr_ref, nbr = len(boxes_ref), len(boxes)
+    if nbr_ref + nbr == 0:
+        return 1.0
+    if nbr_ref == 0 or nbr == 0:
+        return 0.0
+    iou = _box_iou(np.asarray(boxes_ref, dtype=np.float64), np.asarray(boxes, dtype=np.float64))
+    iou[np.asarray(cls_ref)[:, None] != np.asarray(cls)[None, :]] = 0
+    matches = 0
+    for flat in np.argsort(-iou, axis=None):
+        i, j = np.unravel_index(flat, iou.shape)
+        if iou[i, j] < iou_thresh:
+            break
+        matches += 1
+        iou[i, :] = 0
+        iou[:, j] = 0
+    return 2 * matches / (nbr_ref + nbr)
+
+def compare_backends(path, frames, backends=BACKENDS, imgsz=640, threads=None, conf=0.25, export_dir='./cache/models/'):
+    """
+    Compara la velocidad y las detecciones de cada backend contra PyTorch eager sobre los mismos frames.
+    Cada backend se carga fuera del pool (con exportación y calentamiento, que se miden aparte)
+    y procesa los frames uno a uno.
+    Args:
+        path: Ruta del checkpoint (.pt)
+        frames: Lista de frames (BGR)
+        backends: Backends a comparar
+        imgsz: Tamaño de entrada usado por todos los backends
+        threads: Hilos de inferencia en CPU
+        conf: Umbral de confianza
+        export_dir: Directorio de modelos exportados
+    Returns:
+        report: Lista de diccionarios por backend (load_s, ms_per_frame, fps, speedup, agreement, nbr_detections)
+    """
+    report = []
+    reference = None
+    for backend in ('torch',) + tuple(b for b in backends if b != 'torch'):
+        start = time.perf_counter()
+        model = load_model(path, backend, imgsz, threads, export_dir)
+        load_s = time.perf_counter() - start
+
+        detections = []
+        start = time.perf_counter()
+        for frame in frames:
+            boxes = model.predict(frame, conf=conf, verbose=False)[0].boxes.cpu().numpy()
+            detections.append((boxes.xyxy, boxes.cls))
+        elapsed = time.perf_counter() - start
+        del model
+
+        if reference is None:
+            reference = detections
+            reference_s = elapsed
+        if backend not in backends:
+            continue
+        agreement = [detection_agreement(ref_boxes, ref_cls, boxes, cls)
+                     for (ref_boxes, ref_cls), (boxes, cls) in zip(reference, detections)]
+        report.append({
+            'backend': backend,
+            'load_s': round(load_s, 3),
+            'ms_per_frame': round(elapsed / max(len(frames), 1) * 1000, 2),
+            'fps': round(len(frames) / elapsed, 2) if elapsed > 0 else None,
+            'speedup': round(reference_s / elapsed, 3) if elapsed > 0 else None,
+            'agreement': round(float(np.mean(agreement)), 4) if agreement else None,
+            'nbr_detections': int(sum(len(boxes) for boxes, _ in detections))
+        })
+    return report
@@ -0,0 +1,137 @@
+import cv2
+import numpy as np
+
+def to_motion_gray(frame, max_width=640):
+    """
+    Convierte un frame a escala de grises reducida para estimar el movimiento de cámara.
+    Args:
+        frame: Frame de entrada (BGR)
+        max_width: Ancho máximo de la imagen reducida
+    Returns:
+        gray: Imagen en escala de grises reducida
+        scale: Factor de escala aplicado (reducida = original * scale)
+    """
+    scale = min(1.0, max_width / frame.shape[1])
+    if scale < 1.0:
+        frame = cv2.resize(frame, (int(frame.shape[1] * scale), int(frame.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), scale
+
+def pitch_mask(frame, max_width=640):
+    """
+    Máscara aproximada del césped (tonos verdes) para buscar textura solo sobre el campo.
+    Args:
+        frame: Frame de entrada (BGR)
+        max_width: Ancho máximo (debe coincidir con to_motion_gray)
+    Returns:
+        mask: Máscara uint8 (255 = campo)
+    """
+    scale = min(1.0, max_width / frame.shape[1])
+    if scale < 1.0:
+        frame = cv2.resize(frame, (int(frame.shape[1] * scale), int(frame.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    return cv2.inRange(hsv, (30, 40, 40), (90, 255, 255))
+
+def estimate_camera_motion(prev_gray, gray, mask=None, max_corners=300, min_inliers=15):
+    """
+    Estima el movimiento global de cámara entre dos frames con flujo óptico disperso (Lucas-Kanade).
+    Args:
+        prev_gray: Frame anterior en escala de grises
+        gray: Frame actual en escala de grises
+        mask: Máscara opcional de zonas donde buscar esquinas (p. ej. el césped)
+        max_corners: Número máximo de esquinas a seguir
+        min_inliers: Mínimo de correspondencias válidas para aceptar la estimación
+    Returns:
+        camera_motion: Homografía 3x3 del frame anterior al actual (None si no es fiable)
+        displacement: Desplazamiento medio de las esquinas en píxeles (None si no es fiable)
+    """
+    prev_pts = cv2.goodFeaturesToTrack(prev_gray, maxCorners=max_corners, qualityLevel=0.01, minDistance=8, mask=mask)
+    if prev_pts is None or len(prev_pts) < min_inliers:
+        return None, None
+
+    next_pts, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, prev_pts, None, winSize=(21, 21), maxLevel=3)
+    tracked = status.ravel() == 1
+    prev_pts, next_pts = prev_pts[tracked], next_pts[tracked]
+    if len(prev_pts) < min_inliers:
+        return None, None
+
+    camera_motion, inliers = cv2.findHomography(prev_pts, next_pts, cv2.RANSAC, 3.0)
+    if camera_motion is None or inliers.sum() < min_inliers:
+        return None, None
+
+    inliers = inliers.ravel() == 1
+    displacement = float(np.linalg.norm(next_pts[inliers] - prev_pts[inliers], axis=-1).mean())
+    return camera_motion, displacement
+
+def rescale_homography(homog, scale):
+    """
+    Lleva una homografía estimada sobre imágenes reducidas a coordenadas de tamaño completo.
+    Args:
+        homog: Homografía 3x3 en coordenadas reducidas
+        scale: Factor de escala usado al reducir
+    Returns:
+        homog_full: Homografía 3x3 en coordenadas originales
+    """
+    if scale == 1.0:
+        return homog
+    s = np.diag([scale, scale, 1.0])
+    return np.linalg.inv(s) @ homog @ s
+
+def init_motion_state(keypoints_interval, motion_thresh):
+    """
+    Crea el estado del planificador de inferencia de keypoints.
+    Args:
+        keypoints_interval: Ejecutar el modelo de keypoints al menos cada K frames
+        motion_thresh: Desplazamiento acumulado de cámara (píxeles del frame reducido) que fuerza una actualización
+    Returns:
+        motion_state: Diccionario de estado del planificador
+    """
+    return {
+        'keypoints_interval': keypoints_interval,
+        'motion_thresh': motion_thresh,
+        'prev_gray': None, # Frame anterior reducido
+        'prev_mask': None, # Máscara del césped del frame anterior (las esquinas se buscan en ese frame)
+        'frames_since_refresh': 0, # Frames desde la última inferencia de keypoints
+        'accumulated_motion': 0.0, # Desplazamiento de cámara acumulado desde la última inferencia
+        'keypoints_ok': False # Si la última inferencia de keypoints permitió calcular una homografía
+    }
+
+def schedule_keypoints(motion_state, frame):
+    """
+    Estima el movimiento de cámara del frame y decide si ejecutar el modelo de keypoints.
+    Se ejecuta cuando aún no hay keypoints suficientes, cuando falla la estimación de movimiento,
+    cuando el movimiento acumulado supera el umbral o cada keypoints_interval frames.
+    Args:
+        motion_state: Estado del planificador (se actualiza in place)
+        frame: Frame actual (BGR)
+    Returns:
+        run_keypoints: Si ejecutar el modelo de keypoints en este frame
+        camera_motion: Homografía 3x3 del frame anterior al actual en píxeles originales (o None)
+    """
+    gray, scale = to_motion_gray(frame)
+    mask = pitch_mask(frame)
+    camera_motion = None
+    if motion_state['prev_gray'] is not None:
+        camera_motion, displacement = estimate_camera_motion(motion_state['prev_gray'], gray, motion_state.get('prev_mask'))
+        if camera_motion is not None:
+            camera_motion = rescale_homography(camera_motion, scale)
+            motion_state['accumulated_motion'] += displacement
+    motion_state['prev_gray'] = gray
+    motion_state['prev_mask'] = mask
+    motion_state['frames_since_refresh'] += 1
+
+    run_keypoints = (not motion_state['keypoints_ok'] or camera_motion is None
+                     or motion_state['accumulated_motion'] > motion_state['motion_thresh']
+                     or motion_state['frames_since_refresh'] >= motion_state['keypoints_interval'])
+    if run_keypoints:
+        motion_state['frames_since_refresh'] = 0
+        motion_state['accumulated_motion'] = 0.0
+    return run_keypoints, camera_motion
+
+def update_keypoints_status(motion_state, nbr_keypoints):
+    """
+    Registra si la última inferencia de keypoints detectó suficientes puntos para una homografía.
+    Args:
+        motion_state: Estado del planificador
+        nbr_keypoints: Número de keypoints detectados
+    """
+    motion_state['keypoints_ok'] = nbr_keypoints > 3
@@ -1,4 +1,8 @@
+import os
 import cv2
+import shutil
+import tempfile
+import subprocess
 
 def write_processed_video(processed_output, annotated_frame, output_file_name, fps, save_processed_separately):
     """
@@ -102,3 +106,69 @@ def release_video_writers(processed_output, tactical_output, combined_output,
     combined_name = f'{output_file_name}_combined.mp4' if save_combined else None
 
     return processed_name, tactical_name, combined_name
+
+def concat_videos_copy(paths, output_path):
+    """
+    Une varios videos con los mismos parámetros de códec sin decodificarlos ni recodificarlos
+    (copia de flujo con el demuxer concat de ffmpeg). OpenCV no permite añadir frames a un contenedor
+    existente, por lo que hace falta el ejecutable ffmpeg en el PATH.
+    Args:
+        paths: Rutas de los videos a unir, en orden
+        output_path: Ruta del video de salida
+    Returns:
+        joined: True si se unieron; False si ffmpeg no está disponible o falló (output_path no se crea)
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None or not paths:
+        return False
+    fd, list_path = tempfile.mkstemp(suffix='.txt', dir=os.path.dirname(os.path.abspath(output_path)))
+    tmp_path = f'{output_path}.part.mp4'
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for path in paths:
+                f.write("file '{}'\n".format(os.path.abspath(path).replace("'", "'\\''")))
+        result = subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+                                 '-c', 'copy', '-movflags', '+faststart', tmp_path],
+                                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if result.returncode != 0 or not os.path.isfile(tmp_path):
+            return False
+        os.replace(tmp_path, output_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        os.remove(list_path)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def concat_videos(paths, output_path, fps):
+    """
+    Une varios videos del mismo tamaño en uno solo, en orden (p. ej. los tramos del procesamiento en paralelo).
+    Args:
+        paths: Rutas de los videos a unir (se omiten las que no existen)
+        output_path: Ruta del video de salida
+        fps: FPS del video de salida
+    Returns:
+        nbr_frames: Frames escritos
+    """
+    writer = None
+    nbr_frames = 0
+    try:
+        for path in paths:
+            cap = cv2.VideoCapture(path)
+            try:
+                while True:
+                    success, frame = cap.read()
+                    if not success:
+                        break
+                    if writer is None:
+                        height, width, _ = frame.shape
+                        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'avc1'), fps, (width, height))
+                    writer.write(frame)
+                    nbr_frames += 1
+            finally:
+                cap.release()
+    finally:
+        if writer is not None:
+            writer.release()
+    return nbr_frames
@@ -0,0 +1,126 @@
+import queue
+import threading
+
+# Marcador de fin de flujo entre etapas
+_END = object()
+
+class _StageError:
+    """
+    Envuelve una excepción producida en una etapa para re-lanzarla en el hilo consumidor.
+    """
+    def __init__(self, exc):
+        self.exc = exc
+
+def _put(q, item, stop_event):
+    """
+    Inserta en una cola acotada sin bloquear indefinidamente si el pipeline se detuvo.
+    Returns:
+        True si se insertó, False si el pipeline fue detenido
+    """
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q, stop_event):
+    """
+    Extrae de una cola sin bloquear indefinidamente si el pipeline se detuvo.
+    Returns:
+        Elemento extraído o _END si el pipeline fue detenido
+    """
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+def _source_worker(source, out_q, stop_event):
+    try:
+        for item in source:
+            if not _put(out_q, item, stop_event):
+                return
+    except BaseException as exc:
+        _put(out_q, _StageError(exc), stop_event)
+        return
+    _put(out_q, _END, stop_event)
+
+def _stage_worker(stage, in_q, out_q, stop_event):
+    while True:
+        item = _get(in_q, stop_event)
+        if item is _END or isinstance(item, _StageError):
+            _put(out_q, item, stop_event) # Propagar fin o error hacia abajo
+            return
+        try:
+            result = stage(item)
+        except BaseException as exc:
+            _put(out_q, _StageError(exc), stop_event)
+            return
+        if result is not None: # Una etapa puede descartar elementos devolviendo None
+            if not _put(out_q, result, stop_event):
+                return
+
+def run_stages(source, stages, queue_size=4, threaded=True):
+    """
+    Ejecuta un pipeline lineal de etapas conectadas por colas acotadas.
+    El iterable fuente se consume en un hilo lector y cada etapa corre en su propio hilo,
+    de modo que cada etapa procesa los elementos en orden FIFO y la salida conserva el orden de entrada.
+    Los resultados de la última etapa se entregan en el hilo que llama (útil para la interfaz).
+    Args:
+        source: Iterable de elementos de entrada (p. ej. frames decodificados)
+        stages: Lista de funciones item -> item (devolver None descarta el elemento)
+        queue_size: Capacidad de cada cola entre etapas
+        threaded: Si False, ejecuta todas las etapas en el hilo actual (mismo resultado, sin hilos)
+    Returns:
+        Generador con los resultados de la última etapa
+    """
+    if not threaded:
+        for item in source:
+            for stage in stages:
+                item = stage(item)
+                if item is None:
+                    break
+            if item is not None:
+                yield item
+        return
+
+    stop_event = threading.Event()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    threads = [threading.Thread(target=_source_worker, args=(source, queues[0], stop_event),
+                                name='pipeline-source', daemon=True)]
+    for i, stage in enumerate(stages):
+        threads.append(threading.Thread(target=_stage_worker, args=(stage, queues[i], queues[i + 1], stop_event),
+                                        name=f'pipeline-stage-{i}', daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = _get(queues[-1], stop_event)
+            if item is _END:
+                break
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        # Detener todas las etapas (también si el consumidor abandona el generador)
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+def items_in_flight(queue_size=4, threaded=True):
+    """
+    Número máximo de resultados de la última etapa que pueden estar vivos a la vez
+    (el que produce la etapa, los que esperan en la cola de salida y el que usa el consumidor).
+    Sirve para dimensionar buffers reutilizados entre elementos sin que una etapa sobrescriba
+    uno que el consumidor todavía no terminó de usar.
+    Args:
+        queue_size: Capacidad de las colas (igual que en run_stages)
+        threaded: Si el pipeline corre en hilos (igual que en run_stages)
+    Returns:
+        nbr_items: Número de elementos
+    """
+    return queue_size + 2 if threaded else 1
@@ -0,0 +1,135 @@
+import cv2
+import numpy as np
+from .homography import chain_homography, keypoints_to_slots, transform_points
+
+def map_bounds(keypoints_map_pos):
+    """
+    Límites del campo en el mapa táctico a partir de las posiciones de keypoints (map_labels_position.json).
+    Args:
+        keypoints_map_pos: Diccionario de posiciones de keypoints en el mapa táctico
+    Returns:
+        bounds: Array (x_min, y_min, x_max, y_max) en píxeles del mapa
+    """
+    points = np.array(list(keypoints_map_pos.values()), dtype=np.float64)
+    return np.concatenate([points.min(axis=0), points.max(axis=0)])
+
+def create_pitch_region(keypoints_dst, bounds, map_margin=15.0, top_margin=0.12, pad=16, max_age=50, min_gain=0.1):
+    """
+    Crea el estado de la región del campo para la etapa de inferencia.
+    Con la homografía de los keypoints se obtiene el polígono del campo en la imagen: el modelo de jugadores
+    solo procesa su rectángulo envolvente y se descartan los jugadores cuyos pies caen fuera del campo.
+    Es independiente de la homografía de la etapa de anotación, que va por detrás en el pipeline.
+    Args:
+        keypoints_dst: Posiciones de keypoints en el mapa por clase (ver config.get_keypoints_map_array)
+        bounds: Límites del campo en el mapa (ver map_bounds)
+        map_margin: Margen alrededor del campo (píxeles del mapa) en el que se aceptan jugadores (bandas, saques)
+        top_margin: Fracción del alto del frame añadida sobre el recorte (cuerpo de los jugadores de la banda lejana)
+        pad: Margen del recorte en píxeles del frame (movimiento de cámara entre lotes)
+        max_age: Frames sin homografía tras los que la región deja de usarse
+        min_gain: Fracción mínima del frame que debe ahorrar el recorte para aplicarse
+    Returns:
+        pitch_region: Diccionario con el estado de la región
+    """
+    x_min, y_min, x_max, y_max = bounds
+    return {
+        'keypoints_dst': keypoints_dst,
+        'bounds': np.array([x_min - map_margin, y_min - map_margin, x_max + map_margin, y_max + map_margin]),
+        'top_margin': top_margin,
+        'pad': pad,
+        'max_age': max_age,
+        'min_gain': min_gain,
+        'homog': None, # Homografía frame -> mapa más reciente
+        'age': 0, # Frames desde la última homografía calculada con keypoints
+        'nbr_rejected': 0 # Jugadores descartados fuera del campo
+    }
+
+def update_pitch_region(pitch_region, result_keypoints=None, camera_motion=None):
+    """
+    Actualiza la homografía de la región con los keypoints del frame o, si no se ejecutó el modelo
+    de keypoints, la propaga con el movimiento de cámara.
+    Args:
+        pitch_region: Estado de la región (se actualiza in place)
+        result_keypoints: Resultado de YOLO de keypoints del frame (o None)
+        camera_motion: Homografía del frame anterior al actual (o None)
+    """
+    homog = None
+    if result_keypoints is not None:
+        boxes_k = result_keypoints.boxes
+        keypoints_src, keypoints_mask = keypoints_to_slots(boxes_k.cls.cpu().numpy(), boxes_k.xywh.cpu().numpy(),
+                                                           pitch_region['keypoints_dst'].shape[0])
+        if np.count_nonzero(keypoints_mask) > 3:
+            homog, _ = cv2.findHomography(keypoints_src[keypoints_mask], pitch_region['keypoints_dst'][keypoints_mask])
+    if homog is not None:
+        pitch_region['homog'] = homog
+        pitch_region['age'] = 0
+        return
+    if pitch_region['homog'] is not None and camera_motion is not None:
+        pitch_region['homog'] = chain_homography(pitch_region['homog'], camera_motion)
+    pitch_region['age'] += 1
+
+def _region_homog(pitch_region):
+    if pitch_region['homog'] is None or pitch_region['age'] > pitch_region['max_age']:
+        return None
+    return pitch_region['homog']
+
+def pitch_polygon(pitch_region):
+    """
+    Polígono del campo (con margen) en coordenadas del frame.
+    Returns:
+        polygon: Array (4,2), o None sin homografía o si alguna esquina queda detrás de la cámara
+    """
+    homog = _region_homog(pitch_region)
+    if homog is None:
+        return None
+    x_min, y_min, x_max, y_max = pitch_region['bounds']
+    corners = np.array([[x_min, y_min, 1], [x_max, y_min, 1], [x_max, y_max, 1], [x_min, y_max, 1]])
+    projected = corners @ np.linalg.inv(homog).T
+    if np.any(projected[:, 2] <= 0):
+        return None
+    return projected[:, :2] / projected[:, 2:]
+
+def pitch_crop(pitch_region, frame_shape):
+    """
+    Rectángulo del frame que contiene el campo, ampliado hacia arriba para incluir el cuerpo de los jugadores.
+    Args:
+        pitch_region: Estado de la región
+        frame_shape: Forma de los frames (alto, ancho, ...)
+    Returns:
+        crop: (x1,y1,x2,y2) enteros, o None si no hay región o el recorte no ahorra al menos min_gain del frame
+    """
+    polygon = pitch_polygon(pitch_region)
+    if polygon is None:
+        return None
+    height, width = frame_shape[:2]
+    pad = pitch_region['pad']
+    x1 = int(min(max(polygon[:, 0].min() - pad, 0), width))
+    x2 = int(min(max(polygon[:, 0].max() + pad, 0), width))
+    y1 = int(min(max(polygon[:, 1].min() - pad - pitch_region['top_margin'] * height, 0), height))
+    y2 = int(min(max(polygon[:, 1].max() + pad, 0), height))
+    if x2 - x1 < 32 or y2 - y1 < 32 or (x2 - x1) * (y2 - y1) > (1 - pitch_region['min_gain']) * width * height:
+        return None
+    return x1, y1, x2, y2
+
+def on_pitch(pitch_region, bboxes_xyxy, labels):
+    """
+    Máscara de detecciones a conservar: se descartan los jugadores (etiqueta 0) cuyos pies (centro inferior
+    del bounding box) se proyectan fuera de los límites del mapa; el resto de clases se conservan siempre.
+    Args:
+        pitch_region: Estado de la región (cuenta los descartes)
+        bboxes_xyxy: Bounding boxes (x1,y1,x2,y2) en coordenadas del frame
+        labels: Etiquetas de detección
+    Returns:
+        keep: Array booleano (N,), o None si no hay homografía (conservar todo)
+    """
+    homog = _region_homog(pitch_region)
+    if homog is None:
+        return None
+    bboxes_xyxy = np.asarray(bboxes_xyxy, dtype=np.float64).reshape(-1, 4)
+    players = np.asarray(labels).reshape(-1) == 0
+    feet = np.stack([(bboxes_xyxy[:, 0] + bboxes_xyxy[:, 2]) / 2, bboxes_xyxy[:, 3]], axis=1)
+    feet_dst = transform_points(homog, feet)
+    x_min, y_min, x_max, y_max = pitch_region['bounds']
+    inside = (feet_dst[:, 0] >= x_min) & (feet_dst[:, 0] <= x_max) & (feet_dst[:, 1] >= y_min) & (feet_dst[:, 1] <= y_max)
+    keep = inside | ~players
+    pitch_region['nbr_rejected'] += int(np.count_nonzero(~keep))
+    return keep
@@ -1,8 +1,55 @@
-import cv2
 import numpy as np
-import pandas as pd
 import skimage.color
-from PIL import Image
+
+# Paleta web de 216 colores (6 niveles por canal, los mismos colores que Image.Palette.WEB de Pillow)
+_WEB_LEVELS = np.arange(0, 256, 51, dtype=np.uint8)
+_WEB_PALETTE_RGB = np.stack(np.meshgrid(_WEB_LEVELS, _WEB_LEVELS, _WEB_LEVELS, indexing='ij'), axis=-1).reshape(-1, 3) # Índice r*36+g*6+b
+_WEB_LEVEL_LUT = np.rint(np.arange(256) / 51).astype(np.int16) # Valor de canal (0-255) -> nivel web (0-5)
+_NBR_WEB_COLORS = _WEB_PALETTE_RGB.shape[0]
+
+def _center_crop(frame, bbox):
+    # Recorte central del bounding box (zona de la camiseta), limitado al frame
+    height, width = frame.shape[:2]
+    x1, y1 = min(max(int(bbox[0]), 0), width), min(max(int(bbox[1]), 0), height)
+    x2, y2 = min(max(int(bbox[2]), 0), width), min(max(int(bbox[3]), 0), height)
+    obj_img = frame[y1:y2, x1:x2]
+    obj_img_w, obj_img_h = obj_img.shape[1], obj_img.shape[0]
+    center_filter_x1 = max((obj_img_w//2)-(obj_img_w//5), 1)
+    center_filter_x2 = (obj_img_w//2)+(obj_img_w//5)
+    center_filter_y1 = max((obj_img_h//3)-(obj_img_h//5), 1)
+    center_filter_y2 = (obj_img_h//3)+(obj_img_h//5)
+    return obj_img[center_filter_y1:center_filter_y2, center_filter_x1:center_filter_x2]
+
+def extract_palettes_batch(frame, bboxes_p, labels_p, num_pal_colors):
+    """
+    Extrae las paletas de colores dominantes de todos los jugadores de un frame en un solo paso.
+    Los recortes se cuantizan a la paleta web de 216 colores con una tabla de NumPy y los
+    histogramas de todos los jugadores se cuentan con un único bincount.
+    Args:
+        frame: Frame de entrada (BGR)
+        bboxes_p: Bounding boxes de detecciones (xyxy)
+        labels_p: Etiquetas de detección (solo se usan los jugadores, etiqueta 0)
+        num_pal_colors: Número de colores a extraer de la paleta
+    Returns:
+        palettes: Array (P,num_pal_colors,3) uint8 con los colores (RGB) ordenados por frecuencia
+        palette_mask: Array (P,num_pal_colors) bool, False en posiciones sin color (recortes pequeños)
+    """
+    players = [i for i, label in enumerate(labels_p) if int(label) == 0]
+    nbr_players = len(players)
+    if nbr_players == 0:
+        return np.empty((0, num_pal_colors, 3), dtype=np.uint8), np.empty((0, num_pal_colors), dtype=bool)
+
+    # Índice de color web de cada píxel, desplazado por jugador para contar todo con un bincount
+    color_idx = []
+    for p, i in enumerate(players):
+        levels = _WEB_LEVEL_LUT[_center_crop(frame, bboxes_p[i, :])] # (h,w,3) niveles BGR
+        color_idx.append((levels[..., 2] * 36 + levels[..., 1] * 6 + levels[..., 0]).ravel() + p * _NBR_WEB_COLORS)
+    counts = np.bincount(np.concatenate(color_idx), minlength=nbr_players * _NBR_WEB_COLORS).reshape(nbr_players, _NBR_WEB_COLORS)
+
+    # Colores más frecuentes de cada jugador
+    top_colors = np.argsort(-counts, axis=1, kind='stable')[:, :num_pal_colors]
+    palette_mask = np.take_along_axis(counts, top_colors, axis=1) > 0
+    return _WEB_PALETTE_RGB[top_colors], palette_mask
 
 def extract_player_palettes(frame, bboxes_p, labels_p, num_pal_colors):
     """
@@ -15,80 +62,80 @@ def extract_player_palettes(frame, bboxes_p, labels_p, num_pal_colors):
     Returns:
         obj_palette_list: Lista de paletas de colores para cada jugador
     """
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) # Convertir frame a RGB
-    obj_palette_list = [] # Inicializar lista de paletas de colores de jugadores
-    palette_interval = (0, num_pal_colors) # Intervalo de colores a extraer de la paleta de colores dominantes
-
-    # Bucle sobre jugadores detectados (etiqueta 0) y extraer paleta de colores dominantes basada en intervalo definido
-    for i, j in enumerate(labels_p):
-        if int(j) == 0:
-            bbox = bboxes_p[i, :]  # Obtener info de bbox (x,y,x,y)
-            obj_img = frame_rgb[int(bbox[1]):int(bbox[3]), int(bbox[0]):int(bbox[2])]  # Recortar bbox del frame
-            obj_img_w, obj_img_h = obj_img.shape[1], obj_img.shape[0]
-            center_filter_x1 = np.max([(obj_img_w//2)-(obj_img_w//5), 1])
-            center_filter_x2 = (obj_img_w//2)+(obj_img_w//5)
-            center_filter_y1 = np.max([(obj_img_h//3)-(obj_img_h//5), 1])
-            center_filter_y2 = (obj_img_h//3)+(obj_img_h//5)
-            center_filter = obj_img[center_filter_y1:center_filter_y2,
-                                    center_filter_x1:center_filter_x2]
-            obj_pil_img = Image.fromarray(np.uint8(center_filter)) # Convertir a imagen pillow
-            reduced = obj_pil_img.convert("P", palette=Image.Palette.WEB) # Convertir a paleta web (216 colores)
-            palette = reduced.getpalette() # Obtener paleta como [r,g,b,r,g,b,...]
-            palette = [palette[3*n:3*n+3] for n in range(256)] # Agrupar 3 por 3 = [[r,g,b],[r,g,b],...]
-            color_count = [(n, palette[m]) for n, m in reduced.getcolors()] # Crear lista de colores de paleta con su frecuencia
-            RGB_df = pd.DataFrame(color_count, columns=['cnt', 'RGB']).sort_values( # Crear dataframe basado en intervalo de paleta definido
-                            by='cnt', ascending=False).iloc[
-                                palette_interval[0]:palette_interval[1], :]
-            palette = list(RGB_df.RGB) # Convertir paleta a lista (para procesamiento más rápido)
+    palettes, palette_mask = extract_palettes_batch(frame, bboxes_p, labels_p, num_pal_colors)
+    return [palette[mask].tolist() for palette, mask in zip(palettes, palette_mask)]
 
-            # Actualizar lista de paletas de colores de jugadores detectados
-            obj_palette_list.append(palette)
-
-    return obj_palette_list
+def colors_to_lab(colors_rgb):
+    """
+    Convierte colores RGB (0-255) a espacio L*a*b* en una sola llamada.
+    Args:
+        colors_rgb: Array (...,3) de colores RGB
+    Returns:
+        colors_lab: Array (...,3) en espacio L*a*b*
+    """
+    colors_rgb = np.asarray(colors_rgb, dtype=np.float64)
+    if colors_rgb.size == 0:
+        return colors_rgb.reshape(colors_rgb.shape[:-1] + (3,))
+    return skimage.color.rgb2lab(colors_rgb / 255)
 
-def calculate_distance_features(obj_palette_list, color_list_lab):
+def calculate_distance_features(obj_palette_list, color_list_lab, palette_mask=None):
     """
     Calcula distancias entre paletas de jugadores y colores de equipos.
+    Todas las paletas se convierten a Lab juntas y las distancias (deltaE CIE76) se calculan con un solo broadcast.
     Args:
-        obj_palette_list: Lista de paletas de colores de jugadores
+        obj_palette_list: Paletas de colores de jugadores (array (P,C,3) o lista de paletas)
         color_list_lab: Colores de equipos en espacio Lab
+        palette_mask: Array (P,C) opcional con las posiciones válidas de las paletas
     Returns:
-        players_distance_features: Características de distancia para cada jugador
+        players_distance_features: Array (P,C,T) de distancias (inf en posiciones sin color)
     """
-    players_distance_features = []
-    # Bucle sobre paletas de colores extraídas de jugadores detectados
-    for palette in obj_palette_list:
-        palette_distance = []
-        palette_lab = [skimage.color.rgb2lab([i/255 for i in color]) for color in palette]  # Convertir colores a espacio L*a*b*
-        # Bucle sobre colores en paleta
-        for color in palette_lab:
-            distance_list = []
-            # Bucle sobre lista predefinida de colores de equipos
-            for c in color_list_lab:
-                distance = skimage.color.deltaE_cie76(color, c) # Calcular distancia euclidiana en espacio de color Lab
-                distance_list.append(distance) # Actualizar lista de distancias para color actual
-            palette_distance.append(distance_list) # Actualizar lista de distancias para paleta actual
-        players_distance_features.append(palette_distance) # Actualizar lista de características de distancia
+    if isinstance(obj_palette_list, np.ndarray):
+        palettes = obj_palette_list
+    else:
+        # Paletas de distinto largo: rellenar y enmascarar
+        nbr_colors = max((len(palette) for palette in obj_palette_list), default=0)
+        palettes = np.zeros((len(obj_palette_list), nbr_colors, 3))
+        palette_mask = np.zeros((len(obj_palette_list), nbr_colors), dtype=bool)
+        for p, palette in enumerate(obj_palette_list):
+            if len(palette) > 0:
+                palettes[p, :len(palette)] = palette
+                palette_mask[p, :len(palette)] = True
 
+    palettes_lab = colors_to_lab(palettes) # (P,C,3)
+    color_list_lab = np.asarray(color_list_lab, dtype=np.float64).reshape(-1, 3) # (T,3)
+    players_distance_features = np.linalg.norm(palettes_lab[:, :, None, :] - color_list_lab[None, None, :, :], axis=-1)
+    if palette_mask is not None:
+        players_distance_features[~palette_mask] = np.inf
     return players_distance_features
 
+def team_votes(distance_features, nbr_team_colors, nbr_teams=None):
+    """
+    Cuenta, para cada jugador, cuántos colores de su paleta están más cerca de cada equipo.
+    Args:
+        distance_features: Array (P,C,T) de distancias (ver calculate_distance_features)
+        nbr_team_colors: Número de colores por equipo
+        nbr_teams: Número de equipos (por defecto T // nbr_team_colors)
+    Returns:
+        votes: Array (P,nbr_teams) con el número de votos por equipo
+    """
+    distance_features = np.asarray(distance_features, dtype=np.float64)
+    nbr_players, nbr_colors, nbr_refs = distance_features.shape
+    nbr_teams = nbr_teams or nbr_refs // nbr_team_colors
+    team_idx = distance_features.argmin(axis=-1) // nbr_team_colors # (P,C) equipo del color más cercano
+    valid = np.isfinite(distance_features.min(axis=-1)) # Ignorar posiciones sin color
+    flat = (team_idx + np.arange(nbr_players)[:, None] * nbr_teams)[valid]
+    return np.bincount(flat, minlength=nbr_players * nbr_teams).reshape(nbr_players, nbr_teams)
+
 def predict_teams(distance_features, nbr_team_colors):
     """
     Predice equipos de jugadores basados en características de distancia.
     Args:
-        distance_features: Características de distancia para cada jugador
+        distance_features: Array (P,C,T) de distancias para cada jugador
         nbr_team_colors: Número de colores por equipo
     Returns:
-        players_teams_list: Índices de equipos predichos para cada jugador
+        players_teams_list: Índices de equipos predichos para cada jugador (equipo 0 si no hay colores válidos)
     """
-    players_teams_list = []
-    # Bucle sobre características de distancia de jugadores
-    for distance_feats in distance_features:
-        vote_list = []
-        # Bucle sobre distancias para cada color
-        for dist_list in distance_feats:
-            team_idx = dist_list.index(min(dist_list)) // nbr_team_colors # Asignar índice de equipo para color actual basado en distancia mínima
-            vote_list.append(team_idx) # Actualizar lista de votos con predicción de equipo de color actual
-        players_teams_list.append(max(vote_list, key=vote_list.count)) # Predecir equipo de jugador actual por conteo de votos
-
-    return players_teams_list
+    if len(distance_features) == 0:
+        return []
+    # Predecir equipo de cada jugador por conteo de votos
+    return team_votes(distance_features, nbr_team_colors).argmax(axis=1).tolist()
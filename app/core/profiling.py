@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+import collections
+import numpy as np
+
+# Etapas medidas por process_video, en el orden del pipeline
+PROFILE_STAGES = ('decode', 'camera_motion', 'players_inference', 'keypoints_inference', 'ball_inference', 'tracker',
+                  'cache_read', 'homography', 'annotation', 'compositing', 'encode', 'ui_push')
+
+def _new_stage(window):
+    return {'calls': 0, 'frames': 0, 'total': 0.0, 'max': 0.0, 'recent': collections.deque(maxlen=window)}
+
+def create_metrics(window=500):
+    """
+    Crea el registro de métricas de una ejecución: latencias por etapa, contadores y memoria máxima.
+    Las etapas corren en hilos distintos del pipeline, por lo que sus tiempos se solapan:
+    la suma de los tiempos de todas las etapas puede superar la duración total de la ejecución.
+    Args:
+        window: Número de mediciones recientes por etapa con las que se calculan los percentiles
+    Returns:
+        metrics: Diccionario de métricas (ver record_stage, increment_counter y metrics_summary)
+    """
+    return {
+        'window': window,
+        'stages': {name: _new_stage(window) for name in PROFILE_STAGES},
+        'counters': collections.defaultdict(int),
+        'peak_rss_bytes': None,
+        'start': time.perf_counter(),
+        'end': None,
+        'lock': threading.Lock()
+    }
+
+def record_stage(metrics, stage, seconds, nbr_frames=1):
+    """
+    Registra la duración de una llamada a una etapa.
+    Args:
+        metrics: Métricas creadas con create_metrics (None: no hace nada)
+        stage: Nombre de la etapa
+        seconds: Duración de la llamada
+        nbr_frames: Frames procesados en la llamada (la latencia reciente se guarda por frame)
+    """
+    if metrics is None:
+        return
+    with metrics['lock']:
+        stats = metrics['stages'].get(stage)
+        if stats is None:
+            stats = metrics['stages'][stage] = _new_stage(metrics['window'])
+        per_frame = seconds / max(1, nbr_frames)
+        stats['calls'] += 1
+        stats['frames'] += nbr_frames
+        stats['total'] += seconds
+        stats['max'] = max(stats['max'], per_frame)
+        stats['recent'].append(per_frame)
+
+@contextlib.contextmanager
+def stage_timer(metrics, stage, nbr_frames=1):
+    """
+    Mide el bloque como una llamada a la etapa (sin coste si metrics es None).
+    Args:
+        metrics: Métricas creadas con create_metrics (o None)
+        stage: Nombre de la etapa
+        nbr_frames: Frames procesados en el bloque
+    """
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(metrics, stage, time.perf_counter() - start, nbr_frames)
+
+def timed_iter(metrics, stage, iterable, count=len):
+    """
+    Envuelve un iterable midiendo el tiempo de obtener cada elemento (p. ej. la lectura de frames).
+    Args:
+        metrics: Métricas creadas con create_metrics (None: devuelve el iterable sin cambios)
+        stage: Nombre de la etapa
+        iterable: Iterable a medir
+        count: Función elemento -> número de frames que contiene
+    Returns:
+        Generador con los mismos elementos
+    """
+    if metrics is None:
+        return iterable
+
+    def timed():
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            record_stage(metrics, stage, time.perf_counter() - start, count(item))
+            yield item
+
+    return timed()
+
+def timed_callback(metrics, stage, callback):
+    """
+    Envuelve un callback midiendo cada llamada (p. ej. el envío del progreso a la interfaz).
+    Returns:
+        callback medido, o el mismo callback si metrics o callback son None
+    """
+    if metrics is None or callback is None:
+        return callback
+
+    def timed(*args, **kwargs):
+        with stage_timer(metrics, stage):
+            return callback(*args, **kwargs)
+
+    return timed
+
+def increment_counter(metrics, name, value=1):
+    """
+    Incrementa un contador (p. ej. frames procesados u homografías recalculadas).
+    """
+    if metrics is None:
+        return
+    with metrics['lock']:
+        metrics['counters'][name] += value
+
+def peak_rss_bytes():
+    """
+    Memoria residente máxima del proceso desde su inicio.
+    Returns:
+        Bytes, o None si la plataforma no la expone
+    """
+    try:
+        import resource
+    except ImportError: # Windows
+        try:
+            import psutil
+            return int(psutil.Process().memory_info().peak_wset)
+        except (ImportError, AttributeError):
+            return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(max_rss if sys.platform == 'darwin' else max_rss * 1024) # macOS en bytes, Linux en KiB
+
+def update_peak_rss(metrics):
+    """
+    Actualiza la memoria residente máxima registrada.
+    """
+    if metrics is None:
+        return
+    rss = peak_rss_bytes()
+    if rss is not None:
+        metrics['peak_rss_bytes'] = max(rss, metrics['peak_rss_bytes'] or 0)
+
+def finish_metrics(metrics):
+    """
+    Cierra la medición de la ejecución (duración total y memoria máxima).
+    """
+    if metrics is None:
+        return
+    update_peak_rss(metrics)
+    metrics['end'] = time.perf_counter()
+
+def metrics_summary(metrics):
+    """
+    Resumen serializable a JSON de las métricas.
+    Args:
+        metrics: Métricas creadas con create_metrics
+    Returns:
+        summary: Diccionario con frames, duración, FPS, memoria máxima, homografías, contadores y, por etapa,
+            llamadas, frames, tiempo total y latencias por frame (media, p50, p95 de las recientes y máxima) en ms
+    """
+    with metrics['lock']:
+        elapsed = (metrics['end'] or time.perf_counter()) - metrics['start']
+        counters = dict(metrics['counters'])
+        stages = {}
+        for name, stats in metrics['stages'].items():
+            if not stats['calls']:
+                continue
+            recent = np.array(stats['recent']) * 1000
+            stages[name] = {
+                'calls': stats['calls'], 'frames': stats['frames'], 'total_s': stats['total'],
+                'mean_ms': stats['total'] * 1000 / max(1, stats['frames']),
+                'p50_ms': float(np.percentile(recent, 50)), 'p95_ms': float(np.percentile(recent, 95)),
+                'max_ms': stats['max'] * 1000
+            }
+    frames = counters.get('frames', 0)
+    return {
+        'frames': frames, 'elapsed_s': elapsed, 'fps': frames / elapsed if elapsed > 0 else None,
+        'peak_rss_bytes': metrics['peak_rss_bytes'],
+        'homography': {result: counters.get(f'homography_{result}', 0) for result in ('recomputed', 'reused', 'missing')},
+        'counters': counters, 'stages': stages
+    }
+
+def _atomic_write(path, text):
+    # Reemplazo atómico: un lector (p. ej. el colector de archivos de Prometheus) nunca ve un archivo a medias
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def save_metrics_json(metrics, path, extra=None):
+    """
+    Guarda el resumen de las métricas en un archivo JSON.
+    Args:
+        metrics: Métricas creadas con create_metrics
+        path: Ruta del archivo
+        extra: Diccionario opcional agregado al resumen (p. ej. video y parámetros de la ejecución)
+    """
+    summary = metrics_summary(metrics)
+    if extra:
+        summary.update(extra)
+    _atomic_write(path, json.dumps(summary, indent=2, default=str))
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+def format_prometheus(metrics, labels=None, prefix='football'):
+    """
+    Métricas en el formato de texto de Prometheus.
+    Args:
+        metrics: Métricas creadas con create_metrics
+        labels: Etiquetas agregadas a todas las series (p. ej. {'job': '12'})
+        prefix: Prefijo de los nombres de las métricas
+    Returns:
+        text: Texto en formato de exposición de Prometheus
+    """
+    summary = metrics_summary(metrics)
+    labels = dict(labels or {})
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {prefix}_{name} {help_text}')
+        lines.append(f'# TYPE {prefix}_{name} {kind}')
+        for suffix, extra_labels, value in samples:
+            if value is not None:
+                lines.append(f'{prefix}_{name}{suffix}{_format_labels({**labels, **extra_labels})} {value:.9g}')
+
+    metric('frames_total', 'counter', 'Frames procesados.', [('', {}, summary['frames'])])
+    metric('elapsed_seconds', 'gauge', 'Duración de la ejecución.', [('', {}, summary['elapsed_s'])])
+    metric('processing_fps', 'gauge', 'Frames procesados por segundo.', [('', {}, summary['fps'])])
+    metric('peak_rss_bytes', 'gauge', 'Memoria residente máxima del proceso.', [('', {}, summary['peak_rss_bytes'])])
+    metric('homography_frames_total', 'counter', 'Frames por resultado de la homografía (recalculada, reutilizada o sin homografía).',
+           [('', {'result': result}, count) for result, count in summary['homography'].items()])
+    stage_samples = []
+    for stage, stats in summary['stages'].items():
+        stage_samples += [('', {'stage': stage, 'quantile': '0.5'}, stats['p50_ms'] / 1000),
+                          ('', {'stage': stage, 'quantile': '0.95'}, stats['p95_ms'] / 1000),
+                          ('_sum', {'stage': stage}, stats['total_s']),
+                          ('_count', {'stage': stage}, stats['frames'])]
+    metric('stage_frame_seconds', 'summary', 'Latencia por frame de cada etapa (cuantiles de las mediciones recientes).', stage_samples)
+    metric('stage_max_frame_seconds', 'gauge', 'Latencia máxima por frame de cada etapa.',
+           [('', {'stage': stage}, stats['max_ms'] / 1000) for stage, stats in summary['stages'].items()])
+    return '\n'.join(lines) + '\n'
+
+def save_prometheus(metrics, path, labels=None):
+    """
+    Guarda las métricas en formato de texto de Prometheus (p. ej. para el colector de archivos de node_exporter).
+    Args:
+        metrics: Métricas creadas con create_metrics
+        path: Ruta del archivo (.prom)
+        labels: Etiquetas agregadas a todas las series
+    """
+    _atomic_write(path, format_prometheus(metrics, labels))
@@ -0,0 +1,182 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy.optimize import linear_sum_assignment
+from .export import TRACKING_SCHEMA
+
+def plan_shards(tot_nbr_frames, nbr_shards, overlap):
+    """
+    Divide un video en tramos temporales consecutivos para procesarlos en paralelo.
+    Cada tramo (salvo el primero) empieza overlap frames antes de su parte propia: esos frames
+    calientan el tracker y la homografía y sirven para emparejar los IDs con el tramo anterior.
+    Args:
+        tot_nbr_frames: Número total de frames del video
+        nbr_shards: Número de tramos
+        overlap: Frames de solapamiento con el tramo anterior
+    Returns:
+        shards: Lista de diccionarios {'first', 'output_from', 'last'} con números de frame (desde 1, inclusivos);
+            la parte propia de cada tramo es [output_from, last]
+    """
+    nbr_shards = max(1, min(nbr_shards, tot_nbr_frames))
+    bounds = np.linspace(0, tot_nbr_frames, nbr_shards + 1).round().astype(int)
+    return [{'first': max(1, int(start) + 1 - overlap) if k > 0 else 1, 'output_from': int(start) + 1, 'last': int(end)}
+            for k, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+def read_overlap_rows(path, first, last):
+    """
+    Lee las posiciones en el mapa de los jugadores entre dos frames de un archivo de tracking.
+    Args:
+        path: Archivo Parquet de tracking (ver export.open_tracking_writer)
+        first: Primer frame (inclusivo)
+        last: Último frame (inclusivo)
+    Returns:
+        rows: Diccionario columna -> array (frame, track_id, team, map_x, map_y) de los jugadores con posición en el mapa
+    """
+    table = pq.read_table(path, columns=['frame', 'label', 'track_id', 'team', 'map_x', 'map_y'],
+                          filters=[('frame', '>=', first), ('frame', '<=', last), ('label', '=', 0)])
+    rows = {name: table.column(name).to_numpy() for name in ('frame', 'track_id', 'team', 'map_x', 'map_y')}
+    valid = np.isfinite(rows['map_x']) & np.isfinite(rows['map_y'])
+    return {name: values[valid] for name, values in rows.items()}
+
+def read_track_ids(path, first=1):
+    """
+    IDs de tracking de los jugadores de un archivo de tracking a partir de un frame.
+    Args:
+        path: Archivo Parquet de tracking
+        first: Primer frame (inclusivo)
+    Returns:
+        ids: Array de IDs únicos
+    """
+    table = pq.read_table(path, columns=['frame', 'label', 'track_id'], filters=[('frame', '>=', first), ('label', '=', 0)])
+    return np.unique(table.column('track_id').to_numpy())
+
+def match_overlap_tracks(rows_prev, rows_next, max_dist=25.0, min_frames=5):
+    """
+    Empareja los tracks de dos tramos consecutivos por su posición en el mapa durante el solapamiento.
+    El coste de cada par es la distancia media entre ambos tracks en los frames en que coinciden;
+    la asignación es la de menor coste total (algoritmo húngaro).
+    Args:
+        rows_prev: Filas del solapamiento en el tramo anterior (ver read_overlap_rows)
+        rows_next: Filas del solapamiento en el tramo siguiente
+        max_dist: Distancia media máxima (píxeles del mapa) para aceptar un emparejamiento
+        min_frames: Frames mínimos en común para considerar un par
+    Returns:
+        matches: Diccionario ID del tramo siguiente -> ID del tramo anterior
+    """
+    ids_prev, idx_prev = np.unique(rows_prev['track_id'], return_inverse=True)
+    ids_next, idx_next = np.unique(rows_next['track_id'], return_inverse=True)
+    if ids_prev.shape[0] == 0 or ids_next.shape[0] == 0:
+        return {}
+
+    # Distancia acumulada y frames en común de cada par de tracks
+    dist_sum = np.zeros((ids_next.shape[0], ids_prev.shape[0]))
+    nbr_common = np.zeros((ids_next.shape[0], ids_prev.shape[0]), dtype=np.int64)
+    pos_prev = np.stack([rows_prev['map_x'], rows_prev['map_y']], axis=1).astype(np.float64)
+    pos_next = np.stack([rows_next['map_x'], rows_next['map_y']], axis=1).astype(np.float64)
+    for frame_nbr in np.intersect1d(rows_prev['frame'], rows_next['frame']):
+        p = np.flatnonzero(rows_prev['frame'] == frame_nbr)
+        n = np.flatnonzero(rows_next['frame'] == frame_nbr)
+        dist = np.linalg.norm(pos_next[n, None, :] - pos_prev[None, p, :], axis=-1)
+        np.add.at(dist_sum, (idx_next[n][:, None], idx_prev[p][None, :]), dist)
+        np.add.at(nbr_common, (idx_next[n][:, None], idx_prev[p][None, :]), 1)
+
+    valid = nbr_common >= min_frames
+    mean_dist = np.where(valid, dist_sum / np.maximum(nbr_common, 1), np.inf)
+    cost = np.where(mean_dist <= max_dist, mean_dist, max_dist * 1e3) # Pares no válidos: coste finito pero prohibitivo
+    rows, cols = linear_sum_assignment(cost)
+    return {int(ids_next[i]): int(ids_prev[j]) for i, j in zip(rows, cols) if mean_dist[i, j] <= max_dist}
+
+def match_overlap_teams(rows_prev, rows_next, matches, nbr_teams):
+    """
+    Relaciona los índices de equipo de dos tramos con los tracks emparejados (con equipos automáticos
+    cada tramo puede numerar los grupos de color en distinto orden).
+    Args:
+        rows_prev: Filas del solapamiento en el tramo anterior
+        rows_next: Filas del solapamiento en el tramo siguiente
+        matches: Emparejamiento de tracks (ver match_overlap_tracks)
+        nbr_teams: Número de equipos/grupos
+    Returns:
+        team_map: Array (nbr_teams,) con el equipo del tramo anterior de cada equipo del tramo siguiente
+    """
+    votes = np.zeros((nbr_teams, nbr_teams), dtype=np.int64)
+    team_prev = {}
+    for track_id, team in zip(rows_prev['track_id'], rows_prev['team']):
+        team_prev[int(track_id)] = int(team) # Último equipo del track en el tramo anterior
+    for track_id, team in zip(rows_next['track_id'], rows_next['team']):
+        prev_id = matches.get(int(track_id))
+        if prev_id is not None and prev_id in team_prev and 0 <= team < nbr_teams and 0 <= team_prev[prev_id] < nbr_teams:
+            votes[team, team_prev[prev_id]] += 1
+    if votes.sum() == 0:
+        return np.arange(nbr_teams)
+    rows, cols = linear_sum_assignment(-votes) # Permutación con más votos
+    team_map = np.arange(nbr_teams)
+    team_map[rows] = cols
+    return team_map
+
+def stitch_track_ids(shard_ids, shard_matches):
+    """
+    Asigna IDs globales a los tracks de todos los tramos: los emparejados heredan el ID global
+    de su track del tramo anterior y el resto recibe uno nuevo.
+    Args:
+        shard_ids: Lista (por tramo) de IDs de tracking locales
+        shard_matches: Lista (por tramo) de emparejamientos con el tramo anterior (el primero vacío)
+    Returns:
+        id_maps: Lista (por tramo) de diccionarios ID local -> ID global
+    """
+    id_maps = []
+    next_id = 1
+    for k, (ids, matches) in enumerate(zip(shard_ids, shard_matches)):
+        id_map = {}
+        for track_id in sorted(int(track_id) for track_id in ids):
+            prev_id = matches.get(track_id) if k > 0 else None
+            if prev_id is not None and prev_id in id_maps[k - 1]:
+                id_map[track_id] = id_maps[k - 1][prev_id]
+            else:
+                id_map[track_id] = next_id
+                next_id += 1
+        id_maps.append(id_map)
+    return id_maps
+
+def _remap(values, mapping):
+    # Aplica un diccionario a un array de enteros (los valores sin entrada se conservan)
+    if not mapping:
+        return values
+    keys = np.fromiter(mapping.keys(), dtype=np.int64, count=len(mapping))
+    targets = np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping))
+    order = np.argsort(keys)
+    keys, targets = keys[order], targets[order]
+    pos = np.clip(np.searchsorted(keys, values), 0, keys.shape[0] - 1)
+    return np.where(keys[pos] == values, targets[pos], values)
+
+def merge_tracking_files(parts, path, row_group_size=65536):
+    """
+    Une los archivos de tracking de los tramos en uno solo, con IDs globales y sin los frames de solapamiento.
+    Args:
+        parts: Lista de diccionarios {'path', 'output_from', 'id_map', 'team_map'} en orden temporal
+            (team_map opcional: array de reasignación de equipos, ver match_overlap_teams)
+        path: Ruta del archivo Parquet de salida
+        row_group_size: Filas por row group
+    """
+    writer = pq.ParquetWriter(path, TRACKING_SCHEMA, compression='zstd')
+    try:
+        for part in parts:
+            parquet_file = pq.ParquetFile(part['path'])
+            for batch in parquet_file.iter_batches(batch_size=row_group_size):
+                columns = {name: batch.column(name).to_numpy(zero_copy_only=False) for name in batch.schema.names}
+                keep = columns['frame'] >= part['output_from']
+                columns = {name: values[keep] for name, values in columns.items()}
+                if columns['frame'].shape[0] == 0:
+                    continue
+                players = columns['label'] == 0
+                columns['track_id'] = np.where(players, _remap(columns['track_id'].astype(np.int64), part['id_map']),
+                                               columns['track_id'])
+                team_map = part.get('team_map')
+                if team_map is not None:
+                    teams = columns['team'].astype(np.int64)
+                    valid = players & (teams >= 0) & (teams < len(team_map))
+                    columns['team'] = np.where(valid, np.asarray(team_map)[np.clip(teams, 0, len(team_map) - 1)], teams)
+                writer.write_batch(pa.RecordBatch.from_arrays([pa.array(columns[field.name], type=field.type)
+                                                               for field in TRACKING_SCHEMA], schema=TRACKING_SCHEMA),
+                                   row_group_size=row_group_size)
+    finally:
+        writer.close()
@@ -0,0 +1,107 @@
+import numpy as np
+from .prediction import calculate_distance_features, extract_palettes_batch, team_votes
+
+def create_team_cache(nbr_teams, recheck_interval=25, min_confidence=0.75, forget_after=250):
+    """
+    Crea la caché de equipos por ID de tracking.
+    La paleta de un jugador solo se extrae cuando su track es nuevo, cada recheck_interval frames
+    o mientras la confianza en su equipo sea baja; el resto de frames se reutiliza el equipo mayoritario.
+    Args:
+        nbr_teams: Número de equipos
+        recheck_interval: Frames entre dos verificaciones de un mismo track
+        min_confidence: Fracción mínima de votos del equipo mayoritario para dejar de verificar en cada frame
+        forget_after: Frames sin ver un track tras los que se descarta (memoria acotada)
+    Returns:
+        team_cache: Diccionario con los votos acumulados por track
+    """
+    return {
+        'nbr_teams': nbr_teams,
+        'recheck_interval': recheck_interval,
+        'min_confidence': min_confidence,
+        'forget_after': forget_after,
+        'tracks': {}, # ID -> {'votes', 'last_check', 'last_seen', 'palette'}
+        'nbr_lookups': 0, # Jugadores consultados
+        'nbr_checks': 0 # Jugadores cuya paleta se extrajo
+    }
+
+def _needs_check(team_cache, track, frame_nbr):
+    if track is None:
+        return True
+    votes = track['votes']
+    total = votes.sum()
+    return (total == 0 or votes.max() / total < team_cache['min_confidence']
+            or frame_nbr - track['last_check'] >= team_cache['recheck_interval'])
+
+def forget_tracks(team_cache, frame_nbr):
+    """
+    Descarta los tracks que no se ven desde hace más de forget_after frames.
+    """
+    forget_after = team_cache['forget_after']
+    tracks = team_cache['tracks']
+    for track_id in [track_id for track_id, track in tracks.items() if frame_nbr - track['last_seen'] > forget_after]:
+        del tracks[track_id]
+
+def assign_teams(team_cache, frame, frame_nbr, bboxes_p, labels_p, player_ids, num_pal_colors, color_list_lab,
+                 nbr_team_colors, tracked=True):
+    """
+    Asigna equipo a los jugadores del frame usando los votos acumulados de cada track.
+    Las paletas de los jugadores a verificar se extraen juntas (ver prediction.extract_palettes_batch).
+    Args:
+        team_cache: Caché creada con create_team_cache (se actualiza in place)
+        frame: Frame de entrada (BGR)
+        frame_nbr: Número del frame
+        bboxes_p: Bounding boxes de detecciones (xyxy)
+        labels_p: Etiquetas de detección
+        player_ids: IDs de tracking de los jugadores (etiqueta 0), en orden
+        num_pal_colors: Número de colores de paleta por jugador
+        color_list_lab: Colores de los equipos en Lab (ver config.create_colors_info)
+        nbr_team_colors: Número de colores por equipo
+        tracked: Si los IDs son de tracking (False: IDs provisionales, se clasifica sin caché)
+    Returns:
+        players_teams_list: Índice de equipo de cada jugador
+        obj_palette_list: Última paleta extraída de cada jugador
+    """
+    tracks = team_cache['tracks']
+    player_rows = np.flatnonzero(np.asarray(labels_p) == 0)
+    player_ids = list(player_ids)
+    team_cache['nbr_lookups'] += len(player_ids)
+
+    # Jugadores cuya paleta hay que extraer en este frame
+    check = [j for j, player_id in enumerate(player_ids)
+             if not tracked or _needs_check(team_cache, tracks.get(player_id), frame_nbr)]
+    if check:
+        team_cache['nbr_checks'] += len(check)
+        rows = player_rows[check]
+        palettes, palette_mask = extract_palettes_batch(frame, bboxes_p[rows], [0] * len(rows), num_pal_colors)
+        distance_features = calculate_distance_features(palettes, color_list_lab, palette_mask)
+        votes = team_votes(distance_features, nbr_team_colors, team_cache['nbr_teams'])
+    else:
+        votes, palettes, palette_mask = None, None, None
+
+    checked = {}
+    for k, j in enumerate(check):
+        palette = palettes[k][palette_mask[k]].tolist()
+        if not tracked:
+            checked[j] = (int(votes[k].argmax()), palette)
+            continue
+        track = tracks.setdefault(player_ids[j], {'votes': np.zeros(team_cache['nbr_teams']), 'last_check': frame_nbr,
+                                                  'last_seen': frame_nbr, 'palette': []})
+        track['votes'] += votes[k] / max(votes[k].sum(), 1) # Cada verificación aporta un voto repartido entre equipos
+        track['last_check'] = frame_nbr
+        track['palette'] = palette
+
+    players_teams_list = []
+    obj_palette_list = []
+    for j, player_id in enumerate(player_ids):
+        if not tracked:
+            team, palette = checked[j]
+        else:
+            track = tracks[player_id]
+            track['last_seen'] = frame_nbr
+            team, palette = int(track['votes'].argmax()), track['palette'] # Equipo mayoritario del track
+        players_teams_list.append(team)
+        obj_palette_list.append(palette)
+
+    if tracked and frame_nbr % team_cache['forget_after'] == 0:
+        forget_tracks(team_cache, frame_nbr)
+    return players_teams_list, obj_palette_list
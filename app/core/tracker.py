@@ -0,0 +1,113 @@
+import numpy as np
+
+class _TrackIds:
+    """
+    Numeración de IDs propia de un tracker. Ultralytics numera los tracks con un contador global de la clase
+    BaseTrack, compartido por todos los trackers del proceso; este objeto reemplaza a tracker.init_track y asigna
+    a cada track nuevo su propio next_id. Se guarda con el tracker, por lo que un checkpoint conserva la numeración.
+    """
+    def __init__(self, tracker, count=0):
+        self.tracker = tracker
+        self.count = count # Último ID asignado
+
+    def next_id(self):
+        self.count += 1
+        return self.count
+
+    def __call__(self, *args, **kwargs):
+        tracks = type(self.tracker).init_track(self.tracker, *args, **kwargs)
+        for track in tracks:
+            track.next_id = self.next_id
+        return tracks
+
+def create_tracker(tracker_cfg="botsort.yaml"):
+    """
+    Crea un tracker de Ultralytics (BoT-SORT por defecto) independiente del modelo.
+    Mantener el tracker fuera de model.track permite ejecutar la detección en lotes
+    y actualizar el tracker frame a frame, con el mismo estado que model.track(persist=True).
+    Los IDs se numeran desde 1 en cada tracker (ver _TrackIds).
+    Args:
+        tracker_cfg: Archivo YAML de configuración del tracker
+    Returns:
+        tracker: Instancia del tracker
+    """
+    from ultralytics.trackers.track import TRACKER_MAP
+    from ultralytics.utils import YAML, IterableSimpleNamespace
+    from ultralytics.utils.checks import check_yaml
+
+    cfg = IterableSimpleNamespace(**YAML.load(check_yaml(tracker_cfg)))
+    tracker = TRACKER_MAP[cfg.tracker_type](args=cfg)
+    tracker.init_track = _TrackIds(tracker)
+    return tracker
+
+def tracker_state(tracker):
+    """
+    Estado completo de un tracker para guardarlo en un checkpoint (serializable con pickle).
+    La numeración de IDs viaja con la instancia (ver _TrackIds).
+    Args:
+        tracker: Tracker creado con create_tracker
+    Returns:
+        state: Diccionario {'tracker'}
+    """
+    return {'tracker': tracker}
+
+def restore_tracker(state):
+    """
+    Restaura un tracker guardado con tracker_state; los tracks nuevos continúan la numeración de IDs.
+    Args:
+        state: Diccionario devuelto por tracker_state
+    Returns:
+        tracker: Instancia del tracker
+    """
+    tracker = state['tracker']
+    if not isinstance(tracker.__dict__.get('init_track'), _TrackIds):
+        # Checkpoint anterior a la numeración por tracker: continuar desde el contador global que se guardó
+        tracker.init_track = _TrackIds(tracker, state.get('next_id', 0))
+        for track in tracker.tracked_stracks + tracker.lost_stracks:
+            track.next_id = tracker.init_track.next_id
+    return tracker
+
+def update_tracker(tracker, result, frame=None, offset=None, keep=None):
+    """
+    Actualiza el tracker con las detecciones de un frame (igual que el callback de model.track).
+    Args:
+        tracker: Tracker creado con create_tracker
+        result: Resultado de YOLO (Results) de un único frame
+        frame: Frame completo (por defecto result.orig_img); necesario si la detección se hizo sobre un recorte
+        offset: Posición (x, y) del recorte en el frame; las cajas se trasladan a coordenadas del frame
+        keep: Máscara booleana opcional de detecciones a entregar al tracker
+    Returns:
+        xyxy: Bounding boxes (x,y,x,y)
+        cls: Clases detectadas
+        conf: Confianzas
+        ids: IDs de tracking (None si el tracker no devolvió tracks en este frame)
+    """
+    frame = result.orig_img if frame is None else frame
+    det = result.boxes.cpu().numpy()
+    if offset is not None or keep is not None:
+        data = det.data[keep] if keep is not None else det.data.copy()
+        if offset is not None:
+            data[:, :4] += (offset[0], offset[1], offset[0], offset[1])
+        det = det.__class__(data, frame.shape[:2])
+    tracks = tracker.update(det, frame)
+    if len(tracks) == 0:
+        # Sin tracks: conservar las detecciones originales sin IDs (como model.track)
+        return det.xyxy, det.cls, det.conf, None
+    # Columnas de tracks: [x1, y1, x2, y2, track_id, score, cls, idx]
+    return tracks[:, :4], tracks[:, 6], tracks[:, 5], tracks[:, 4]
+
+def xyxy_to_xywh(xyxy):
+    """
+    Convierte bounding boxes (x1,y1,x2,y2) a (x_centro,y_centro,w,h).
+    Args:
+        xyxy: Array (N,4)
+    Returns:
+        xywh: Array (N,4)
+    """
+    xyxy = np.asarray(xyxy).reshape(-1, 4)
+    xywh = np.empty_like(xyxy)
+    xywh[:, 0] = (xyxy[:, 0] + xyxy[:, 2]) / 2
+    xywh[:, 1] = (xyxy[:, 1] + xyxy[:, 3]) / 2
+    xywh[:, 2] = xyxy[:, 2] - xyxy[:, 0]
+    xywh[:, 3] = xyxy[:, 3] - xyxy[:, 1]
+    return xywh
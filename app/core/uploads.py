@@ -0,0 +1,113 @@
+import os
+import time
+import hashlib
+import tempfile
+from .cache import remember_file_digest
+
+def open_upload_store(store_dir, max_bytes=20 << 30, max_age=7 * 24 * 3600, in_use=None):
+    """
+    Abre (creando si hace falta) el almacén de videos subidos.
+    Cada video se guarda una sola vez con el hash de su contenido como nombre, por lo que
+    subir el mismo archivo de nuevo no ocupa espacio adicional.
+    Args:
+        store_dir: Directorio del almacén
+        max_bytes: Tamaño máximo total; al superarlo se eliminan los videos usados hace más tiempo
+        max_age: Segundos sin uso tras los que un video se elimina
+        in_use: Función opcional sin argumentos que devuelve las rutas que la limpieza no puede eliminar
+            (p. ej. videos de trabajos pendientes o con checkpoint; ver engine.uploads_in_use)
+    Returns:
+        upload_store: Diccionario de configuración del almacén
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    return {'dir': store_dir, 'max_bytes': max_bytes, 'max_age': max_age, 'in_use': in_use}
+
+def store_upload(upload_store, file_obj, suffix='.mp4', chunk_size=8 << 20):
+    """
+    Copia un archivo subido al almacén por bloques, calculando su SHA-256 al mismo tiempo.
+    La memoria usada es la de un bloque, independientemente del tamaño del video.
+    Args:
+        upload_store: Almacén abierto con open_upload_store
+        file_obj: Objeto tipo archivo con read(n) (p. ej. el UploadedFile de Streamlit)
+        suffix: Extensión del archivo guardado
+        chunk_size: Tamaño de bloque (bytes)
+    Returns:
+        path: Ruta del video en el almacén
+        duplicate: Si el contenido ya estaba en el almacén
+    """
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+    sha = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=upload_store['dir'])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: file_obj.read(chunk_size), b''):
+                sha.update(chunk)
+                f.write(chunk)
+        digest = sha.hexdigest()
+        path = os.path.join(upload_store['dir'], digest + suffix.lower())
+        duplicate = os.path.isfile(path)
+        if duplicate:
+            os.remove(tmp_path)
+            touch_upload(path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    remember_file_digest(path, digest) # La caché de detecciones no necesita volver a leer el video
+    cleanup_uploads(upload_store, keep=path)
+    return path, duplicate
+
+def touch_upload(path):
+    """
+    Marca un video del almacén como usado recientemente (para la limpieza por antigüedad y tamaño).
+    Solo se actualiza la fecha de acceso: la de modificación identifica el contenido en la caché de hashes.
+    """
+    if os.path.isfile(path):
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+
+def _remove(path):
+    # Otra sesión puede haber eliminado el archivo al mismo tiempo
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def cleanup_uploads(upload_store, keep=None):
+    """
+    Elimina los videos sin uso desde hace más de max_age segundos y, si el almacén sigue
+    superando max_bytes, los usados hace más tiempo. También elimina subidas incompletas abandonadas.
+    Los videos que indique la función in_use del almacén nunca se eliminan (pero cuentan para el tamaño).
+    Args:
+        upload_store: Almacén abierto con open_upload_store
+        keep: Ruta que nunca se elimina (el video actual)
+    """
+    protected = set(upload_store['in_use']()) if upload_store.get('in_use') is not None else set()
+    if keep is not None:
+        protected.add(keep)
+    protected = {os.path.abspath(path) for path in protected}
+    now = time.time()
+    entries = []
+    total = 0
+    for name in os.listdir(upload_store['dir']):
+        path = os.path.join(upload_store['dir'], name)
+        if not os.path.isfile(path):
+            continue
+        if os.path.abspath(path) in protected:
+            total += os.path.getsize(path)
+            continue
+        stat = os.stat(path)
+        last_used = max(stat.st_atime, stat.st_mtime)
+        if now - last_used > upload_store['max_age']:
+            _remove(path)
+        elif not name.endswith('.part'):
+            entries.append((last_used, stat.st_size, path))
+
+    total += sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= upload_store['max_bytes']:
+            break
+        _remove(path)
+        total -= size
@@ -0,0 +1,895 @@
+import os
+import cv2
+import time
+import itertools
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from core import annotations, balltrack, cache, checkpoint, clustering, config, export, homography, jobs, models, motion, output, pipeline, pitch, prediction, profiling, teams, tracker
+
+"""
+Motor de detección sin interfaz (headless).
+Ejecuta la cadena jugadores → keypoints → homografía → anotación → salida de core
+sin depender de Streamlit. La interfaz solo recibe un callback de progreso opcional.
+"""
+
+# Rutas por defecto de recursos y modelos
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+TACTICAL_MAP_PATH = os.path.join(APP_DIR, 'assets', 'campo_tactico.png')
+PLAYERS_MODEL_PATH = os.path.join(APP_DIR, 'models', 'Yolo8L_Players', 'best.pt')
+KEYPOINTS_MODEL_PATH = os.path.join(APP_DIR, 'models', 'Yolo8M_Keypoints', 'best.pt')
+DETECTION_CACHE_DIR = './cache/detections/'
+CHECKPOINT_DIR = './cache/checkpoints/'
+UPLOAD_STORE_DIR = './uploads/'
+MODEL_EXPORT_DIR = './cache/models/'
+JOBS_DB_PATH = './cache/jobs.sqlite3'
+JOB_PREVIEW_DIR = './cache/jobs/'
+METRICS_DIR = './cache/metrics/' # Resúmenes JSON y archivos .prom de las métricas por etapa (ver core.profiling)
+JOB_WORKERS = 1 # Trabajos de detección a la vez en la cola de trabajos (ver worker.py)
+
+# Colores asignados cíclicamente a los IDs de jugadores
+PLAYER_COLORS_LIST = ['red', 'blue', 'green', 'yellow', 'purple', 'orange', 'pink', 'cyan', 'magenta', 'brown']
+COLOR_RGB_MAP = {
+    'red': (0, 0, 255),
+    'blue': (255, 0, 0),
+    'green': (0, 255, 0),
+    'yellow': (0, 255, 255),
+    'purple': (255, 0, 255),
+    'orange': (0, 165, 255),
+    'pink': (203, 192, 255),
+    'cyan': (255, 255, 0),
+    'magenta': (255, 0, 255),
+    'brown': (42, 42, 165)
+}
+
+def uploads_in_use(db_path=JOBS_DB_PATH, checkpoint_root=CHECKPOINT_DIR):
+    """
+    Videos del almacén de subidas que no pueden eliminarse: entradas de trabajos en cola o en curso
+    y de ejecuciones con un checkpoint desde el que pueden reanudarse (ver uploads.open_upload_store).
+    Returns:
+        paths: Conjunto de rutas absolutas
+    """
+    paths = checkpoint.checkpoint_video_paths(checkpoint_root)
+    if os.path.isfile(db_path):
+        paths |= jobs.pending_job_videos(jobs.open_job_queue(db_path))
+    return paths
+
+def load_tactical_map(path=TACTICAL_MAP_PATH):
+    """
+    Lee la imagen del mapa táctico.
+    Args:
+        path: Ruta de la imagen del mapa táctico
+    Returns:
+        tac_map: Imagen del mapa táctico (BGR)
+    """
+    tac_map = cv2.imread(path)
+    if tac_map is None:
+        raise FileNotFoundError(f'No se pudo leer el mapa táctico: {path}')
+    return tac_map
+
+def throttle_callback(callback, min_interval):
+    """
+    Limita la frecuencia de llamadas a un callback de progreso.
+    El último frame siempre se notifica para que la interfaz llegue al 100%.
+    Args:
+        callback: Función callback(frame_nbr, tot_nbr_frames, final_img) o None
+        min_interval: Segundos mínimos entre dos llamadas
+    Returns:
+        throttled: Función con la misma firma, o None si callback es None
+    """
+    if callback is None:
+        return None
+    last_call = [None] # Tiempo de la última llamada (lista para poder mutarla)
+
+    def throttled(frame_nbr, tot_nbr_frames, final_img):
+        now = time.monotonic()
+        if last_call[0] is None or now - last_call[0] >= min_interval or frame_nbr >= tot_nbr_frames:
+            last_call[0] = now
+            callback(frame_nbr, tot_nbr_frames, final_img)
+
+    return throttled
+
+def fps_meter():
+    """
+    Mide los FPS de procesamiento entre llamadas sucesivas (solo para mostrar en la imagen combinada).
+    Se mantiene separado de los FPS del video de entrada, que son los que reciben los escritores de video.
+    Returns:
+        tick: Función sin argumentos que devuelve los FPS desde la llamada anterior (0 en la primera)
+    """
+    last_tick = [None] # Tiempo de la última llamada (lista para poder mutarla)
+
+    def tick():
+        now = time.perf_counter()
+        processing_fps = 0.0 if last_tick[0] is None or now <= last_tick[0] else 1 / (now - last_tick[0])
+        last_tick[0] = now
+        return processing_fps
+
+    return tick
+
+def extract_detections(players, result_keypoints, camera_motion=None):
+    """
+    Reúne las detecciones de un frame como arrays de NumPy.
+    Args:
+        players: Tupla (xyxy, cls, conf, ids) devuelta por tracker.update_tracker
+        result_keypoints: Resultado de YOLO de keypoints del campo para el frame (None si no se ejecutó)
+        camera_motion: Homografía del frame anterior al actual estimada por flujo óptico (o None)
+    Returns:
+        detections: Diccionario con bboxes, etiquetas, confianzas e IDs
+    """
+    bboxes_p, cls_p, conf_p, ids_p = players
+    ids_fallback = ids_p is None
+    if ids_fallback:
+        ids_p = np.arange(len(bboxes_p)) # Fallback IDs
+
+    if result_keypoints is not None:
+        boxes_k = result_keypoints.boxes
+        bboxes_k = boxes_k.xyxy.cpu().numpy()
+        bboxes_k_c = boxes_k.xywh.cpu().numpy()
+        labels_k = [int(label) for label in boxes_k.cls.cpu().numpy()]
+    else:
+        bboxes_k = np.empty((0, 4), dtype=np.float32)
+        bboxes_k_c = np.empty((0, 4), dtype=np.float32)
+        labels_k = []
+
+    return {
+        'bboxes_p': bboxes_p, # Bounding boxes de jugadores, árbitros y balón detectados (x,y,x,y)
+        'bboxes_p_c': tracker.xyxy_to_xywh(bboxes_p), # (x,y,w,h)
+        'labels_p': [int(label) for label in cls_p],
+        'confs_p': list(conf_p),
+        'ids_p': ids_p,
+        'ids_fallback': ids_fallback, # Si los IDs son el fallback (sin tracks en este frame)
+        'bboxes_k': bboxes_k, # Bounding boxes de keypoints del campo (x,y,x,y)
+        'bboxes_k_c': bboxes_k_c, # (x,y,w,h)
+        'labels_k': labels_k,
+        'keypoints_inferred': result_keypoints is not None,
+        'camera_motion': camera_motion
+    }
+
+def _lerp_rows(keys_a, boxes_a, confs_a, keys_b, boxes_b, confs_b, alpha):
+    # Empareja filas por clave: las comunes se interpolan; las de un solo extremo se mantienen del más cercano
+    index_b = {key: j for j, key in enumerate(keys_b)}
+    keys, boxes, confs = [], [], []
+    for i, key in enumerate(keys_a):
+        j = index_b.get(key)
+        if j is not None:
+            keys.append(key)
+            boxes.append((1 - alpha) * boxes_a[i] + alpha * boxes_b[j])
+            confs.append((1 - alpha) * confs_a[i] + alpha * confs_b[j])
+        elif alpha < 0.5:
+            keys.append(key)
+            boxes.append(boxes_a[i])
+            confs.append(confs_a[i])
+    if alpha >= 0.5:
+        common = set(keys_a)
+        for j, key in enumerate(keys_b):
+            if key not in common:
+                keys.append(key)
+                boxes.append(boxes_b[j])
+                confs.append(confs_b[j])
+    return keys, np.array(boxes, dtype=np.float64).reshape(-1, 4), confs
+
+def interpolate_detections(detections_a, detections_b, alpha):
+    """
+    Detecciones de un frame intermedio entre dos frames clave (modo de submuestreo temporal).
+    Los objetos con el mismo ID de tracking (y el primer balón) en ambos frames clave se interpolan
+    linealmente; los que solo aparecen en uno se mantienen desde el frame clave más cercano.
+    Los keypoints del campo se interpolan por clase si ambos frames clave los infirieron.
+    Args:
+        detections_a: Detecciones del frame clave anterior (ver extract_detections)
+        detections_b: Detecciones del frame clave siguiente
+        alpha: Posición del frame entre ambos (0 = detections_a, 1 = detections_b)
+    Returns:
+        detections: Diccionario de detecciones del frame intermedio
+    """
+    def row_keys(detections):
+        # Clave de emparejamiento: (etiqueta, ID) o, sin IDs de tracking, (etiqueta, índice) solo para el balón
+        keys, nbr_balls = [], 0
+        for label, track_id in zip(detections['labels_p'], detections['ids_p']):
+            if label == 2:
+                keys.append((2, nbr_balls))
+                nbr_balls += 1
+            else:
+                keys.append((label, None if detections['ids_fallback'] else int(track_id)))
+        return keys
+
+    if detections_a['ids_fallback'] or detections_b['ids_fallback']:
+        # Sin IDs no se puede emparejar: usar el frame clave más cercano
+        nearest = detections_a if alpha < 0.5 else detections_b
+        keys_p, bboxes_p, confs_p = row_keys(nearest), np.asarray(nearest['bboxes_p'], dtype=np.float64), list(nearest['confs_p'])
+        ids_p, ids_fallback = np.asarray(nearest['ids_p']), nearest['ids_fallback']
+    else:
+        keys_p, bboxes_p, confs_p = _lerp_rows(row_keys(detections_a), np.asarray(detections_a['bboxes_p'], dtype=np.float64),
+                                               detections_a['confs_p'], row_keys(detections_b),
+                                               np.asarray(detections_b['bboxes_p'], dtype=np.float64), detections_b['confs_p'], alpha)
+        ids_p = np.array([-1 if label == 2 else track_id for label, track_id in keys_p],
+                         dtype=np.asarray(detections_a['ids_p']).dtype) # Mismo tipo que los IDs del tracker
+        ids_fallback = False
+
+    if detections_a['keypoints_inferred'] and detections_b['keypoints_inferred']:
+        labels_k, bboxes_k, _ = _lerp_rows(detections_a['labels_k'], np.asarray(detections_a['bboxes_k'], dtype=np.float64),
+                                           [0.] * len(detections_a['labels_k']), detections_b['labels_k'],
+                                           np.asarray(detections_b['bboxes_k'], dtype=np.float64),
+                                           [0.] * len(detections_b['labels_k']), alpha)
+        bboxes_k = bboxes_k.astype(np.float32)
+        keypoints_inferred = True
+    else:
+        labels_k, bboxes_k, keypoints_inferred = [], np.empty((0, 4), dtype=np.float32), False
+
+    bboxes_p = bboxes_p.astype(np.float32) # Mismo tipo que la salida del tracker (y que la caché al leerla)
+    return {
+        'bboxes_p': bboxes_p,
+        'bboxes_p_c': tracker.xyxy_to_xywh(bboxes_p),
+        'labels_p': [label for label, _ in keys_p],
+        'confs_p': confs_p,
+        'ids_p': ids_p,
+        'ids_fallback': ids_fallback,
+        'bboxes_k': bboxes_k,
+        'bboxes_k_c': tracker.xyxy_to_xywh(bboxes_k),
+        'labels_k': labels_k,
+        'keypoints_inferred': keypoints_inferred,
+        'camera_motion': None # El movimiento de cámara entre frames clave se aplica en el frame clave
+    }
+
+def init_state(max_track_length):
+    """
+    Crea el estado que se arrastra entre frames (homografía, balón y colores).
+    Args:
+        max_track_length: Longitud máxima del seguimiento del balón
+    Returns:
+        state: Diccionario de estado inicial
+    """
+    return {
+        'keypoints_src_prev': None, # Keypoints (ranuras fijas) usados en la última homografía
+        'keypoints_mask_prev': None,
+        'last_valid_homog': None, # Última homografía válida
+        'ball_track': balltrack.create_ball_track(max_track_length), # Seguimiento del balón (buffer circular + Kalman)
+        'player_id_to_color_map': {} # Mapeo de ID de jugador a color
+    }
+
+def locate_objects(state, detections, frame_nbr, hyper_params, ball_track_hyperparams, show_b, keypoints_dst, metrics=None):
+    """
+    Calcula la homografía del frame y proyecta jugadores y balón al mapa táctico.
+    Args:
+        state: Estado entre frames (se actualiza in place)
+        detections: Detecciones del frame (ver extract_detections)
+        frame_nbr: Número del frame actual
+        hyper_params: Hiperparámetros de detección (p_conf, k_conf, k_d_tol)
+        ball_track_hyperparams: Hiperparámetros de seguimiento del balón
+        show_b: Si actualizar el seguimiento del balón
+        keypoints_dst: Posiciones de keypoints en el mapa por clase (ver config.get_keypoints_map_array)
+        metrics: Métricas opcionales donde contar las homografías recalculadas, reutilizadas o ausentes (ver profiling)
+    Returns:
+        pred_dst_pts: Posiciones de jugadores en el mapa (o None)
+        detected_ball_dst_pos: Posición del balón en el mapa (o None)
+    """
+    k_d_tol = hyper_params[2]
+    nbr_frames_no_ball_thresh = ball_track_hyperparams[0]
+    ball_track_dist_thresh = ball_track_hyperparams[1]
+
+    bboxes_p_c = detections['bboxes_p_c']
+    labels_p = detections['labels_p']
+
+    # Ubicar los keypoints detectados en ranuras fijas por clase
+    keypoints_src, keypoints_mask = homography.keypoints_to_slots(detections['labels_k'], detections['bboxes_k_c'],
+                                                                 keypoints_dst.shape[0])
+
+    # Propagar la homografía y los keypoints anteriores con el movimiento de cámara estimado
+    camera_motion = detections['camera_motion']
+    if camera_motion is not None:
+        if state['last_valid_homog'] is not None:
+            state['last_valid_homog'] = homography.chain_homography(state['last_valid_homog'], camera_motion)
+        if state['keypoints_src_prev'] is not None:
+            state['keypoints_src_prev'] = homography.transform_points(camera_motion, state['keypoints_src_prev'])
+
+    # Calcular matriz de transformación de homografía
+    homog, _, state['keypoints_src_prev'], state['keypoints_mask_prev'] = homography.calculate_homography(
+        keypoints_src, keypoints_mask, keypoints_dst,
+        state['keypoints_src_prev'], state['keypoints_mask_prev'], k_d_tol, frame_nbr
+    )
+
+    # Persistir la última homografía válida
+    if homog is not None:
+        state['last_valid_homog'] = homog
+        profiling.increment_counter(metrics, 'homography_recomputed')
+    else:
+        homog = state['last_valid_homog'] # Usar la última homografía válida si la actual es None
+        profiling.increment_counter(metrics, 'homography_reused' if homog is not None else 'homography_missing')
+
+    pred_dst_pts = None
+    detected_ball_dst_pos = None
+
+    if homog is not None: # Solo proceder si hay una homografía válida
+        bboxes_p_c_0 = bboxes_p_c[[i == 0 for i in labels_p], :] # Jugadores (etiqueta 0)
+        bboxes_p_c_2 = bboxes_p_c[[i == 2 for i in labels_p], :] # Balón (etiqueta 2)
+
+        # Obtener coordenadas de jugadores detectados en el frame (x_centro, y_centro+h/2)
+        detected_ppos_src_pts = bboxes_p_c_0[:, :2] + np.array([[0] * bboxes_p_c_0.shape[0], bboxes_p_c_0[:, 3] / 2]).transpose()
+        # Obtener coordenadas del primer balón detectado (x_centro, y_centro)
+        detected_ball_src_pos = bboxes_p_c_2[0, :2] if bboxes_p_c_2.shape[0] > 0 else None
+
+        # Transformar coordenadas de jugadores
+        pred_dst_pts = homography.transform_points(homog, detected_ppos_src_pts)
+
+        # Transformar coordenadas del balón
+        if detected_ball_src_pos is not None:
+            detected_ball_dst_pos = homography.transform_points(homog, detected_ball_src_pos)[0]
+
+        # Actualizar seguimiento del balón (los huecos cortos se rellenan con la predicción del filtro)
+        if show_b:
+            balltrack.update_ball_track(state['ball_track'], detected_ball_src_pos, detected_ball_dst_pos, homog,
+                                        ball_track_dist_thresh, nbr_frames_no_ball_thresh)
+
+    return pred_dst_pts, detected_ball_dst_pos
+
+def assign_player_colors(state, detections):
+    """
+    Asigna un color cíclico a cada nuevo ID de jugador.
+    Args:
+        state: Estado entre frames (se actualiza in place)
+        detections: Detecciones del frame
+    Returns:
+        player_ids: IDs de jugadores del frame actual
+        players_teams_list: Índices de color de cada jugador
+    """
+    labels_p = detections['labels_p']
+    player_id_to_color_map = state['player_id_to_color_map']
+    team_color_to_idx = {color: i for i, color in enumerate(PLAYER_COLORS_LIST)}
+
+    player_ids = detections['ids_p'][[i == 0 for i in labels_p]] # IDs de jugadores en el frame actual
+    players_teams_list = []
+    for player_id in player_ids:
+        if player_id not in player_id_to_color_map:
+            # Asignar un nuevo color si el ID del jugador es nuevo
+            color_index = len(player_id_to_color_map) % len(PLAYER_COLORS_LIST)
+            player_id_to_color_map[player_id] = PLAYER_COLORS_LIST[color_index]
+        players_teams_list.append(team_color_to_idx[player_id_to_color_map[player_id]])
+
+    return player_ids, players_teams_list
+
+def read_batches(cap, tot_nbr_frames, batch_size=1, first_frame=1):
+    """
+    Decodifica los frames del video de entrada agrupados en lotes consecutivos.
+    Args:
+        cap: cv2.VideoCapture del video de entrada (posicionado en first_frame)
+        tot_nbr_frames: Número del último frame a leer
+        batch_size: Número de frames por lote
+        first_frame: Número del primer frame a leer
+    Yields:
+        Lista de (frame_nbr, frame) con hasta batch_size frames leídos correctamente
+    """
+    batch = []
+    for frame_nbr in range(first_frame, tot_nbr_frames + 1):
+        success, frame = cap.read()
+        if success:
+            batch.append((frame_nbr, frame))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def read_segments(cap, tot_nbr_frames, frame_step, batch_size=1, first_frame=1, keyframe_origin=None):
+    """
+    Decodifica el video en segmentos que terminan en un frame clave (el primero, uno cada frame_step
+    frames y el último leído), agrupados de batch_size segmentos por lote.
+    Args:
+        cap: cv2.VideoCapture del video de entrada (posicionado en first_frame)
+        tot_nbr_frames: Número del último frame a leer
+        frame_step: Frames entre dos frames clave
+        batch_size: Número de segmentos (frames clave) por lote
+        first_frame: Número del primer frame a leer
+        keyframe_origin: Frame desde el que se cuentan los frames clave (por defecto first_frame); permite
+            continuar la misma secuencia de frames clave en una lectura posterior
+    Yields:
+        Lista de segmentos; cada segmento es una lista de (frame_nbr, frame) cuyo último elemento es el frame clave
+    """
+    keyframe_origin = first_frame if keyframe_origin is None else keyframe_origin
+    batch = []
+    segment = []
+    for frame_nbr in range(first_frame, tot_nbr_frames + 1):
+        success, frame = cap.read()
+        if not success:
+            continue
+        segment.append((frame_nbr, frame))
+        if (frame_nbr - keyframe_origin) % frame_step == 0:
+            batch.append(segment)
+            segment = []
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if segment:
+        batch.append(segment) # El último frame leído cierra el video como frame clave
+    if batch:
+        yield batch
+
+def search_ball(ball_search, players, result_players, result_ball, roi, players_offset=None):
+    """
+    Elige la detección de balón del frame (la de mayor confianza en la ventana de búsqueda o, sin ventana,
+    en la detección del frame completo), actualiza la búsqueda y la pone en lugar de los balones del tracker.
+    Args:
+        ball_search: Estado de la búsqueda del balón (ver balltrack.create_ball_search)
+        players: Tupla (xyxy, cls, conf, ids) devuelta por tracker.update_tracker
+        result_players: Resultado de YOLO del frame completo
+        result_ball: Resultado de YOLO de la ventana de búsqueda (o None)
+        roi: Ventana (x1,y1,x2,y2) de result_ball (o None)
+        players_offset: Posición (x, y) del recorte sobre el que se obtuvo result_players (o None)
+    Returns:
+        players: Tupla (xyxy, cls, conf, ids) con a lo sumo un balón (etiqueta 2), al final
+    """
+    boxes = (result_ball if result_ball is not None else result_players).boxes.cpu().numpy()
+    balls = np.flatnonzero(boxes.cls == 2)
+    ball_xyxy = None
+    if balls.shape[0] > 0:
+        best = balls[boxes.conf[balls].argmax()]
+        ball_xyxy = boxes.xyxy[best].astype(np.float32) # Misma precisión que las cajas del tracker
+        ball_conf = boxes.conf[best]
+        offset = roi[:2] if result_ball is not None else players_offset
+        if offset is not None:
+            ball_xyxy += (offset[0], offset[1], offset[0], offset[1]) # Coordenadas de la ventana/recorte -> frame
+    balltrack.update_ball_search(ball_search, None if ball_xyxy is None else (ball_xyxy[:2] + ball_xyxy[2:]) / 2,
+                                 result_ball is not None)
+
+    xyxy, cls, conf, ids = players
+    keep = np.asarray(cls) != 2
+    xyxy, cls, conf = np.asarray(xyxy)[keep], np.asarray(cls)[keep], np.asarray(conf)[keep]
+    ids = None if ids is None else np.asarray(ids)[keep]
+    if ball_xyxy is not None:
+        xyxy = np.concatenate([xyxy, ball_xyxy[None, :]])
+        cls = np.append(cls, 2)
+        conf = np.append(conf, ball_conf)
+        ids = None if ids is None else np.append(ids, -1)
+    return xyxy, cls, conf, ids
+
+def infer_batch(frames, model_players, model_keypoints, players_tracker, p_conf, k_conf, executor=None, motion_state=None,
+                ball_search=None, pitch_region=None, metrics=None):
+    """
+    Ejecuta la detección de jugadores y keypoints sobre un lote de frames y actualiza el tracker.
+    Ambos modelos procesan el lote completo en una sola llamada; las detecciones de jugadores
+    se entregan luego al tracker frame a frame y en orden, por lo que los IDs son los mismos
+    que procesando un frame a la vez. Si se entrega un executor, el modelo de keypoints corre
+    en paralelo con el de jugadores (PyTorch libera el GIL durante la inferencia).
+    Con motion_state, el modelo de keypoints solo se ejecuta en los frames que el planificador
+    de movimiento de cámara indique (ver motion.schedule_keypoints).
+    Con ball_search, el balón se busca con el modelo de jugadores sobre una ventana a resolución original
+    alrededor de su posición predicha (todas las ventanas del lote en una llamada), y en el frame completo
+    cuando lleva demasiados frames sin encontrarse (ver balltrack.create_ball_search).
+    Con pitch_region, el modelo de jugadores solo procesa el rectángulo del campo (según la homografía
+    del lote anterior) y los jugadores con los pies fuera del campo se descartan antes del tracker.
+    Args:
+        frames: Lista de frames (BGR)
+        model_players: Modelo YOLO de jugadores
+        model_keypoints: Modelo YOLO de keypoints
+        players_tracker: Tracker de jugadores (ver tracker.create_tracker)
+        p_conf: Confianza para detección de jugadores
+        k_conf: Confianza para detección de keypoints
+        executor: ThreadPoolExecutor opcional para la inferencia de keypoints
+        motion_state: Estado opcional del planificador de keypoints (ver motion.init_motion_state)
+        ball_search: Estado opcional de la búsqueda del balón por ventana (ver balltrack.create_ball_search)
+        pitch_region: Estado opcional de la región del campo (ver pitch.create_pitch_region)
+        metrics: Métricas opcionales donde registrar el tiempo de cada modelo y del tracker (ver profiling)
+    Returns:
+        detections_list: Lista de diccionarios de detecciones (ver extract_detections)
+    """
+    # Decidir en qué frames ejecutar el modelo de keypoints
+    if motion_state is not None:
+        with profiling.stage_timer(metrics, 'camera_motion', len(frames)):
+            schedule = [motion.schedule_keypoints(motion_state, frame) for frame in frames]
+    else:
+        schedule = [(True, None)] * len(frames)
+    keypoints_frames = [frame for frame, (run_keypoints, _) in zip(frames, schedule) if run_keypoints]
+
+    # Recortar los frames al rectángulo del campo (región calculada hasta el lote anterior)
+    crop = pitch.pitch_crop(pitch_region, frames[0].shape) if pitch_region is not None else None
+    players_frames = frames if crop is None else [frame[crop[1]:crop[3], crop[0]:crop[2]] for frame in frames]
+    offset = None if crop is None else crop[:2]
+
+    def predict_keypoints():
+        with profiling.stage_timer(metrics, 'keypoints_inference', len(keypoints_frames)):
+            return model_keypoints(keypoints_frames, conf=k_conf, verbose=False)
+
+    def predict_players():
+        with profiling.stage_timer(metrics, 'players_inference', len(players_frames)):
+            return model_players.predict(players_frames, conf=p_conf, verbose=False)
+
+    results_keypoints = []
+    if executor is not None and keypoints_frames:
+        future_keypoints = executor.submit(predict_keypoints)
+        results_players = predict_players()
+        results_keypoints = future_keypoints.result()
+    else:
+        results_players = predict_players()
+        if keypoints_frames:
+            results_keypoints = predict_keypoints()
+
+    if motion_state is not None and results_keypoints:
+        motion.update_keypoints_status(motion_state, len(results_keypoints[-1].boxes))
+
+    # Buscar el balón en ventanas alrededor de la posición predicha (solo clase balón, sin reducir resolución)
+    rois = balltrack.predict_ball_rois(ball_search, frames[0].shape, len(frames)) if ball_search is not None else None
+    results_ball = {}
+    if rois is not None:
+        roi_idx = [i for i, roi in enumerate(rois) if roi is not None]
+        if roi_idx:
+            crops = [frames[i][rois[i][1]:rois[i][3], rois[i][0]:rois[i][2]] for i in roi_idx]
+            with profiling.stage_timer(metrics, 'ball_inference', len(crops)):
+                results_ball = dict(zip(roi_idx, model_players.predict(crops, conf=p_conf, classes=[2],
+                                                                       imgsz=ball_search['roi_size'], verbose=False)))
+
+    # Actualizar el tracker un frame a la vez, en orden
+    results_keypoints = iter(results_keypoints)
+    detections_list = []
+    with profiling.stage_timer(metrics, 'tracker', len(frames)):
+        for i, (result_players, (run_keypoints, camera_motion)) in enumerate(zip(results_players, schedule)):
+            result_keypoints = next(results_keypoints) if run_keypoints else None
+            keep = None
+            if pitch_region is not None:
+                # Descartar jugadores fuera del campo con la homografía de este frame
+                pitch.update_pitch_region(pitch_region, result_keypoints, camera_motion)
+                boxes = result_players.boxes.cpu().numpy()
+                xyxy = boxes.xyxy if offset is None else boxes.xyxy + (offset[0], offset[1], offset[0], offset[1])
+                keep = pitch.on_pitch(pitch_region, xyxy, boxes.cls)
+            players = tracker.update_tracker(players_tracker, result_players, frames[i], offset, keep)
+            if rois is not None:
+                players = search_ball(ball_search, players, result_players, results_ball.get(i), rois[i], offset)
+            detections_list.append(extract_detections(players, result_keypoints, camera_motion))
+    return detections_list
+
+def process_video(cap, model_players, model_keypoints, hyper_params, ball_track_hyperparams, plot_hyperparams,
+                  output_file_name=None, save_processed_separately=True, save_tactical_separately=True, save_combined=False,
+                  enable_resize=False, output_width=None, output_height=None,
+                  progress_callback=None, progress_interval=0.5, tac_map_path=TACTICAL_MAP_PATH,
+                  pipelined=True, queue_size=4, batch_size=1, keypoints_interval=1, motion_thresh=40.0,
+                  save_tracking=False, detection_cache=None, video_path=None, team_colors_dic=None, num_pal_colors=3,
+                  team_recheck_interval=25, auto_teams=False, ball_roi_size=None, pitch_roi=False, frame_step=1,
+                  frame_range=None, output_from=None, checkpoint_dir=None, checkpoint_interval=1500, metrics=None):
+    """
+    Procesa un video completo sin interfaz: detección, homografía, anotación y escritura de salidas.
+    El trabajo se divide en etapas (lectura → inferencia → anotación/composición → codificación)
+    conectadas por colas acotadas; cada etapa corre en su propio hilo y procesa los frames en orden,
+    por lo que la salida y el estado de BoT-SORT son idénticos a la ejecución secuencial.
+    Args:
+        cap: cv2.VideoCapture del video de entrada
+        model_players: Modelo YOLO de jugadores, árbitros y balón
+        model_keypoints: Modelo YOLO de keypoints del campo
+        hyper_params: Hiperparámetros de detección {0: p_conf, 1: k_conf, 2: k_d_tol}
+        ball_track_hyperparams: {0: frames sin balón, 1: distancia máxima, 2: longitud máxima}
+        plot_hyperparams: {0: show_k, 1: show_pal, 2: show_b, 3: show_p}
+        output_file_name: Nombre base de las salidas (se genera si está vacío)
+        save_processed_separately: Si guardar video procesado
+        save_tactical_separately: Si guardar video táctico
+        save_combined: Si guardar video combinado
+        enable_resize: Si redimensionar la imagen combinada
+        output_width: Ancho objetivo
+        output_height: Alto objetivo
+        progress_callback: Callback opcional progress_callback(frame_nbr, tot_nbr_frames, final_img)
+        progress_interval: Segundos mínimos entre llamadas al callback
+        tac_map_path: Ruta de la imagen del mapa táctico
+        pipelined: Si ejecutar las etapas en hilos separados (False: todo en el hilo actual)
+        queue_size: Capacidad de las colas entre etapas
+        batch_size: Número de frames consecutivos por llamada a los modelos
+        keypoints_interval: Ejecutar el modelo de keypoints al menos cada K frames; entre medias la homografía
+            se propaga con el movimiento de cámara estimado por flujo óptico (1 = todos los frames)
+        motion_thresh: Movimiento de cámara acumulado (píxeles a 640 de ancho) que fuerza una nueva inferencia de keypoints
+        save_tracking: Si guardar posiciones, IDs y confianzas por frame en ./outputs/<nombre>_tracking.parquet
+        detection_cache: Caché de detecciones opcional (ver cache.open_detection_cache); si el mismo video ya se
+            procesó con los mismos modelos y umbrales, se omite la inferencia y solo se re-renderiza
+        video_path: Ruta del video de entrada (necesaria para identificarlo en la caché)
+        team_colors_dic: Colores de los equipos {equipo: [color jugadores, color portero]} (ver config.create_colors_info);
+            si se indica, cada jugador se clasifica por los colores de su camiseta en lugar de un color por ID
+        num_pal_colors: Número de colores de paleta extraídos por jugador
+        team_recheck_interval: Frames entre verificaciones del equipo de un mismo track (ver teams.create_team_cache)
+        auto_teams: Sin team_colors_dic, separar los equipos automáticamente agrupando los colores de las camisetas
+            durante el partido (ver clustering.create_team_clusterer)
+        ball_roi_size: Lado (píxeles) de la ventana de búsqueda del balón alrededor de su posición predicha;
+            permite ejecutar el modelo de jugadores con un imgsz menor sin perder el balón (None: desactivado).
+            Con un modelo de tamaño de entrada fijo (TorchScript) debe coincidir con su imgsz (ver models.supports_imgsz)
+        pitch_roi: Ejecutar el modelo de jugadores solo sobre el rectángulo del campo y descartar los jugadores
+            cuyos pies se proyectan fuera de los límites del mapa (ver pitch.create_pitch_region)
+        frame_step: Ejecutar los modelos solo cada frame_step frames; las detecciones de los frames intermedios
+            se interpolan por ID de tracking (ver interpolate_detections) y las salidas conservan los FPS originales
+        frame_range: Procesar solo los frames (primero, último) del video, numerados desde 1 (None: todo el video)
+        output_from: Primer frame que se escribe en los videos de salida; los anteriores del rango solo inicializan
+            el tracker y la homografía (el tracking se guarda para todo el rango; ver sharding.process_video_sharded)
+        checkpoint_dir: Directorio de checkpoints de esta ejecución (None: sin checkpoints). Las salidas se escriben en
+            segmentos de checkpoint_interval frames; al cerrar cada uno se guarda el estado necesario para continuar
+            (tracker, homografía, balón, equipos). Si se vuelve a llamar con el mismo directorio y los mismos parámetros
+            tras una interrupción, el procesamiento continúa desde el último checkpoint; al terminar los segmentos
+            se unen en las salidas finales (ver checkpoint.join_checkpoint_segments) y el directorio se elimina
+        checkpoint_interval: Frames entre dos checkpoints
+        metrics: Métricas opcionales de la ejecución (ver profiling.create_metrics): latencias por frame de cada etapa
+            (lectura, inferencia, tracker, homografía, anotación, composición, codificación y envío del progreso),
+            homografías recalculadas/reutilizadas y memoria máxima; se exportan con profiling.save_metrics_json
+            y profiling.save_prometheus
+    Returns:
+        processed_name, tactical_name, combined_name, tracking_name: Nombres de los archivos de salida (o None)
+    """
+    # Extraer parámetros de visualización
+    show_k = plot_hyperparams[0] # Mostrar keypoints
+    show_pal = plot_hyperparams[1] # Mostrar paletas
+    show_b = plot_hyperparams[2] # Mostrar balón
+    show_p = plot_hyperparams[3] # Mostrar jugadores
+
+    p_conf = hyper_params[0] # Confianza para detección de jugadores
+    k_conf = hyper_params[1] # Confianza para detección de keypoints
+    max_track_length = ball_track_hyperparams[2] # Longitud máxima del seguimiento del balón
+    if ball_roi_size and not models.supports_imgsz(model_players, ball_roi_size):
+        raise ValueError(f'El backend {model_players.backend} solo admite el tamaño de entrada de la exportación '
+                         f'({model_players.imgsz}); la ventana del balón ({ball_roi_size}) requiere torch u onnx')
+
+    # Reanudar desde el último checkpoint si hay uno de esta misma ejecución
+    resumed = None
+    if checkpoint_dir is not None:
+        fingerprint = checkpoint.checkpoint_fingerprint(video_path, {
+            'hyper_params': hyper_params, 'ball_track_hyperparams': ball_track_hyperparams, 'plot_hyperparams': plot_hyperparams,
+            'models': [cache.model_digest(model_players), cache.model_digest(model_keypoints)],
+            'output_file_name': output_file_name,
+            'outputs': [save_processed_separately, save_tactical_separately, save_combined, save_tracking],
+            'resize': [enable_resize, output_width, output_height], 'tac_map_path': tac_map_path, 'batch_size': batch_size,
+            'keypoints': [keypoints_interval, motion_thresh],
+            'teams': [team_colors_dic, num_pal_colors, team_recheck_interval, auto_teams],
+            'ball_roi_size': ball_roi_size, 'pitch_roi': pitch_roi, 'frame_step': frame_step,
+            'frame_range': frame_range, 'output_from': output_from, 'checkpoint_interval': checkpoint_interval
+        })
+        resumed = checkpoint.load_checkpoint(checkpoint_dir, fingerprint)
+        if resumed is not None:
+            output_file_name = resumed['output_file_name'] # Conservar el nombre (quizá generado) de la primera ejecución
+
+    # Generar nombre de archivo si es necesario
+    if (save_processed_separately or save_tactical_separately or save_combined or save_tracking) and (output_file_name is None or len(str(output_file_name)) == 0):
+        output_file_name = config.generate_file_name()
+
+    # Asegurar que el directorio de salidas existe
+    os.makedirs('./outputs/', exist_ok=True)
+
+    tac_map = load_tactical_map(tac_map_path)
+    keypoints_map_pos, classes_names_dic, labels_dic = config.get_labels_dics()
+    keypoints_dst = config.get_keypoints_map_array(keypoints_map_pos, classes_names_dic)
+    team_cache = None
+    clusterer = None
+    if team_colors_dic:
+        # Clasificación de equipos por colores de camiseta
+        colors_dic = team_colors_dic
+        nbr_team_colors = len(next(iter(colors_dic.values())))
+        color_list_lab = prediction.colors_to_lab([color for colors in colors_dic.values() for color in colors])
+        team_cache = teams.create_team_cache(len(colors_dic), team_recheck_interval)
+    elif auto_teams:
+        # Equipos por agrupamiento incremental de colores (2 equipos + otros)
+        clusterer = clustering.create_team_clusterer()
+        colors_dic = clustering.clusterer_colors_dic(clusterer)
+        team_cache = teams.create_team_cache(len(colors_dic), team_recheck_interval)
+    else:
+        colors_dic = {f"{i}": [COLOR_RGB_MAP[PLAYER_COLORS_LIST[i]]] for i in range(len(PLAYER_COLORS_LIST))}
+    progress = throttle_callback(profiling.timed_callback(metrics, 'ui_push', progress_callback), progress_interval)
+    # Buffers de la imagen combinada (con el lienzo del mapa táctico dentro), uno por frame que puede estar
+    # a la vez entre la anotación y la codificación; se crean con el primer frame, cuando se conoce su tamaño
+    frame_step = max(1, int(frame_step))
+    nbr_buffers = pipeline.items_in_flight(queue_size, pipelined) * batch_size * frame_step
+    renderers = {}
+
+    tot_nbr_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) # Obtener FPS original del video
+    first_frame = 1
+    if frame_range is not None:
+        first_frame, tot_nbr_frames = max(1, frame_range[0]), min(frame_range[1], tot_nbr_frames)
+        if first_frame > 1:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame - 1)
+    output_from = first_frame if output_from is None else output_from
+    state = init_state(max_track_length)
+    players_tracker = tracker.create_tracker("botsort.yaml") # Estado de tracking propio de este trabajo
+    motion_state = motion.init_motion_state(keypoints_interval, motion_thresh) if keypoints_interval > 1 else None
+    ball_search = balltrack.create_ball_search(ball_roi_size, ball_track_hyperparams[0]) if ball_roi_size else None
+    pitch_region = pitch.create_pitch_region(keypoints_dst, pitch.map_bounds(keypoints_map_pos)) if pitch_roi else None
+    last_keyframe = {} # Número y detecciones del último frame clave (modo de submuestreo)
+    if resumed is not None:
+        # Estado al final del último segmento cerrado
+        saved = resumed['state']
+        state, motion_state, ball_search, pitch_region = saved['state'], saved['motion_state'], saved['ball_search'], saved['pitch_region']
+        team_cache, clusterer, colors_dic, last_keyframe = saved['team_cache'], saved['clusterer'], saved['colors_dic'], saved['last_keyframe']
+        players_tracker = tracker.restore_tracker(saved['tracker'])
+
+    # Buscar las detecciones en la caché (clave: contenido del video, pesos y parámetros de inferencia)
+    cache_key = None
+    if detection_cache is not None:
+        cache_params = {
+            'p_conf': p_conf, 'k_conf': k_conf, 'tracker': 'botsort.yaml', 'keypoints_interval': keypoints_interval,
+            'motion_thresh': motion_thresh if keypoints_interval > 1 else None
+        }
+        if ball_search is not None:
+            cache_params['ball_roi'] = (ball_roi_size, ball_track_hyperparams[0]) # Sin búsqueda por ventana la clave no cambia
+        if pitch_region is not None:
+            cache_params['pitch_roi'] = True
+        if frame_step > 1:
+            cache_params['frame_step'] = frame_step
+        if frame_range is not None:
+            cache_params['frame_range'] = [first_frame, tot_nbr_frames]
+        cache_key = cache.detection_cache_key(video_path, model_players, model_keypoints, cache_params)
+    cached_detections = None
+    cache_writer = None
+    if cache.has_detections(detection_cache, cache_key):
+        cached_detections = cache.load_detections(detection_cache, cache_key)
+    elif cache_key is not None and resumed is None: # Una ejecución reanudada no tiene las detecciones previas al checkpoint
+        cache_writer = cache.begin_detections(detection_cache, cache_key)
+
+    # Segmentos de salida: uno solo sin checkpoints; al reanudar, continuar tras el último segmento cerrado
+    segments = checkpoint.plan_checkpoint_segments(first_frame, tot_nbr_frames,
+                                                   checkpoint_interval if checkpoint_dir is not None else None, frame_step)
+    segment_names = [] if resumed is None else list(resumed['segments'])
+    if resumed is not None and len(segment_names) < len(segments):
+        resume_frame = segments[len(segment_names)][0]
+        cap.set(cv2.CAP_PROP_POS_FRAMES, resume_frame - 1)
+        if cached_detections is not None:
+            cached_detections = itertools.dropwhile(lambda item: item[0] < resume_frame, cached_detections)
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='keypoints') if pipelined and cached_detections is None else None
+
+    ### Etapa de inferencia: lote completo en ambos modelos, tracker frame a frame ###
+    def inference_stage(batch):
+        # Con frame_step > 1 el lote son segmentos que terminan en un frame clave; si no, cada frame es un frame clave
+        segments = batch if frame_step > 1 else [[item] for item in batch]
+        items = [item for segment in segments for item in segment]
+        if cached_detections is not None:
+            # Render desde caché: sin inferencia ni tracker
+            detections_list = []
+            with profiling.stage_timer(metrics, 'cache_read', len(items)):
+                for frame_nbr, _ in items:
+                    cached_frame_nbr, detections = next(cached_detections)
+                    if cached_frame_nbr != frame_nbr:
+                        raise ValueError(f'Caché de detecciones inconsistente: frame {frame_nbr}, caché {cached_frame_nbr}')
+                    detections_list.append(detections)
+        else:
+            key_detections_list = infer_batch([segment[-1][1] for segment in segments], model_players, model_keypoints,
+                                              players_tracker, p_conf, k_conf, executor, motion_state, ball_search,
+                                              pitch_region, metrics)
+            detections_list = []
+            for segment, key_detections in zip(segments, key_detections_list):
+                # Frames intermedios: interpolar entre el frame clave anterior y el de este segmento
+                key_frame_nbr = segment[-1][0]
+                prev_frame_nbr, prev_detections = last_keyframe.get('frame_nbr'), last_keyframe.get('detections')
+                for frame_nbr, _ in segment[:-1]:
+                    if prev_detections is None:
+                        detections_list.append(interpolate_detections(key_detections, key_detections, 1.0))
+                    else:
+                        alpha = (frame_nbr - prev_frame_nbr) / (key_frame_nbr - prev_frame_nbr)
+                        detections_list.append(interpolate_detections(prev_detections, key_detections, alpha))
+                detections_list.append(key_detections)
+                last_keyframe['frame_nbr'], last_keyframe['detections'] = key_frame_nbr, key_detections
+            for (frame_nbr, _), detections in zip(items, detections_list):
+                cache.record_detections(cache_writer, frame_nbr, detections)
+        return [(frame_nbr, frame, detections) for (frame_nbr, frame), detections in zip(items, detections_list)]
+
+    ### Etapa de anotación: homografía, colores, anotaciones y composición ###
+    def next_composite(frame):
+        if not renderers:
+            renderers['compositor'] = annotations.create_compositor(frame.shape, tac_map.shape, nbr_buffers,
+                                                                    enable_resize, output_width, output_height)
+            renderers['tac_map'] = annotations.create_tactical_renderer(
+                tac_map, canvases=[composite['tac'] for composite in renderers['compositor']['buffers']])
+        return annotations.next_composite(renderers['compositor'])
+
+    def annotate(frame_nbr, frame, detections):
+        with profiling.stage_timer(metrics, 'homography'):
+            pred_dst_pts, detected_ball_dst_pos = locate_objects(state, detections, frame_nbr, hyper_params, ball_track_hyperparams,
+                                                                 show_b, keypoints_dst, metrics)
+        with profiling.stage_timer(metrics, 'annotation'):
+            player_ids, players_teams_list = assign_player_colors(state, detections)
+            obj_palette_list = []
+            if team_colors_dic:
+                players_teams_list, obj_palette_list = teams.assign_teams(
+                    team_cache, frame, frame_nbr, detections['bboxes_p'], detections['labels_p'], player_ids,
+                    num_pal_colors, color_list_lab, nbr_team_colors, tracked=not detections['ids_fallback'])
+            elif auto_teams:
+                if clustering.sample_team_colors(clusterer, frame, frame_nbr, detections['bboxes_p'], detections['labels_p'], num_pal_colors):
+                    clustering.clusterer_colors_dic(clusterer, colors_dic) # Colores de anotación = centros de los grupos
+                if clustering.clusterer_ready(clusterer):
+                    players_teams_list, obj_palette_list = teams.assign_teams(
+                        team_cache, frame, frame_nbr, detections['bboxes_p'], detections['labels_p'], player_ids,
+                        num_pal_colors, clusterer['centers'], 1, tracked=not detections['ids_fallback'])
+                else:
+                    players_teams_list = [len(colors_dic) - 1] * len(player_ids) # Sin grupos todavía: "Otros"
+            elif show_pal:
+                obj_palette_list = prediction.extract_player_palettes(frame, detections['bboxes_p'], detections['labels_p'], num_pal_colors)
+
+            # Anotar el frame y el mapa directamente en las vistas del buffer combinado (sin copias intermedias)
+            composite = next_composite(frame)
+            annotated_frame = annotations.annotate_frame(frame, detections['bboxes_p'], detections['labels_p'], detections['confs_p'],
+                                                         players_teams_list, colors_dic, obj_palette_list, labels_dic,
+                                                         show_pal, show_p, show_k, detections['bboxes_k'], out=composite['frame'])
+            tac_map_copy = annotations.render_tactical_map(renderers['tac_map'], pred_dst_pts, detected_ball_dst_pos,
+                                                           players_teams_list, colors_dic, player_ids, state['ball_track'])
+
+            tracking_rows = None
+            if save_tracking:
+                tracking_rows = export.frame_tracking_rows(frame_nbr, detections, pred_dst_pts, detected_ball_dst_pos,
+                                                           player_ids, players_teams_list)
+        with profiling.stage_timer(metrics, 'compositing'):
+            final_img = annotations.combine_frames(annotated_frame, tac_map_copy, enable_resize, output_width, output_height,
+                                                   composite)
+        return frame_nbr, annotated_frame, tac_map_copy, final_img, tracking_rows
+
+    def annotation_stage(batch):
+        return [annotate(*item) for item in batch]
+
+    def save_progress():
+        # Checkpoint: segmentos cerrados y estado para continuar tras el último de ellos
+        checkpoint.save_checkpoint(checkpoint_dir, {
+            'fingerprint': fingerprint, 'output_file_name': output_file_name, 'segments': segment_names,
+            'video_path': os.path.abspath(video_path) if video_path else None, # El almacén de subidas no debe eliminarlo
+            'state': {'state': state, 'tracker': tracker.tracker_state(players_tracker), 'motion_state': motion_state,
+                      'ball_search': ball_search, 'pitch_region': pitch_region, 'team_cache': team_cache,
+                      'clusterer': clusterer, 'colors_dic': colors_dic, 'last_keyframe': last_keyframe}
+        })
+
+    processing_fps_meter = fps_meter()
+
+    ### Etapa de codificación: escritura de videos y progreso (en el hilo que llama) ###
+    try:
+        if checkpoint_dir is not None and resumed is None:
+            save_progress() # Checkpoint inicial: registra el nombre de las salidas aunque falle el primer segmento
+        for segment_idx in range(len(segment_names), len(segments)):
+            segment_first, segment_last = segments[segment_idx]
+            # Sin checkpoints el único segmento se escribe directamente en las salidas finales
+            segment_output_name = output_file_name if checkpoint_dir is None else checkpoint.segment_file_name(output_file_name, segment_idx)
+            processed_output = None
+            tactical_output = None
+            combined_output = None
+            segment_tracking_name = f'{segment_output_name}_tracking.parquet' if save_tracking else None
+            tracking_writer = export.open_tracking_writer(f'./outputs/{segment_tracking_name}', fps) if save_tracking else None
+            try:
+                if frame_step > 1:
+                    reader = read_segments(cap, segment_last, frame_step, batch_size, segment_first, first_frame)
+                    reader = profiling.timed_iter(metrics, 'decode', reader, lambda batch: sum(len(segment) for segment in batch))
+                else:
+                    reader = profiling.timed_iter(metrics, 'decode', read_batches(cap, segment_last, batch_size, segment_first))
+                for frame_nbr, annotated_frame, tac_map_copy, final_img, tracking_rows in itertools.chain.from_iterable(pipeline.run_stages(
+                        reader, [inference_stage, annotation_stage], queue_size=queue_size, threaded=pipelined)):
+
+                    with profiling.stage_timer(metrics, 'encode'):
+                        # Guardar videos separados si está habilitado (los frames previos a output_from solo inicializan el estado)
+                        write_video = frame_nbr >= output_from
+                        processed_output = output.write_processed_video(processed_output, annotated_frame, segment_output_name, fps,
+                                                                        save_processed_separately and write_video)
+                        tactical_output = output.write_tactical_video(tactical_output, tac_map_copy, segment_output_name, fps,
+                                                                      save_tactical_separately and write_video)
+
+                        # FPS de procesamiento (solo para mostrar; los videos se escriben con los FPS originales)
+                        final_img = annotations.add_fps_text(final_img, processing_fps_meter())
+                        combined_output = output.write_combined_video(combined_output, final_img, segment_output_name, fps,
+                                                                      save_combined and write_video)
+                        tracking_writer = export.write_tracking_rows(tracking_writer, tracking_rows)
+                    profiling.increment_counter(metrics, 'frames')
+
+                    if progress is not None:
+                        profiling.update_peak_rss(metrics)
+                        progress(frame_nbr, tot_nbr_frames, final_img)
+            except BaseException:
+                # Interrupción (p. ej. trabajo cancelado desde el callback) o error: no dejar videos abiertos a medio escribir
+                output.release_video_writers(processed_output, tactical_output, combined_output, True, True, True, segment_output_name)
+                raise
+            finally:
+                export.close_tracking_writer(tracking_writer)
+
+            # Cerrar las salidas del segmento y guardar el checkpoint
+            segment_names.append((*output.release_video_writers(processed_output, tactical_output, combined_output,
+                                                                 save_processed_separately, save_tactical_separately,
+                                                                 save_combined, segment_output_name),
+                                  segment_tracking_name))
+            if checkpoint_dir is not None:
+                save_progress()
+
+        # Publicar las detecciones en la caché solo si el video se procesó completo
+        cache.commit_detections(cache_writer)
+        cache_writer = None
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+        cache.discard_detections(cache_writer)
+        profiling.finish_metrics(metrics)
+
+    if checkpoint_dir is None:
+        return segment_names[0]
+    # Unir los segmentos en las salidas finales y eliminar el checkpoint
+    output_names = (f'{output_file_name}_processed.mp4' if save_processed_separately else None,
+                    f'{output_file_name}_tactical.mp4' if save_tactical_separately else None,
+                    f'{output_file_name}_combined.mp4' if save_combined else None,
+                    f'{output_file_name}_tracking.parquet' if save_tracking else None)
+    output_names = checkpoint.join_checkpoint_segments(segment_names, output_names, fps)
+    checkpoint.discard_checkpoint(checkpoint_dir, remove_segments=False)
+    return output_names
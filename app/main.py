@@ -1,5 +1,4 @@
 import streamlit as st
-from ultralytics import YOLO
 
 # Iniciar los roles
 if "role" not in st.session_state:
@@ -105,13 +104,6 @@ pages = {
 # Condicionales para la navegación
 if st.session_state.role == "admin":
 
-    # Cargar modelos si no están en session_state
-    if "model_players" not in st.session_state:
-        players_path = "app/models/Yolo8L_Players/best.pt"
-        keypoints_path = "app/models/Yolo8M_Keypoints/best.pt"
-        st.session_state.model_players = YOLO(players_path)
-        st.session_state.model_keypoints = YOLO(keypoints_path)
-
     pg = st.navigation(pages)
 else:
     pg = st.navigation([st.Page(login)])
@@ -0,0 +1,185 @@
+import os
+import cv2
+import shutil
+import multiprocessing
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from core import cache, clustering, config, models, output, stitching
+from engine import KEYPOINTS_MODEL_PATH, MODEL_EXPORT_DIR, PLAYERS_MODEL_PATH, process_video, throttle_callback
+
+"""
+Procesamiento de un partido en tramos temporales en paralelo (un proceso por tramo).
+Cada proceso tiene su propio tracker y estado de homografía; los IDs se reconcilian al final
+emparejando los tracks por su posición en el mapa durante el solapamiento entre tramos.
+"""
+
+def _process_shard(task):
+    # Proceso de trabajo: cargar los modelos y procesar un tramo con process_video
+    if task['video_digest'] is not None:
+        cache.remember_file_digest(task['video_path'], task['video_digest']) # No volver a leer el video entero
+    model_players = models.load_model(task['players_model_path'], threads=task['threads'], **task['model_params'])
+    model_keypoints = models.load_model(task['keypoints_model_path'], threads=task['threads'], **task['model_params'])
+
+    shard_idx, first = task['shard_idx'], task['shard']['first']
+    progress_queue = task['progress_queue']
+    progress_callback = None
+    if progress_queue is not None:
+        progress_callback = lambda frame_nbr, tot_nbr_frames, final_img: progress_queue.put((shard_idx, frame_nbr - first + 1))
+
+    cap = cv2.VideoCapture(task['video_path'])
+    try:
+        return process_video(cap, model_players, model_keypoints, *task['args'],
+                             output_file_name=task['output_file_name'], save_tracking=True,
+                             frame_range=(first, task['shard']['last']), output_from=task['shard']['output_from'],
+                             progress_callback=progress_callback, progress_interval=task['progress_interval'],
+                             video_path=task['video_path'], **task['kwargs'])
+    finally:
+        cap.release()
+
+def _remove_outputs(names):
+    for name in names:
+        if name is not None and os.path.isfile(f'./outputs/{name}'):
+            os.remove(f'./outputs/{name}')
+
+def process_video_sharded(video_path, hyper_params, ball_track_hyperparams, plot_hyperparams, nbr_workers,
+                          overlap=None, output_file_name=None, save_processed_separately=True, save_tactical_separately=True,
+                          save_combined=False, save_tracking=False, progress_callback=None, progress_interval=0.5,
+                          players_model_path=PLAYERS_MODEL_PATH, keypoints_model_path=KEYPOINTS_MODEL_PATH,
+                          backend='torch', imgsz=None, threads=None, export_dir=MODEL_EXPORT_DIR,
+                          detection_cache=None, match_dist=25.0, checkpoint_dir=None, **kwargs):
+    """
+    Procesa un video dividido en nbr_workers tramos consecutivos, cada uno en su propio proceso.
+    Cada tramo empieza overlap frames antes de su parte propia; en ese solapamiento los tracks de dos tramos
+    consecutivos se emparejan por su posición en el mapa (ver stitching.match_overlap_tracks) y reciben el mismo ID global.
+    Los videos de los tramos se unen en orden y el tracking se une con los IDs globales.
+    Limitación: solo el tracking (Parquet) usa los IDs globales. Los videos procesado, táctico y combinado se
+    renderizan dentro de cada tramo, antes de conocer la reconciliación, por lo que muestran los IDs locales del tramo;
+    sin colores de equipo (un color por ID) los colores de los jugadores también cambian en cada límite entre tramos.
+    Para videos con IDs continuos, procesar sin tramos (o usar los IDs del tracking unido).
+    Args:
+        video_path: Ruta del video de entrada
+        hyper_params: Hiperparámetros de detección {0: p_conf, 1: k_conf, 2: k_d_tol}
+        ball_track_hyperparams: {0: frames sin balón, 1: distancia máxima, 2: longitud máxima}
+        plot_hyperparams: {0: show_k, 1: show_pal, 2: show_b, 3: show_p}
+        nbr_workers: Número de tramos y de procesos
+        overlap: Frames de solapamiento entre tramos (None: 2 segundos de video)
+        output_file_name: Nombre base de las salidas (se genera si está vacío)
+        save_processed_separately: Si guardar video procesado
+        save_tactical_separately: Si guardar video táctico
+        save_combined: Si guardar video combinado
+        save_tracking: Si guardar el tracking unido en ./outputs/<nombre>_tracking.parquet
+        progress_callback: Callback opcional progress_callback(frames_procesados, frames_totales, None)
+        progress_interval: Segundos mínimos entre llamadas al callback
+        players_model_path: Pesos del modelo de jugadores
+        keypoints_model_path: Pesos del modelo de keypoints
+        backend: Backend de inferencia de ambos modelos (ver models.load_model)
+        imgsz: Tamaño de entrada de los modelos
+        threads: Hilos de inferencia por proceso (None: núcleos disponibles / nbr_workers)
+        export_dir: Directorio de modelos exportados
+        detection_cache: Caché de detecciones opcional; cada tramo tiene su propia entrada
+        match_dist: Distancia media máxima (píxeles del mapa) para emparejar dos tracks en el solapamiento
+        checkpoint_dir: Directorio de checkpoints (None: sin checkpoints); cada tramo usa un subdirectorio propio
+            y al relanzar con el mismo nombre de salida continúa desde su último checkpoint
+        **kwargs: Resto de parámetros de process_video (batch_size, keypoints_interval, team_colors_dic, ...)
+    Returns:
+        processed_name, tactical_name, combined_name, tracking_name: Nombres de los archivos de salida (o None)
+    """
+    cap = cv2.VideoCapture(video_path)
+    tot_nbr_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    if overlap is None:
+        overlap = int(round(2 * (fps or 25)))
+    if output_file_name is None or len(str(output_file_name)) == 0:
+        output_file_name = config.generate_file_name()
+    os.makedirs('./outputs/', exist_ok=True)
+
+    shards = stitching.plan_shards(tot_nbr_frames, nbr_workers, overlap)
+    threads = threads or max(1, (os.cpu_count() or 1) // len(shards))
+    model_params = {'backend': backend, 'imgsz': imgsz, 'export_dir': export_dir}
+    # Exportar y calcular hashes una sola vez antes de lanzar los procesos
+    for path in (players_model_path, keypoints_model_path):
+        models.export_model(path, backend, imgsz or 640, export_dir)
+    video_digest = cache.file_digest(video_path) if detection_cache is not None else None
+
+    context = multiprocessing.get_context('spawn') # Sin fork: PyTorch y los hilos del proceso padre no se heredan
+    manager = context.Manager() if progress_callback is not None else None
+    progress_queue = manager.Queue() if manager is not None else None
+    progress = throttle_callback(progress_callback, progress_interval)
+    tot_work = sum(shard['last'] - shard['first'] + 1 for shard in shards)
+    done = [0] * len(shards)
+
+    shard_names = [None] * len(shards)
+    try:
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=context) as executor:
+            futures = {executor.submit(_process_shard, {
+                'shard_idx': k, 'shard': shard, 'video_path': video_path, 'video_digest': video_digest,
+                'players_model_path': players_model_path, 'keypoints_model_path': keypoints_model_path,
+                'model_params': model_params, 'threads': threads,
+                'args': (hyper_params, ball_track_hyperparams, plot_hyperparams),
+                'output_file_name': f'{output_file_name}_part{k:03d}',
+                'progress_queue': progress_queue, 'progress_interval': progress_interval,
+                'kwargs': dict(kwargs, save_processed_separately=save_processed_separately,
+                               save_tactical_separately=save_tactical_separately, save_combined=save_combined,
+                               detection_cache=detection_cache,
+                               checkpoint_dir=os.path.join(checkpoint_dir, f'part{k:03d}') if checkpoint_dir else None)
+            }): k for k, shard in enumerate(shards)}
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=progress_interval or 0.5, return_when=FIRST_EXCEPTION)
+                for future in finished:
+                    shard_names[futures[future]] = future.result() # Propaga el error del tramo
+                    done[futures[future]] = shards[futures[future]]['last'] - shards[futures[future]]['first'] + 1
+                while progress_queue is not None and not progress_queue.empty():
+                    shard_idx, nbr_done = progress_queue.get()
+                    done[shard_idx] = max(done[shard_idx], nbr_done)
+                if progress is not None:
+                    progress(sum(done), tot_work, None)
+
+        # Reconciliar los IDs de tracking entre tramos consecutivos
+        tracking_paths = [f'./outputs/{names[3]}' for names in shard_names]
+        nbr_teams = len(clustering.AUTO_TEAM_NAMES)
+        shard_ids, shard_matches, team_maps = [], [], []
+        for k, shard in enumerate(shards):
+            matches, team_map = {}, None
+            if k > 0 and shard['output_from'] > shard['first']:
+                rows_prev = stitching.read_overlap_rows(tracking_paths[k - 1], shard['first'], shard['output_from'] - 1)
+                rows_next = stitching.read_overlap_rows(tracking_paths[k], shard['first'], shard['output_from'] - 1)
+                matches = stitching.match_overlap_tracks(rows_prev, rows_next, match_dist, max(3, overlap // 4))
+                if kwargs.get('auto_teams') and not kwargs.get('team_colors_dic'):
+                    # Los grupos de color automáticos de cada tramo pueden estar numerados en otro orden
+                    team_map = team_maps[k - 1][stitching.match_overlap_teams(rows_prev, rows_next, matches, nbr_teams)]
+            elif kwargs.get('auto_teams') and not kwargs.get('team_colors_dic'):
+                team_map = list(range(nbr_teams))
+            shard_ids.append(stitching.read_track_ids(tracking_paths[k], shard['output_from']))
+            shard_matches.append(matches)
+            team_maps.append(None if team_map is None else [int(team) for team in team_map])
+        id_maps = stitching.stitch_track_ids(shard_ids, shard_matches)
+
+        tracking_name = None
+        if save_tracking:
+            tracking_name = f'{output_file_name}_tracking.parquet'
+            stitching.merge_tracking_files([{'path': path, 'output_from': shard['output_from'], 'id_map': id_map,
+                                             'team_map': team_map}
+                                            for path, shard, id_map, team_map in zip(tracking_paths, shards, id_maps, team_maps)],
+                                           f'./outputs/{tracking_name}')
+
+        # Unir los videos de los tramos
+        video_names = []
+        for i, (enabled, suffix) in enumerate(((save_processed_separately, 'processed'), (save_tactical_separately, 'tactical'),
+                                               (save_combined, 'combined'))):
+            name = f'{output_file_name}_{suffix}.mp4' if enabled else None
+            if enabled:
+                parts = [f'./outputs/{names[i]}' for names in shard_names if names[i] is not None]
+                if not output.concat_videos_copy(parts, f'./outputs/{name}'):
+                    output.concat_videos(parts, f'./outputs/{name}', fps)
+            video_names.append(name)
+    finally:
+        if manager is not None:
+            manager.shutdown()
+        if checkpoint_dir and all(names is not None for names in shard_names):
+            shutil.rmtree(checkpoint_dir, ignore_errors=True) # Todos los tramos terminaron: sus checkpoints ya no hacen falta
+        for names in shard_names:
+            if names is not None:
+                _remove_outputs(names)
+
+    return (*video_names, tracking_name)
@@ -1,4 +1,5 @@
 import streamlit as st
+from core import config, models
 
 # Titulo de la página
 col_title1, col_title2, col_title3 = st.columns([34, 36, 30])
@@ -30,16 +31,58 @@ def render_hyperparameters():
         keypoints_displacement_mean_tol = st.slider('Tolerancia RMSE de Desplazamiento de Puntos Clave (píxeles)', min_value=-1, max_value=100, value=7,
                                                      help="Indica la distancia promedio máxima permitida entre la posición de los puntos clave del campo en las detecciones actuales y anteriores. Se utiliza para determinar si actualizar la matriz de homografía o no.")
 
+    pitch_roi = st.checkbox("Detectar jugadores solo dentro del campo", value=False,
+                            help="Usa la homografía para procesar solo la zona del campo (sin gradas ni marcadores) y descarta detecciones con los pies fuera de los límites del mapa.")
+    frame_step = st.number_input("Ejecutar los modelos cada K frames", min_value=1, max_value=10, value=1, step=1,
+                                 help="Con K > 1 los modelos solo procesan uno de cada K frames; las posiciones de los jugadores en los frames intermedios se interpolan por ID de tracking. El video de salida conserva todos los frames.")
+
     # Actualizar el diccionario con los valores correctos
     detection_hyper_params[1] = keypoints_model_conf_thresh
     detection_hyper_params[2] = keypoints_displacement_mean_tol
 
+    # Clasificación de equipos por color de camiseta
+    st.markdown("---")
+    st.subheader("Equipos")
+    team_mode = st.radio(label='Clasificación de equipos por color de camiseta',
+                         options=['Desactivada', 'Automática', 'Colores manuales'], horizontal=True,
+                         help="Automática: agrupa los colores de las camisetas durante el partido (2 equipos + otros). Colores manuales: compara la paleta de cada jugador con los colores indicados. Desactivada: cada ID de jugador recibe un color distinto.")
+    auto_teams = team_mode == 'Automática'
+    colors_dic = {}
+    if team_mode == 'Colores manuales':
+        tcol1, tcol2 = st.columns([1,1])
+        with tcol1:
+            team1_name = st.text_input(label='Nombre del Equipo 1', value='Equipo 1')
+            team1_p_color = st.color_picker(label='Color de Jugadores del Equipo 1', value='#FFFFFF')
+            team1_gk_color = st.color_picker(label='Color de Portero del Equipo 1', value='#00FF00')
+        with tcol2:
+            team2_name = st.text_input(label='Nombre del Equipo 2', value='Equipo 2')
+            team2_p_color = st.color_picker(label='Color de Jugadores del Equipo 2', value='#0000FF')
+            team2_gk_color = st.color_picker(label='Color de Portero del Equipo 2', value='#FFFF00')
+        colors_dic, _ = config.create_colors_info(team1_name, team1_p_color, team1_gk_color,
+                                                  team2_name, team2_p_color, team2_gk_color)
+
+    # Backend de inferencia de los modelos (compartido con la pestaña de Tracking)
+    st.markdown("---")
+    st.subheader("Inferencia")
+    icol1, icol2, icol3 = st.columns([1,1,1])
+    with icol1:
+        backend = st.selectbox('Backend de inferencia', options=list(models.BACKENDS), index=0,
+                               help="torch: pesos .pt originales. torchscript/onnx: modelos exportados (se exportan una sola vez y se guardan en caché). onnx-int8: ONNX con pesos cuantizados a INT8, más rápido en CPU pero con posibles diferencias en las detecciones.")
+    with icol2:
+        imgsz = st.select_slider('Tamaño de entrada (px)', options=[320, 480, 640, 800, 960, 1280], value=640,
+                                 help="Tamaño al que se redimensiona cada frame para los modelos. Menor es más rápido pero detecta peor objetos pequeños como el balón.")
+    with icol3:
+        threads = st.number_input('Hilos de CPU (0 = automático)', min_value=0, max_value=64, value=0)
+    st.session_state.inference_params = {'backend': backend, 'imgsz': imgsz, 'threads': threads or None}
+
     st.markdown("---")
     st.subheader("Opciones de Salida")
     save_processed_separately = st.checkbox(label='Guardar video procesado por separado', value=True)
     save_tactical_separately = st.checkbox(label='Guardar mapa táctico por separado', value=True)
+    save_tracking = st.checkbox(label='Guardar datos de tracking (Parquet)', value=False,
+                                help="Posiciones en el mapa, IDs y confianzas de jugadores y balón por frame.")
     enable_resize = st.checkbox("Habilitar Redimensionamiento de Salida", value=False)
-    if save_processed_separately or save_tactical_separately:
+    if save_processed_separately or save_tactical_separately or save_tracking:
         output_file_name = st.text_input(label='Nombre del Archivo (Opcional)', placeholder='Ingrese el nombre del archivo de video de salida.')
     else:
         output_file_name = None
@@ -59,6 +102,10 @@ def render_hyperparameters():
                                                     value=100, help="Distancia máxima permitida entre dos detecciones consecutivas de balón para mantener el seguimiento actual.")
         max_track_length = st.number_input("Longitud máxima del seguimiento del balón (Núm. detecciones)", min_value=1, max_value=1000,
                                                     value=35, help="Número máximo total de detecciones de balón para mantener en el historial de seguimiento")
+        roi_supported = backend not in models.FIXED_IMGSZ_BACKENDS # TorchScript solo admite el tamaño de entrada de la exportación
+        ball_roi = st.checkbox("Buscar el balón en una ventana alrededor de su posición predicha", value=False, disabled=not roi_supported,
+                               help="El balón se busca a resolución original solo cerca de donde se espera encontrarlo; tras el umbral de reinicio sin balón se vuelve a buscar en el frame completo. Permite usar un tamaño de entrada menor sin perder el balón. No disponible con el backend torchscript.") and roi_supported
+        ball_roi_size = st.number_input("Tamaño de la ventana del balón (píxeles)", min_value=128, max_value=1280, value=640, step=64) if ball_roi else None
         ball_track_hyperparams = {
             0: nbr_frames_no_ball_thresh,
             1: ball_track_dist_thresh,
@@ -90,35 +137,42 @@ def render_hyperparameters():
         with bcol24:
             st.write('')
 
-    return (detection_hyper_params, num_pal_colors, save_processed_separately, save_tactical_separately,
-            output_file_name, enable_resize, output_width, output_height, ball_track_hyperparams, plot_hyperparams,
+    return (detection_hyper_params, num_pal_colors, colors_dic, auto_teams, save_processed_separately, save_tactical_separately, save_tracking,
+            output_file_name, enable_resize, output_width, output_height, ball_track_hyperparams, ball_roi_size, pitch_roi, frame_step, plot_hyperparams,
             start_detection, stop_detection)
 
 # Ejecutar la configuración de parámetros y detección
-if "input_vide_file" not in st.session_state:
+if "video_path" not in st.session_state:
     st.error("Primero carga un video en la pestaña 'Carga de Video'.")
 else:
-    (detection_hyper_params, num_pal_colors, save_processed_separately, save_tactical_separately,
-     output_file_name, enable_resize, output_width, output_height, ball_track_hyperparams, plot_hyperparams,
+    (detection_hyper_params, num_pal_colors, colors_dic, auto_teams, save_processed_separately, save_tactical_separately, save_tracking,
+     output_file_name, enable_resize, output_width, output_height, ball_track_hyperparams, ball_roi_size, pitch_roi, frame_step, plot_hyperparams,
      start_detection, stop_detection) = render_hyperparameters()
 
-    import cv2
-    tempf = st.session_state.tempf
-    cap = cv2.VideoCapture(tempf.name)
+    from detection import cancel_detection, latest_detection_job, show_detection_job, show_recent_jobs, submit_detection
+    video_path = st.session_state.video_path
+    detection_jobs = st.session_state.setdefault('detection_jobs', {}) # video -> ID del último trabajo de detección
+    if video_path not in detection_jobs:
+        detection_jobs[video_path] = latest_detection_job(video_path) # Sesión nueva: retomar el último trabajo del video
+    job_id = detection_jobs[video_path]
 
     if start_detection and not stop_detection:
-        from detection import detect
-        st.toast(f'¡Detección Iniciada!')
+        # La detección se encola y la ejecuta un worker en otro proceso: sigue aunque la página se recargue
         save_combined = False  # No longer an option, always False
-        model_players = st.session_state.model_players
-        model_keypoints = st.session_state.model_keypoints
-        colors_dic = {}  # Will be set in detection
-        stframe = st.empty()
-        detect(cap, stframe, output_file_name, save_processed_separately, save_tactical_separately, save_combined, model_players, model_keypoints,
-               detection_hyper_params, ball_track_hyperparams, plot_hyperparams,
-               num_pal_colors, colors_dic, enable_resize, output_width, output_height)
-    else:
-        try:
-            cap.release()
-        except:
-            pass
+        job_id = detection_jobs[video_path] = submit_detection(
+            video_path, output_file_name, detection_hyper_params, ball_track_hyperparams, plot_hyperparams,
+            inference_params=st.session_state.inference_params,
+            save_processed_separately=save_processed_separately, save_tactical_separately=save_tactical_separately,
+            save_combined=save_combined, save_tracking=save_tracking,
+            enable_resize=enable_resize, output_width=output_width, output_height=output_height,
+            team_colors_dic=colors_dic, num_pal_colors=num_pal_colors, auto_teams=auto_teams,
+            ball_roi_size=ball_roi_size, pitch_roi=pitch_roi, frame_step=int(frame_step))
+        st.toast(f'¡Detección #{job_id} en cola!')
+    elif stop_detection and job_id is not None:
+        cancel_detection(job_id)
+        st.toast(f'Detección #{job_id} detenida.')
+
+    if job_id is not None:
+        show_detection_job(job_id)
+    with st.expander("Trabajos de detección recientes"):
+        show_recent_jobs()
@@ -2,7 +2,8 @@ import cv2
 import json
 import numpy as np
 import streamlit as st
-from core import homography
+from core import config, homography, models, tracker
+from engine import KEYPOINTS_MODEL_PATH, MODEL_EXPORT_DIR, PLAYERS_MODEL_PATH
 import matplotlib.pyplot as plt
 
 # Titulo de la página
@@ -14,23 +15,19 @@ with col_title2:
     st.write("") # Espacio
 
 # Función principal: Detecta jugadores en el primer frame y muestra mapa táctico
-def render_team_colors(tempf, model_players, model_keypoints):
-    cap_temp = cv2.VideoCapture(tempf.name)
+def render_team_colors(video_path, model_players, model_keypoints):
+    cap_temp = cv2.VideoCapture(video_path)
     cap_temp.set(cv2.CAP_PROP_POS_FRAMES, 1) # Mostrar solo el primer frame
     frame = cap_temp.read()[1] # Leer frame (ignorar success)
     frame_original = frame.copy() # Copia para mostrar sin anotaciones
 
     with st.spinner('Detectando jugadores...'):
-        # Ejecutar modelo de tracking en el frame
-        results = model_players.track(frame, conf=0.4, persist=True, tracker="botsort.yaml")
+        # Ejecutar detección en el frame con un tracker propio (el modelo es compartido entre sesiones)
+        results = model_players(frame, conf=0.4, verbose=False)
         # Extraer bounding boxes, etiquetas y IDs de detección
-        bboxes = results[0].boxes.xyxy.cpu().numpy() # Coordenadas de cajas
-        labels = results[0].boxes.cls.cpu().numpy() # Clases detectadas
-        ids = results[0].boxes.id # IDs de tracking
+        bboxes, labels, _, ids = tracker.update_tracker(tracker.create_tracker("botsort.yaml"), results[0])
 
-        if ids is not None:
-            ids = ids.cpu().numpy() # Convertir a numpy si existen
-        else:
+        if ids is None:
             ids = np.arange(len(bboxes)) # IDs fallback si no hay tracking
 
         # Lista de colores disponibles para asignar a jugadores
@@ -72,30 +69,16 @@ def render_team_colors(tempf, model_players, model_keypoints):
 
         # Detectar keypoints del campo para transformación homográfica
         results_keypoints = model_keypoints(frame, conf=0.7)
-        bboxes_keypoints = results_keypoints[0].boxes.xyxy.cpu().numpy() # Bboxes de keypoints
+        bboxes_keypoints_c = results_keypoints[0].boxes.xywh.cpu().numpy() # Bboxes de keypoints (x,y,w,h)
         labels_keypoints = results_keypoints[0].boxes.cls.cpu().numpy() # Clases de keypoints
-        # Mapeo de clases a nombres de puntos del campo
-        names = {0: 'TLC', 1: 'TRC', 2: 'TR6MC', 3: 'TL6MC', 4: 'TR6ML', 5: 'TL6ML', 6: 'TR18MC', 7: 'TL18MC', 8: 'TR18ML', 9: 'TL18ML', 10: 'TRArc', 11: 'TLArc', 12: 'RML', 13: 'RMC', 14: 'LMC', 15: 'LML', 16: 'BLC', 17: 'BRC', 18: 'BR6MC', 19: 'BL6MC', 20: 'BR6ML', 21: 'BL6ML', 22: 'BR18MC', 23: 'BL18MC', 24: 'BR18ML', 25: 'BL18ML', 26: 'BRArc', 27: 'BLArc'}
-        detected_labels = [names[int(cls)] for cls in labels_keypoints] # Nombres detectados
-        detected_src_pts = [] # Puntos fuente detectados
-
-        # Calcular centros de bboxes de keypoints
-        for bbox in bboxes_keypoints:
-            center = [(bbox[0] + bbox[2])/2, (bbox[1] + bbox[3])/2]
-            detected_src_pts.append(center)
-        detected_src_pts = np.array(detected_src_pts)
-
-        # Cargar posiciones predefinidas del mapa táctico
-        with open('app/config/map_labels_position.json') as f:
-            positions = json.load(f)
-
-        # Filtrar keypoints comunes entre detectados y mapa
-        common_labels = [label for label in detected_labels if label in positions]
-        detected_src_pts_filtered = np.array([detected_src_pts[detected_labels.index(label)] for label in common_labels])
-        detected_dst_pts = np.array([positions[label] for label in common_labels])
+
+        # Ubicar keypoints detectados y posiciones del mapa táctico en ranuras fijas por clase
+        keypoints_map_pos, classes_names_dic, _ = config.get_labels_dics()
+        keypoints_dst = config.get_keypoints_map_array(keypoints_map_pos, classes_names_dic)
+        keypoints_src, keypoints_mask = homography.keypoints_to_slots(labels_keypoints, bboxes_keypoints_c, keypoints_dst.shape[0])
 
         # Calcular matriz de homografía para transformar coordenadas
-        h_matrix, _, _, _ = homography.calculate_homography(common_labels, detected_src_pts_filtered, detected_dst_pts, 1)
+        h_matrix, _, _, _ = homography.calculate_homography(keypoints_src, keypoints_mask, keypoints_dst)
 
         # Transformar posiciones de jugadores al plano del mapa
         transformed_centers = None
@@ -168,10 +151,13 @@ def render_team_colors(tempf, model_players, model_keypoints):
     return colors_dic
 
 # Ejecutar la configuración de colores
-if "input_vide_file" not in st.session_state: # Verificar si hay video cargado
+if "video_path" not in st.session_state: # Verificar si hay video cargado
     st.error("Primero carga un video en la pestaña 'Carga de Video'.")
 else:
-    tempf = st.session_state.tempf # Obtener el archivo temporal del video
-    model_players = st.session_state.model_players # Obtener el modelo de detección de jugadores
-    colors_dic = render_team_colors(tempf, model_players, st.session_state.model_keypoints) # Ejecutar detección y obtener colores
+    video_path = st.session_state.video_path # Obtener la ruta del video en el almacén
+    inference_params = st.session_state.get('inference_params', {}) # Backend elegido en la pestaña de Parámetros
+    with st.spinner('Cargando modelos...'):
+        model_players = models.get_model(PLAYERS_MODEL_PATH, export_dir=MODEL_EXPORT_DIR, **inference_params) # Modelo de detección de jugadores (compartido)
+        model_keypoints = models.get_model(KEYPOINTS_MODEL_PATH, export_dir=MODEL_EXPORT_DIR, **inference_params) # Modelo de keypoints del campo (compartido)
+    colors_dic = render_team_colors(video_path, model_players, model_keypoints) # Ejecutar detección y obtener colores
     st.session_state.colors_dic = colors_dic # Guardar diccionario de colores en estado
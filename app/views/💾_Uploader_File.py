@@ -1,5 +1,7 @@
-import tempfile
+import os
 import streamlit as st
+from core import uploads
+from engine import UPLOAD_STORE_DIR, uploads_in_use
 
 # Titulo de la página
 col_title1, col_title2, col_title3 = st.columns([34, 36, 30])
@@ -13,36 +15,37 @@ with col_title2:
 def video_uploader():
     input_vide_file = st.file_uploader('Selecciona un video para procesar.', type=['mp4','mov', 'avi', 'm4v', 'asf'])
 
-    # Si se sube un nuevo video, procesarlo
+    # Si se sube un nuevo video, copiarlo por bloques al almacén (una sola vez por archivo subido)
     if input_vide_file:
-        tempf = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
-        tempf.write(input_vide_file.read())
-        video_display = open(tempf.name, 'rb')
-        video_bytes = video_display.read()
+        if st.session_state.get('video_file_id') != input_vide_file.file_id:
+            upload_store = uploads.open_upload_store(UPLOAD_STORE_DIR, in_use=uploads_in_use)
+            video_path, duplicate = uploads.store_upload(upload_store, input_vide_file,
+                                                         suffix=os.path.splitext(input_vide_file.name)[1] or '.mp4')
+            if duplicate:
+                st.toast('Este video ya estaba cargado; se reutiliza el archivo existente.')
+            st.session_state.video_file_id = input_vide_file.file_id
+            st.session_state.video_path = video_path
+            st.session_state.video_name = input_vide_file.name
 
         st.subheader('Video de Entrada')
-        st.video(video_bytes)
+        st.video(st.session_state.video_path)
+        return st.session_state.video_path
 
-        return input_vide_file, tempf, video_bytes
-
-    # Si ya hay un video cargado, mostrarlo
-    elif 'video_bytes' in st.session_state:
-        st.subheader('Video de Entrada (Cargado)')
-        st.video(st.session_state.video_bytes)
-
-        return st.session_state.input_vide_file, st.session_state.tempf, st.session_state.video_bytes
+    # Si ya hay un video cargado, mostrarlo desde el archivo
+    elif 'video_path' in st.session_state and os.path.isfile(st.session_state.video_path):
+        uploads.touch_upload(st.session_state.video_path)
+        st.subheader(f'Video de Entrada (Cargado: {st.session_state.video_name})')
+        st.video(st.session_state.video_path)
+        return st.session_state.video_path
 
     # No hay video
     else:
-        return None, None, None
+        return None
 
 # Ejecutar la función de carga
-input_vide_file, tempf, video_bytes = video_uploader()
+video_path = video_uploader()
 
-if input_vide_file:
-    st.session_state.input_vide_file = input_vide_file
-    st.session_state.tempf = tempf
-    st.session_state.video_bytes = video_bytes
+if video_path:
     st.success("Video cargado correctamente. Ahora puedes configurar los nombres de equipos y colores en la pestaña de Colores.")
 else:
     st.info("Por favor, carga un video para continuar.")
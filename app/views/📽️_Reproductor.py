@@ -1,6 +1,7 @@
 import os
-import tempfile
 import streamlit as st
+from core import uploads
+from engine import UPLOAD_STORE_DIR, uploads_in_use
 
 # Titulo de la página
 col_title1, col_title2, col_title3 = st.columns([34, 36, 30])
@@ -21,6 +22,8 @@ def render_local_video():
     st.divider()
 
     if uploaded_videos:
+        upload_store = uploads.open_upload_store(UPLOAD_STORE_DIR, in_use=uploads_in_use)
+        stored_paths = st.session_state.setdefault('player_video_paths', {}) # file_id -> ruta en el almacén
         # Mostrar videos en columnas (máximo 2 por fila)
         cols = st.columns(2)
         for i, video_file in enumerate(uploaded_videos):
@@ -28,13 +31,13 @@ def render_local_video():
             with cols[col_idx]:
                 st.markdown(f'<p style="text-align: center;">{video_file.name}</p>', unsafe_allow_html=True)
                 st.markdown(f'<p style="text-align: center;">Tamaño: {video_file.size/1024/1024:.1f} MB</p>', unsafe_allow_html=True)
-                # Guardar archivo temporalmente
-                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(video_file.name)[1]) as temp_file:
-                    temp_file.write(video_file.getvalue())
-                    temp_file_path = temp_file.name
+                # Guardar en el almacén por bloques solo la primera vez (no en cada recarga de la página)
+                if video_file.file_id not in stored_paths or not os.path.isfile(stored_paths[video_file.file_id]):
+                    stored_paths[video_file.file_id], _ = uploads.store_upload(
+                        upload_store, video_file, suffix=os.path.splitext(video_file.name)[1])
 
-                # Reproducir video
-                st.video(temp_file_path)
+                # Reproducir video desde el archivo
+                st.video(stored_paths[video_file.file_id])
 
 # Ejecutar la página
 render_local_video()
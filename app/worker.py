@@ -0,0 +1,229 @@
+import os
+import sys
+import cv2
+import time
+import signal
+import socket
+import argparse
+import threading
+import subprocess
+import traceback
+import multiprocessing
+from core import cache, checkpoint, jobs, models, profiling
+from engine import (CHECKPOINT_DIR, DETECTION_CACHE_DIR, JOB_PREVIEW_DIR, JOB_WORKERS, JOBS_DB_PATH, KEYPOINTS_MODEL_PATH, METRICS_DIR,
+                    MODEL_EXPORT_DIR, PLAYERS_MODEL_PATH, process_video)
+
+"""
+Worker de la cola de trabajos de detección.
+La interfaz solo encola trabajos (core.jobs) y consulta su progreso; los workers los ejecutan en procesos
+propios, por lo que un trabajo sobrevive a recargas de la página y desconexiones del navegador.
+Cada worker publica las métricas por etapa de su trabajo en curso en METRICS_DIR/worker-<pid>.prom
+(para el colector de archivos de node_exporter) y guarda el resumen de cada trabajo en METRICS_DIR/job<id>.json.
+Uso:
+    python app/worker.py --concurrency 2
+"""
+
+def detection_job_params(video_path, output_file_name, hyper_params, ball_track_hyperparams, plot_hyperparams,
+                         inference_params=None, **kwargs):
+    """
+    Construye los parámetros (serializables a JSON) de un trabajo de detección.
+    Args:
+        video_path: Ruta del video de entrada (en el almacén de subidas)
+        output_file_name: Nombre base de las salidas
+        hyper_params: Hiperparámetros de detección {0: p_conf, 1: k_conf, 2: k_d_tol}
+        ball_track_hyperparams: {0: frames sin balón, 1: distancia máxima, 2: longitud máxima}
+        plot_hyperparams: {0: show_k, 1: show_pal, 2: show_b, 3: show_p}
+        inference_params: {'backend', 'imgsz', 'threads'} de los modelos (ver models.get_model)
+        **kwargs: Resto de parámetros de process_video (save_tracking, team_colors_dic, frame_step, ...)
+    Returns:
+        params: Diccionario de parámetros del trabajo
+    """
+    # JSON no admite claves enteras: los diccionarios {0: ..., 1: ...} se guardan como listas
+    return {
+        'video_path': os.path.abspath(video_path),
+        'output_file_name': output_file_name,
+        'hyper_params': [hyper_params[i] for i in range(len(hyper_params))],
+        'ball_track_hyperparams': [ball_track_hyperparams[i] for i in range(len(ball_track_hyperparams))],
+        'plot_hyperparams': [plot_hyperparams[i] for i in range(len(plot_hyperparams))],
+        'inference_params': inference_params or {},
+        'process_params': kwargs
+    }
+
+def _write_preview(path, final_img, max_width=960):
+    # Vista previa para la interfaz; se reemplaza de forma atómica para no leer una imagen a medio escribir
+    scale = min(1.0, max_width / final_img.shape[1])
+    preview = cv2.resize(final_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else final_img
+    tmp_path = f'{path}.tmp.jpg'
+    cv2.imwrite(tmp_path, preview, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    os.replace(tmp_path, path)
+
+def run_detection_job(job_queue, job, progress_interval=1.0):
+    """
+    Ejecuta un trabajo de detección con process_video, publicando el progreso y una vista previa.
+    El trabajo guarda checkpoints periódicos: si su worker se detiene, al volver a tomarlo continúa desde el último.
+    Las métricas por etapa se publican en formato Prometheus con cada actualización de progreso y su resumen
+    se guarda en JSON al terminar (también si el trabajo falla o se cancela).
+    Args:
+        job_queue: Cola abierta con jobs.open_job_queue
+        job: Trabajo tomado con jobs.claim_job
+        progress_interval: Segundos mínimos entre actualizaciones de progreso
+    Returns:
+        result: Diccionario con los nombres de las salidas
+    Raises:
+        jobs.JobCancelled: Si se pidió cancelar el trabajo
+    """
+    params = job['params']
+    process_params = dict(params['process_params'])
+    if process_params.get('team_colors_dic'):
+        process_params['team_colors_dic'] = {team: [tuple(color) for color in colors]
+                                             for team, colors in process_params['team_colors_dic'].items()}
+    # Modelos compartidos por los trabajos de este proceso (se cargan con el primero)
+    model_players = models.get_model(PLAYERS_MODEL_PATH, export_dir=MODEL_EXPORT_DIR, **params['inference_params'])
+    model_keypoints = models.get_model(KEYPOINTS_MODEL_PATH, export_dir=MODEL_EXPORT_DIR, **params['inference_params'])
+
+    os.makedirs(JOB_PREVIEW_DIR, exist_ok=True)
+    preview_path = os.path.join(JOB_PREVIEW_DIR, f"{job['id']}.jpg")
+
+    metrics = profiling.create_metrics()
+    metrics_labels = {'job': job['id'], 'worker': os.getpid()}
+
+    def on_progress(frame_nbr, tot_nbr_frames, final_img):
+        _write_preview(preview_path, final_img)
+        profiling.save_prometheus(metrics, worker_metrics_path(), metrics_labels)
+        if jobs.update_job_progress(job_queue, job['id'], frame_nbr, tot_nbr_frames, os.path.abspath(preview_path)):
+            raise jobs.JobCancelled() # Detiene process_video (que cierra sus escritores); worker_loop elimina los segmentos con discard_checkpoint
+
+    cap = cv2.VideoCapture(params['video_path'])
+    if not cap.isOpened():
+        raise FileNotFoundError(f"No se pudo abrir el video: {params['video_path']}")
+    try:
+        processed_name, tactical_name, combined_name, tracking_name = process_video(
+            cap, model_players, model_keypoints,
+            dict(enumerate(params['hyper_params'])), dict(enumerate(params['ball_track_hyperparams'])),
+            dict(enumerate(params['plot_hyperparams'])),
+            output_file_name=params['output_file_name'], progress_callback=on_progress, progress_interval=progress_interval,
+            detection_cache=cache.open_detection_cache(DETECTION_CACHE_DIR), video_path=params['video_path'],
+            checkpoint_dir=job_checkpoint_dir(job['id']), metrics=metrics, **process_params)
+    finally:
+        cap.release()
+        profiling.save_prometheus(metrics, worker_metrics_path(), metrics_labels)
+        profiling.save_metrics_json(metrics, os.path.join(METRICS_DIR, f"job{job['id']}.json"),
+                                    {'job': job['id'], 'video': params['video_path']})
+    return {'processed': processed_name, 'tactical': tactical_name, 'combined': combined_name, 'tracking': tracking_name}
+
+def job_checkpoint_dir(job_id):
+    """
+    Directorio de checkpoints de un trabajo de detección.
+    """
+    return os.path.join(CHECKPOINT_DIR, f'job{job_id}')
+
+def worker_metrics_path():
+    """
+    Archivo .prom con las métricas del trabajo en curso (o del último) de este proceso worker.
+    """
+    return os.path.join(METRICS_DIR, f'worker-{os.getpid()}.prom')
+
+def _heartbeat_loop(job_queue, worker_id, current, stop_event, interval):
+    # Latido del worker (y de su trabajo en curso) mientras el hilo principal procesa
+    while not stop_event.wait(interval):
+        try:
+            jobs.worker_heartbeat(job_queue, worker_id, current.get('job_id'))
+        except Exception:
+            pass # Base ocupada: el siguiente latido lo reintenta
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt()
+
+def worker_loop(db_path=JOBS_DB_PATH, max_running=JOB_WORKERS, poll_interval=1.0, heartbeat_interval=10.0, max_jobs=None):
+    """
+    Bucle de un worker: toma trabajos de la cola y los ejecuta de a uno.
+    Args:
+        db_path: Ruta de la base de la cola
+        max_running: Límite global de trabajos en curso (ver jobs.claim_job)
+        poll_interval: Segundos entre consultas a la cola cuando no hay trabajo
+        heartbeat_interval: Segundos entre latidos
+        max_jobs: Terminar tras ejecutar este número de trabajos (None: sin límite)
+    """
+    signal.signal(signal.SIGTERM, _raise_interrupt) # Detener como con Ctrl+C: el trabajo en curso vuelve a la cola
+    job_queue = jobs.open_job_queue(db_path)
+    worker_id = f'{socket.gethostname()}-{os.getpid()}'
+    current = {}
+    stop_event = threading.Event()
+    jobs.worker_heartbeat(job_queue, worker_id)
+    heartbeat = threading.Thread(target=_heartbeat_loop, args=(job_queue, worker_id, current, stop_event, heartbeat_interval),
+                                 daemon=True)
+    heartbeat.start()
+    nbr_jobs = 0
+    try:
+        while max_jobs is None or nbr_jobs < max_jobs:
+            jobs.requeue_stale_jobs(job_queue)
+            job = jobs.claim_job(job_queue, worker_id, max_running)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            current['job_id'] = job['id']
+            try:
+                result = run_detection_job(job_queue, job)
+                jobs.finish_job(job_queue, job['id'], jobs.JOB_DONE, result=result)
+            except jobs.JobCancelled:
+                checkpoint.discard_checkpoint(job_checkpoint_dir(job['id']))
+                jobs.finish_job(job_queue, job['id'], jobs.JOB_CANCELLED)
+            except KeyboardInterrupt:
+                jobs.release_job(job_queue, job['id']) # Worker detenido: el trabajo vuelve a la cola y conserva su checkpoint
+                raise
+            except Exception as e:
+                traceback.print_exc()
+                checkpoint.discard_checkpoint(job_checkpoint_dir(job['id']))
+                jobs.finish_job(job_queue, job['id'], jobs.JOB_FAILED, error=f'{type(e).__name__}: {e}')
+            finally:
+                current.pop('job_id', None)
+            nbr_jobs += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        jobs.remove_worker(job_queue, worker_id)
+        if os.path.isfile(worker_metrics_path()):
+            os.remove(worker_metrics_path()) # Un worker detenido no debe seguir exportando métricas
+
+def start_worker_service(concurrency=JOB_WORKERS, db_path=JOBS_DB_PATH):
+    """
+    Lanza el servicio de workers en segundo plano, desvinculado del proceso actual
+    (p. ej. desde la interfaz cuando no hay ningún worker activo).
+    Args:
+        concurrency: Número de workers (y límite de trabajos en curso)
+        db_path: Ruta de la base de la cola
+    Returns:
+        process: subprocess.Popen del servicio
+    """
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), '--concurrency', str(concurrency), '--db', db_path],
+                            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Workers de la cola de trabajos de detección.')
+    parser.add_argument('--concurrency', type=int, default=JOB_WORKERS, help='Trabajos de detección a la vez (un proceso por trabajo)')
+    parser.add_argument('--db', default=JOBS_DB_PATH, help='Base SQLite de la cola de trabajos')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='Segundos entre consultas a la cola')
+    args = parser.parse_args(argv)
+
+    # Un proceso por worker: cada trabajo tiene su propio intérprete (sin competir por el GIL)
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=worker_loop, args=(args.db, args.concurrency, args.poll_interval), daemon=False)
+                 for _ in range(max(1, args.concurrency))]
+    for process in processes:
+        process.start()
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            if process.is_alive():
+                process.terminate() # Cada worker devuelve su trabajo a la cola antes de salir
+        for process in processes:
+            process.join()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
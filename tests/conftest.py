@@ -0,0 +1,5 @@
+import os
+import sys
+
+# La aplicación se ejecuta con app/ en sys.path (from core import ..., from engine import ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
@@ -0,0 +1,66 @@
+import numpy as np
+from core import annotations, balltrack
+
+COLORS = {'Equipo A': [(255, 0, 0)], 'Equipo B': [(0, 0, 255)], 'Árbitro': [(255, 255, 0)]}
+
+def _tac_map(seed=0):
+    # Fondo con ruido para que cualquier píxel sin restaurar se note
+    return np.random.default_rng(seed).integers(0, 256, (120, 200, 3), dtype=np.uint8)
+
+def _frames(nbr_frames, seed=1):
+    # Posiciones por frame (incluye puntos en los bordes, parcialmente fuera del mapa) y balón opcional
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(nbr_frames):
+        nbr_players = int(rng.integers(0, 6))
+        pts = rng.uniform(-5, 205, (nbr_players, 2))
+        teams = rng.integers(0, len(COLORS), nbr_players).tolist()
+        ids = rng.integers(1, 200, nbr_players).tolist()
+        ball = None if i % 3 == 2 else rng.uniform(0, 200, 2)
+        frames.append((pts, ball, teams, ids))
+    return frames
+
+def _copy_path(tac_map, pts, ball, teams, ids, ball_track=None):
+    # Camino de referencia: copia completa del mapa en cada frame
+    canvas = tac_map.copy()
+    annotations.annotate_tactical_map(canvas, pts, ball, teams, COLORS, ids)
+    if ball_track is not None:
+        annotations.draw_ball_trajectory(canvas, ball_track)
+    return canvas
+
+def test_restore_regions_clips_and_clears_dirty():
+    background = _tac_map()
+    canvas = background.copy()
+    canvas[:] = 0
+    dirty = [(-10, -10, 20, 30), (190, 110, 260, 400), (50, 50, 40, 60)]
+    annotations.restore_regions(canvas, background, dirty)
+    assert dirty == []
+    np.testing.assert_array_equal(canvas[:31, :21], background[:31, :21])
+    np.testing.assert_array_equal(canvas[110:, 190:], background[110:, 190:])
+    assert not canvas[40:100, 30:180].any() # El rectángulo vacío (x0 > x1) no restaura nada
+
+def test_renderer_matches_copy_path():
+    tac_map = _tac_map()
+    original = tac_map.copy()
+    renderer = annotations.create_tactical_renderer(tac_map)
+    for pts, ball, teams, ids in _frames(30):
+        canvas = annotations.render_tactical_map(renderer, pts, ball, teams, COLORS, ids)
+        np.testing.assert_array_equal(canvas, _copy_path(tac_map, pts, ball, teams, ids))
+    np.testing.assert_array_equal(tac_map, original) # El fondo no se modifica
+
+def test_renderer_with_ball_track_and_rotating_canvases_matches_copy_path():
+    tac_map = _tac_map()
+    canvases = [np.zeros_like(tac_map) for _ in range(3)]
+    renderer = annotations.create_tactical_renderer(tac_map, canvases=canvases)
+    ball_track = balltrack.create_ball_track(8)
+    rendered, expected = [], []
+    for pts, ball, teams, ids in _frames(25, seed=2):
+        if ball is not None:
+            balltrack.update_ball_track(ball_track, ball, ball, np.eye(3), 1000, 3)
+        canvas = annotations.render_tactical_map(renderer, pts, ball, teams, COLORS, ids, ball_track)
+        rendered.append(canvas)
+        expected.append(_copy_path(tac_map, pts, ball, teams, ids, ball_track))
+        # Los lienzos entregados en los últimos nbr_canvases - 1 frames siguen intactos
+        for canvas, reference in zip(rendered[-3:], expected[-3:]):
+            np.testing.assert_array_equal(canvas, reference)
+    assert rendered[0] is canvases[0] and rendered[3] is canvases[0]
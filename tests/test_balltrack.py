@@ -0,0 +1,61 @@
+import numpy as np
+from core import balltrack
+
+IDENTITY = np.eye(3)
+
+def _feed(ball_track, positions, dist_thresh=50, max_missed=3):
+    # Actualiza el seguimiento con posiciones del frame (None = sin detección); el mapa es la identidad
+    predicted = []
+    for pos in positions:
+        pos = None if pos is None else np.array(pos, dtype=np.float64)
+        predicted.append(balltrack.update_ball_track(ball_track, pos, pos, IDENTITY, dist_thresh, max_missed))
+    return predicted
+
+def test_ring_buffer_keeps_last_points_in_order():
+    ball_track = balltrack.create_ball_track(4)
+    positions = [(10.0 * i, 5.0) for i in range(7)]
+    _feed(ball_track, positions)
+    assert ball_track['length'] == 4
+    np.testing.assert_array_equal(balltrack.ball_track_points(ball_track, 'dst'), positions[-4:])
+    np.testing.assert_array_equal(balltrack.ball_track_points(ball_track, 'src'), positions[-4:])
+    np.testing.assert_array_equal(balltrack.ball_track_points(ball_track)[:, 0], np.array(positions[-4:], dtype=np.int32))
+
+def test_points_are_a_view_without_copy():
+    ball_track = balltrack.create_ball_track(3)
+    _feed(ball_track, [(1.0, 1.0), (2.0, 2.0), (3.0, 3.0), (4.0, 4.0)])
+    points = balltrack.ball_track_points(ball_track, 'dst')
+    assert np.shares_memory(points, ball_track['dst'])
+
+def test_gap_is_filled_with_constant_velocity_prediction():
+    ball_track = balltrack.create_ball_track(20)
+    predicted = _feed(ball_track, [(10.0 * i, 100.0) for i in range(8)] + [None, None])
+    assert predicted[:8] == [None] * 8
+    # El filtro aprendió la velocidad (+10 px/frame en x): los huecos siguen la trayectoria
+    assert abs(predicted[8][0] - 80.0) < 3.0 and abs(predicted[8][1] - 100.0) < 1.0
+    assert abs(predicted[9][0] - 90.0) < 3.0
+    assert ball_track['length'] == 10 and ball_track['nbr_missed'] == 2
+
+def test_track_resets_after_too_many_missed_frames():
+    ball_track = balltrack.create_ball_track(20)
+    predicted = _feed(ball_track, [(0.0, 0.0), (1.0, 0.0)] + [None] * 4, max_missed=3)
+    assert all(p is not None for p in predicted[2:5])
+    assert predicted[5] is None
+    assert ball_track['length'] == 0
+
+def test_far_detection_starts_new_track():
+    ball_track = balltrack.create_ball_track(20)
+    _feed(ball_track, [(0.0, 0.0), (2.0, 0.0), (500.0, 500.0)], dist_thresh=50)
+    assert ball_track['length'] == 1
+    np.testing.assert_array_equal(balltrack.ball_track_points(ball_track, 'src'), [(500.0, 500.0)])
+
+def test_ball_rois_follow_prediction_and_stay_inside_frame():
+    ball_search = balltrack.create_ball_search(roi_size=100, nbr_frames_no_ball_thresh=2)
+    assert balltrack.predict_ball_rois(ball_search, (720, 1280), 2) == [None, None]
+    balltrack.update_ball_search(ball_search, (20.0, 360.0), False)
+    rois = balltrack.predict_ball_rois(ball_search, (720, 1280), 3)
+    assert rois[0] == (0, 310, 100, 410) # Desplazada para quedar dentro del frame
+    assert rois[2] is None # La búsqueda por ventana expira tras max_missed frames
+    balltrack.update_ball_search(ball_search, None, True)
+    balltrack.update_ball_search(ball_search, None, True)
+    assert not ball_search['active']
+    assert (ball_search['nbr_roi'], ball_search['nbr_full']) == (2, 1)
@@ -0,0 +1,137 @@
+import os
+import cv2
+import numpy as np
+import pyarrow.parquet as pq
+from core import checkpoint, export, output
+
+def _touch(path, content=b'video'):
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+def _write_tracking(path, frames):
+    writer = export.open_tracking_writer(path, fps=25.0)
+    for frame_nbr in frames:
+        detections = {'bboxes_p_c': np.array([[10.0, 10.0, 4.0, 8.0]]), 'labels_p': [0], 'confs_p': np.array([0.9])}
+        writer = export.write_tracking_rows(writer, export.frame_tracking_rows(frame_nbr, detections, None, None, [3], [0]))
+    export.close_tracking_writer(writer)
+
+def _segments(outputs_dir, nbr_segments):
+    # Salidas de cada segmento como las devuelve process_video: (procesado, táctico, combinado, tracking)
+    segments = []
+    for k in range(nbr_segments):
+        base = checkpoint.segment_file_name('run', k)
+        names = (f'{base}_processed.mp4', None, f'{base}_combined.mp4', f'{base}_tracking.parquet')
+        _touch(os.path.join(outputs_dir, names[0]), f'processed {k}'.encode())
+        _touch(os.path.join(outputs_dir, names[2]), f'combined {k}'.encode())
+        _write_tracking(os.path.join(outputs_dir, names[3]), range(10 * k + 1, 10 * k + 11))
+        segments.append(names)
+    return segments
+
+OUTPUT_NAMES = ('run_processed.mp4', None, 'run_combined.mp4', 'run_tracking.parquet')
+
+def test_plan_segments_end_on_keyframes():
+    assert checkpoint.plan_checkpoint_segments(1, 100, None) == [(1, 100)]
+    assert checkpoint.plan_checkpoint_segments(1, 10, 4) == [(1, 5), (6, 9), (10, 10)]
+    segments = checkpoint.plan_checkpoint_segments(1, 100, 30, frame_step=4)
+    assert segments == [(1, 33), (34, 65), (66, 97), (98, 100)]
+    assert all((end - 1) % 4 == 0 for _, end in segments[:-1]) # Frames clave: 1, 5, 9...
+
+def test_save_and_load_require_same_fingerprint(tmp_path):
+    video_path = _touch(str(tmp_path / 'match.mp4'))
+    fingerprint = checkpoint.checkpoint_fingerprint(video_path, {'conf': 0.5})
+    assert fingerprint == checkpoint.checkpoint_fingerprint(video_path, {'conf': 0.5})
+    assert fingerprint != checkpoint.checkpoint_fingerprint(video_path, {'conf': 0.6})
+
+    checkpoint_dir = str(tmp_path / 'ckpt')
+    assert checkpoint.load_checkpoint(checkpoint_dir, fingerprint) is None
+    checkpoint.save_checkpoint(checkpoint_dir, {'fingerprint': fingerprint, 'next_frame': 31, 'video_path': video_path})
+    assert checkpoint.load_checkpoint(checkpoint_dir, fingerprint)['next_frame'] == 31
+    assert checkpoint.load_checkpoint(checkpoint_dir, 'otra huella') is None
+    assert os.listdir(checkpoint_dir) == ['checkpoint.pkl'] # Sin temporales
+
+    _touch(video_path, b'video modificado') # Cambia el tamaño: otra huella
+    assert checkpoint.load_checkpoint(checkpoint_dir, checkpoint.checkpoint_fingerprint(video_path, {'conf': 0.5})) is None
+    _touch(os.path.join(checkpoint_dir, 'checkpoint.pkl'), b'corrupto')
+    assert checkpoint.load_checkpoint(checkpoint_dir, fingerprint) is None
+
+def test_join_single_segment_renames(tmp_path):
+    outputs_dir = str(tmp_path)
+    segments = _segments(outputs_dir, 1)
+    assert checkpoint.join_checkpoint_segments(segments, OUTPUT_NAMES, 25.0, outputs_dir) == OUTPUT_NAMES
+    with open(tmp_path / 'run_processed.mp4', 'rb') as f:
+        assert f.read() == b'processed 0'
+    assert sorted(os.listdir(outputs_dir)) == sorted(name for name in OUTPUT_NAMES if name)
+
+def _write_video(path, levels):
+    # Video corto con un nivel de gris por frame (mp4v: disponible en cualquier build de OpenCV)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 25.0, (64, 48))
+    for level in levels:
+        writer.write(np.full((48, 64, 3), level, dtype=np.uint8))
+    writer.release()
+
+def _read_levels(path):
+    cap = cv2.VideoCapture(path)
+    levels = []
+    while True:
+        success, frame = cap.read()
+        if not success:
+            break
+        levels.append(int(round(frame.mean())))
+    cap.release()
+    return levels
+
+def test_join_without_ffmpeg_reencodes_into_mp4(tmp_path, monkeypatch):
+    monkeypatch.setattr(output.shutil, 'which', lambda name: None) # Sin ffmpeg en el PATH
+    fourcc = cv2.VideoWriter_fourcc
+    monkeypatch.setattr(output.cv2, 'VideoWriter_fourcc', lambda *code: fourcc(*'mp4v')) # avc1 depende del build
+    outputs_dir = str(tmp_path)
+    segments = _segments(outputs_dir, 3)
+    for k, names in enumerate(segments):
+        for i in (0, 2):
+            _write_video(os.path.join(outputs_dir, names[i]), [40 * k + 10, 40 * k + 30])
+
+    assert checkpoint.join_checkpoint_segments(segments, OUTPUT_NAMES, 25.0, outputs_dir) == OUTPUT_NAMES
+    for name in ('run_processed.mp4', 'run_combined.mp4'):
+        levels = _read_levels(os.path.join(outputs_dir, name))
+        assert len(levels) == 6 and levels == sorted(levels) # Todos los frames, en el orden de los segmentos
+        assert all(abs(level - expected) <= 8 for level, expected in zip(levels, [10, 30, 50, 70, 90, 110])) # Con pérdidas
+    assert pq.read_table(os.path.join(outputs_dir, 'run_tracking.parquet')).column('frame').to_pylist() == list(range(1, 31))
+    assert sorted(os.listdir(outputs_dir)) == sorted(name for name in OUTPUT_NAMES if name) # Segmentos eliminados
+
+def test_join_with_stream_copy_removes_segments(tmp_path, monkeypatch):
+    def concat_copy(paths, output_path):
+        contents = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                contents.append(f.read())
+        _touch(output_path, b'|'.join(contents))
+        return True
+
+    monkeypatch.setattr(checkpoint, 'concat_videos_copy', concat_copy)
+    outputs_dir = str(tmp_path)
+    segments = _segments(outputs_dir, 2)
+    assert checkpoint.join_checkpoint_segments(segments, OUTPUT_NAMES, 25.0, outputs_dir) == OUTPUT_NAMES
+    with open(tmp_path / 'run_combined.mp4', 'rb') as f:
+        assert f.read() == b'combined 0|combined 1'
+    assert sorted(os.listdir(outputs_dir)) == sorted(name for name in OUTPUT_NAMES if name)
+
+def test_discard_checkpoint_and_video_paths(tmp_path):
+    outputs_dir = str(tmp_path / 'outputs')
+    os.makedirs(outputs_dir)
+    root = tmp_path / 'checkpoints'
+    kept = _touch(os.path.join(outputs_dir, 'other_seg0000_processed.mp4'))
+    _segments(outputs_dir, 2)
+    checkpoint.save_checkpoint(str(root / 'job_1'), {'output_file_name': 'run', 'video_path': 'uploads/a.mp4'})
+    checkpoint.save_checkpoint(str(root / 'job_2' / 'shard_0'), {'output_file_name': 'other', 'video_path': 'uploads/b.mp4'})
+    os.makedirs(root / 'job_3')
+    _touch(str(root / 'job_3' / 'checkpoint.pkl'), b'corrupto')
+    assert checkpoint.checkpoint_video_paths(str(root)) == {os.path.abspath('uploads/a.mp4'), os.path.abspath('uploads/b.mp4')}
+    assert checkpoint.checkpoint_video_paths(str(tmp_path / 'missing')) == set()
+
+    checkpoint.discard_checkpoint(str(root / 'job_1'), outputs_dir)
+    assert not (root / 'job_1').exists()
+    assert os.listdir(outputs_dir) == [os.path.basename(kept)] # Solo los segmentos de la ejecución descartada
+
+    checkpoint.discard_checkpoint(str(root / 'job_2' / 'shard_0'), outputs_dir, remove_segments=False)
+    assert not (root / 'job_2' / 'shard_0').exists() and os.path.isfile(kept)
@@ -0,0 +1,12 @@
+import pytest
+import cli
+
+TEAM1 = ['--team1', 'Local', '#FFFFFF', '#00FF00']
+TEAM2 = ['--team2', 'Visitante', '#000000', '#FF0000']
+
+def test_teams_must_be_given_together():
+    for argv in (TEAM1, TEAM2):
+        with pytest.raises(SystemExit):
+            cli.parse_args(['match.mp4', *argv])
+    args = cli.parse_args(['match.mp4', *TEAM1, *TEAM2])
+    assert args.team1 == ['Local', '#FFFFFF', '#00FF00'] and args.team2[0] == 'Visitante'
@@ -0,0 +1,46 @@
+import numpy as np
+import pyarrow.parquet as pq
+from core import export
+
+def _detections(nbr_players, with_ball, offset=0.0):
+    # Jugadores en fila y, opcionalmente, un balón al final (bboxes centradas x, y, w, h)
+    bboxes = [[100.0 + 10 * i + offset, 200.0, 20.0, 40.0] for i in range(nbr_players)]
+    labels = [0] * nbr_players
+    if with_ball:
+        bboxes.append([50.0 + offset, 60.0, 8.0, 8.0])
+        labels.append(2)
+    return {'bboxes_p_c': np.array(bboxes).reshape(-1, 4), 'labels_p': labels,
+            'confs_p': np.linspace(0.5, 0.9, len(labels))}
+
+def test_frame_rows_use_feet_and_ball_center():
+    detections = _detections(2, True)
+    rows = export.frame_tracking_rows(7, detections, np.array([[1.0, 2.0], [3.0, 4.0]]), np.array([5.0, 6.0]), [11, 12], [0, 1])
+    np.testing.assert_array_equal(rows['label'], [0, 0, 2])
+    np.testing.assert_array_equal(rows['track_id'], [11, 12, -1])
+    np.testing.assert_array_equal(rows['team'], [0, 1, -1])
+    np.testing.assert_allclose(rows['src_y'], [220.0, 220.0, 60.0]) # Pies: y_centro + h/2
+    np.testing.assert_allclose(rows['map_x'], [1.0, 3.0, 5.0])
+
+def test_rows_without_homography_have_nan_map_positions():
+    rows = export.frame_tracking_rows(1, _detections(2, False), None, None, [1, 2], [0, 0])
+    assert np.isnan(rows['map_x']).all() and np.isnan(rows['map_y']).all()
+
+def test_parquet_round_trip_across_row_groups(tmp_path):
+    path = str(tmp_path / 'tracking.parquet')
+    writer = export.open_tracking_writer(path, fps=25.0, row_group_size=5)
+    expected = []
+    for frame_nbr in range(1, 8):
+        rows = export.frame_tracking_rows(frame_nbr, _detections(3, frame_nbr % 2 == 0, frame_nbr),
+                                          np.full((3, 2), float(frame_nbr)), np.array([0.5, 0.5]), [1, 2, 3], [0, 1, 0])
+        expected.append(rows)
+        writer = export.write_tracking_rows(writer, rows)
+    assert export.write_tracking_rows(None, expected[0]) is None # Deshabilitado: no hace nada
+    export.close_tracking_writer(writer)
+
+    table = pq.read_table(path)
+    assert table.schema == export.TRACKING_SCHEMA
+    assert pq.ParquetFile(path).metadata.num_row_groups > 1
+    data = table.to_pydict()
+    for name in expected[0]:
+        np.testing.assert_array_equal(np.array(data[name]), np.concatenate([rows[name] for rows in expected]).astype(np.array(data[name]).dtype))
+    np.testing.assert_allclose(data['time_s'], (np.array(data['frame']) - 1) / 25.0)
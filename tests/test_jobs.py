@@ -0,0 +1,91 @@
+import os
+import sqlite3
+from core import jobs
+
+def _queue(tmp_path, **kwargs):
+    return jobs.open_job_queue(str(tmp_path / 'queue' / 'jobs.db'), **kwargs)
+
+def _expire_heartbeat(job_queue, job_id):
+    # Simula un worker que dejó de dar latidos
+    with sqlite3.connect(job_queue['path']) as connection:
+        connection.execute('UPDATE jobs SET heartbeat = 0 WHERE id = ?', (job_id,))
+
+def test_claim_in_fifo_order_with_max_running(tmp_path):
+    job_queue = _queue(tmp_path)
+    first = jobs.submit_job(job_queue, {'video_path': 'a.mp4'})
+    second = jobs.submit_job(job_queue, {'video_path': 'b.mp4'})
+    assert jobs.queue_position(job_queue, second) == 1
+
+    job = jobs.claim_job(job_queue, 'w1')
+    assert job['id'] == first and job['status'] == jobs.JOB_RUNNING and job['worker'] == 'w1'
+    assert job['params'] == {'video_path': 'a.mp4'} and job['attempts'] == 1
+    assert jobs.claim_job(job_queue, 'w2') is None # Límite de trabajos en curso en toda la cola
+    assert jobs.claim_job(job_queue, 'w2', max_running=2)['id'] == second
+    assert jobs.claim_job(job_queue, 'w2', max_running=3) is None # Cola vacía
+
+def test_progress_finish_and_list(tmp_path):
+    job_queue = _queue(tmp_path)
+    job_id = jobs.submit_job(job_queue, {'video_path': 'a.mp4'})
+    jobs.claim_job(job_queue, 'w1')
+    assert jobs.update_job_progress(job_queue, job_id, 10, 100, 'preview.jpg') is False
+    jobs.update_job_progress(job_queue, job_id, 20, 100)
+    job = jobs.get_job(job_queue, job_id)
+    assert (job['frame_nbr'], job['tot_nbr_frames'], job['preview_path']) == (20, 100, 'preview.jpg')
+
+    jobs.finish_job(job_queue, job_id, jobs.JOB_DONE, result={'outputs': ['a_processed.mp4']})
+    newer = jobs.submit_job(job_queue, {})
+    listed = jobs.list_jobs(job_queue)
+    assert [job['id'] for job in listed] == [newer, job_id]
+    assert listed[1]['status'] == jobs.JOB_DONE and listed[1]['result'] == {'outputs': ['a_processed.mp4']}
+    assert jobs.get_job(job_queue, 999) is None
+
+def test_cancel_queued_and_running_jobs(tmp_path):
+    job_queue = _queue(tmp_path)
+    running = jobs.submit_job(job_queue, {})
+    queued = jobs.submit_job(job_queue, {})
+    jobs.claim_job(job_queue, 'w1')
+
+    jobs.cancel_job(job_queue, queued)
+    assert jobs.get_job(job_queue, queued)['status'] == jobs.JOB_CANCELLED
+    jobs.cancel_job(job_queue, running) # En curso: solo se pide, el worker lo detiene
+    assert jobs.get_job(job_queue, running)['status'] == jobs.JOB_RUNNING
+    assert jobs.update_job_progress(job_queue, running, 1, 10) is True
+
+def test_release_returns_job_without_spending_an_attempt(tmp_path):
+    job_queue = _queue(tmp_path)
+    job_id = jobs.submit_job(job_queue, {})
+    jobs.claim_job(job_queue, 'w1')
+    jobs.release_job(job_queue, job_id)
+    job = jobs.get_job(job_queue, job_id)
+    assert (job['status'], job['worker'], job['attempts']) == (jobs.JOB_QUEUED, None, 0)
+
+def test_requeue_stale_jobs(tmp_path):
+    job_queue = _queue(tmp_path, max_attempts=2)
+    retried, cancelled = jobs.submit_job(job_queue, {}), jobs.submit_job(job_queue, {})
+    for job_id in (retried, cancelled):
+        jobs.claim_job(job_queue, 'w1', max_running=2)
+        _expire_heartbeat(job_queue, job_id)
+    jobs.cancel_job(job_queue, cancelled)
+    jobs.worker_heartbeat(job_queue, 'w1')
+    assert [worker['id'] for worker in jobs.active_workers(job_queue)] == ['w1']
+
+    assert jobs.requeue_stale_jobs(job_queue) == 2
+    assert jobs.get_job(job_queue, retried)['status'] == jobs.JOB_QUEUED
+    assert jobs.get_job(job_queue, cancelled)['status'] == jobs.JOB_CANCELLED
+
+    jobs.claim_job(job_queue, 'w2') # Segundo intento: agota max_attempts
+    _expire_heartbeat(job_queue, retried)
+    assert jobs.requeue_stale_jobs(job_queue) == 1
+    job = jobs.get_job(job_queue, retried)
+    assert job['status'] == jobs.JOB_FAILED and job['error']
+    assert jobs.requeue_stale_jobs(job_queue) == 0
+
+def test_pending_job_videos_excludes_finished_jobs(tmp_path):
+    job_queue = _queue(tmp_path)
+    queued = jobs.submit_job(job_queue, {'video_path': 'uploads/a.mp4'})
+    done = jobs.submit_job(job_queue, {'video_path': 'uploads/b.mp4'})
+    jobs.submit_job(job_queue, {'kind': 'sin video'})
+    jobs.finish_job(job_queue, done, jobs.JOB_DONE)
+    assert jobs.pending_job_videos(job_queue) == {os.path.abspath('uploads/a.mp4')}
+    jobs.cancel_job(job_queue, queued)
+    assert jobs.pending_job_videos(job_queue) == set()
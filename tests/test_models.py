@@ -0,0 +1,30 @@
+from core import models
+
+def _fake_pool(monkeypatch):
+    # Pool vacío con una carga simulada (sin pesos): registra las llamadas a load_model
+    loads = []
+    monkeypatch.setattr(models, '_MODEL_POOL', {})
+    monkeypatch.setattr(models, 'load_model', lambda path, backend, imgsz, threads, export_dir, warmup:
+                        loads.append((path, backend, threads)) or object())
+    return loads
+
+def test_pool_shares_torch_models_across_thread_counts(monkeypatch):
+    loads = _fake_pool(monkeypatch)
+    first = models.get_model('players.pt', 'torch', threads=2)
+    assert models.get_model('players.pt', 'torch', threads=8) is first # Los hilos de PyTorch son globales al proceso
+    assert models.get_model('players.pt', 'torchscript', threads=2) is not first
+    assert loads == [('players.pt', 'torch', 2), ('players.pt', 'torchscript', 2)]
+
+def test_pool_keys_onnx_models_by_thread_count(monkeypatch):
+    loads = _fake_pool(monkeypatch)
+    first = models.get_model('players.pt', 'onnx', threads=2)
+    assert models.get_model('players.pt', 'onnx', threads=2) is first
+    assert models.get_model('players.pt', 'onnx', threads=4) is not first # Hilos propios de cada sesión
+    assert len(loads) == 2 and len(models.loaded_models()) == 2
+
+def test_ball_window_needs_variable_input_size():
+    torchscript = models._SharedModel(object(), 'players.torchscript', 'torchscript', 640)
+    assert not models.supports_imgsz(torchscript, 320)
+    assert models.supports_imgsz(torchscript, 640)
+    assert models.supports_imgsz(models._SharedModel(object(), 'players.onnx', 'onnx', 640), 320) # Exportado con ejes dinámicos
+    assert models.supports_imgsz(object(), 320) # Modelo YOLO sin envolver: torch
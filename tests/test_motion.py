@@ -0,0 +1,38 @@
+import numpy as np
+from core import motion
+
+def _frame(green_cols):
+    # Frame gris con césped (verde) solo en las columnas indicadas
+    frame = np.full((120, 160, 3), 128, dtype=np.uint8)
+    frame[:, green_cols] = (40, 160, 40)
+    return frame
+
+def test_corners_use_mask_of_previous_frame(monkeypatch):
+    masks = []
+
+    def estimate(prev_gray, gray, mask=None):
+        masks.append(mask)
+        return None, None
+
+    monkeypatch.setattr(motion, 'estimate_camera_motion', estimate)
+    motion_state = motion.init_motion_state(keypoints_interval=5, motion_thresh=10.0)
+    frames = [_frame(slice(0, 80)), _frame(slice(80, 160)), _frame(slice(40, 120))]
+    for frame in frames:
+        motion.schedule_keypoints(motion_state, frame)
+
+    # Las esquinas se buscan en prev_gray: la máscara debe ser la del frame anterior
+    assert len(masks) == 2
+    np.testing.assert_array_equal(masks[0], motion.pitch_mask(frames[0]))
+    np.testing.assert_array_equal(masks[1], motion.pitch_mask(frames[1]))
+
+def test_camera_motion_follows_a_pan():
+    rng = np.random.default_rng(0)
+    texture = rng.integers(0, 255, (200, 400), dtype=np.uint8)
+    texture = np.repeat(np.repeat(texture, 4, axis=0), 4, axis=1)[:400, :800] # Textura con esquinas marcadas
+    field = np.stack([texture // 4, texture // 2 + 100, texture // 4], axis=-1).astype(np.uint8)
+    motion_state = motion.init_motion_state(keypoints_interval=100, motion_thresh=1e9)
+    motion.update_keypoints_status(motion_state, 10)
+    motion.schedule_keypoints(motion_state, field[:, :600])
+    run_keypoints, camera_motion = motion.schedule_keypoints(motion_state, field[:, 6:606]) # La cámara se mueve 6 px a la derecha
+    assert not run_keypoints
+    np.testing.assert_allclose(camera_motion[:2, 2], [-6.0, 0.0], atol=0.5)
@@ -0,0 +1,85 @@
+import json
+import time
+import pytest
+from core import profiling
+
+def _metrics():
+    # Métricas con tiempos conocidos (sin medir tiempos reales)
+    metrics = profiling.create_metrics(window=4)
+    for seconds in (0.010, 0.020, 0.030, 0.040, 0.050):
+        profiling.record_stage(metrics, 'players_inference', seconds)
+    profiling.record_stage(metrics, 'decode', 0.080, nbr_frames=4)
+    profiling.increment_counter(metrics, 'frames', 5)
+    profiling.increment_counter(metrics, 'homography_recomputed')
+    profiling.increment_counter(metrics, 'homography_reused', 4)
+    metrics['start'], metrics['end'] = 0.0, 2.0
+    metrics['peak_rss_bytes'] = 1024
+    return metrics
+
+def test_metrics_summary():
+    summary = profiling.metrics_summary(_metrics())
+    assert (summary['frames'], summary['elapsed_s'], summary['fps'], summary['peak_rss_bytes']) == (5, 2.0, 2.5, 1024)
+    assert summary['homography'] == {'recomputed': 1, 'reused': 4, 'missing': 0}
+    assert set(summary['stages']) == {'players_inference', 'decode'} # Solo etapas con llamadas
+    players = summary['stages']['players_inference']
+    assert (players['calls'], players['frames']) == (5, 5)
+    assert players['mean_ms'] == pytest.approx(30.0)
+    assert players['p50_ms'] == pytest.approx(35.0) # Percentiles de la ventana reciente (20..50 ms)
+    assert players['max_ms'] == pytest.approx(50.0)
+    decode = summary['stages']['decode']
+    assert decode['mean_ms'] == pytest.approx(20.0) and decode['max_ms'] == pytest.approx(20.0) # Por frame
+    json.dumps(summary)
+
+def test_format_prometheus():
+    text = profiling.format_prometheus(_metrics(), labels={'job': '12', 'video': 'a "b"\\c\nd'})
+    lines = text.splitlines()
+    assert text.endswith('\n')
+    labels = 'job="12",video="a \\"b\\"\\\\c\\nd"'
+    assert '# HELP football_frames_total Frames procesados.' in lines
+    assert '# TYPE football_frames_total counter' in lines
+    assert f'football_frames_total{{{labels}}} 5' in lines
+    assert f'football_processing_fps{{{labels}}} 2.5' in lines
+    assert f'football_homography_frames_total{{{labels},result="missing"}} 0' in lines
+    assert '# TYPE football_stage_frame_seconds summary' in lines
+    assert f'football_stage_frame_seconds{{{labels},stage="players_inference",quantile="0.5"}} 0.035' in lines
+    assert f'football_stage_frame_seconds_sum{{{labels},stage="players_inference"}} 0.15' in lines
+    assert f'football_stage_frame_seconds_count{{{labels},stage="decode"}} 4' in lines
+    assert f'football_stage_max_frame_seconds{{{labels},stage="players_inference"}} 0.05' in lines
+    for line in lines: # Cada serie pertenece a una métrica declarada antes con HELP y TYPE
+        if not line.startswith('#'):
+            name = line.split('{')[0]
+            declared = [l.split()[2] for l in lines[:lines.index(line)] if l.startswith('# TYPE')]
+            assert any(name in (metric, f'{metric}_sum', f'{metric}_count') for metric in declared)
+
+def test_format_prometheus_skips_missing_values():
+    metrics = profiling.create_metrics()
+    metrics['end'] = metrics['start'] # Duración cero: sin FPS
+    lines = profiling.format_prometheus(metrics, prefix='test').splitlines()
+    assert 'test_frames_total 0' in lines and '# TYPE test_processing_fps gauge' in lines
+    assert not any(line.startswith(('test_processing_fps', 'test_peak_rss_bytes', 'test_stage_')) for line in lines)
+
+def test_helpers_without_metrics_are_no_ops():
+    items = [1, 2, 3]
+    assert profiling.timed_iter(None, 'decode', items) is items
+    assert profiling.timed_callback(None, 'ui_push', print) is print
+    with profiling.stage_timer(None, 'decode'):
+        pass
+    profiling.increment_counter(None, 'frames')
+    profiling.record_stage(None, 'decode', 1.0)
+
+def test_timers_record_calls_and_frames():
+    metrics = profiling.create_metrics()
+    batches = list(profiling.timed_iter(metrics, 'decode', [[1, 2], [3], [4, 5, 6]]))
+    assert batches == [[1, 2], [3], [4, 5, 6]]
+    with profiling.stage_timer(metrics, 'annotation', nbr_frames=2):
+        time.sleep(0.01)
+    with pytest.raises(ValueError):
+        with profiling.stage_timer(metrics, 'custom_stage'): # Etapas nuevas se crean al registrarlas
+            raise ValueError
+    callback = profiling.timed_callback(metrics, 'ui_push', lambda value: value * 2)
+    assert callback(21) == 42
+
+    stages = metrics['stages']
+    assert (stages['decode']['calls'], stages['decode']['frames']) == (3, 6)
+    assert stages['annotation']['total'] >= 0.01 and stages['annotation']['frames'] == 2
+    assert stages['custom_stage']['calls'] == 1 and stages['ui_push']['calls'] == 1
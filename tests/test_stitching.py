@@ -0,0 +1,69 @@
+import numpy as np
+import pyarrow.parquet as pq
+from core import export, stitching
+
+# Trayectorias en el mapa de tres jugadores (separados de sobra para que el emparejamiento sea único)
+def _position(player, frame_nbr):
+    return [50.0 + 100 * player + 2.0 * frame_nbr, 40.0 + 30 * player]
+
+def _write_shard(path, first, last, track_ids, teams):
+    # Archivo de tracking de un tramo con IDs y equipos locales (jugador k -> track_ids[k], teams[k])
+    writer = export.open_tracking_writer(path, fps=25.0)
+    for frame_nbr in range(first, last + 1):
+        pred_dst_pts = np.array([_position(player, frame_nbr) for player in range(len(track_ids))])
+        detections = {'bboxes_p_c': np.tile([[100.0, 100.0, 20.0, 40.0]], (len(track_ids) + 1, 1)),
+                      'labels_p': [0] * len(track_ids) + [2], 'confs_p': np.full(len(track_ids) + 1, 0.9)}
+        rows = export.frame_tracking_rows(frame_nbr, detections, pred_dst_pts, np.array([5.0, 5.0]), track_ids, teams)
+        writer = export.write_tracking_rows(writer, rows)
+    export.close_tracking_writer(writer)
+
+def test_plan_shards_covers_video_with_overlap():
+    shards = stitching.plan_shards(30, 3, 4)
+    assert shards == [{'first': 1, 'output_from': 1, 'last': 10}, {'first': 7, 'output_from': 11, 'last': 20},
+                      {'first': 17, 'output_from': 21, 'last': 30}]
+    assert stitching.plan_shards(2, 5, 4) == [{'first': 1, 'output_from': 1, 'last': 1}, {'first': 1, 'output_from': 2, 'last': 2}]
+
+def test_match_overlap_tracks_uses_mean_distance_and_thresholds():
+    frames = np.repeat(np.arange(1, 7), 2)
+    rows_prev = {'frame': frames, 'track_id': np.tile([1, 2], 6), 'team': np.zeros(12, dtype=int),
+                 'map_x': np.tile([0.0, 100.0], 6), 'map_y': np.zeros(12)}
+    # En el tramo siguiente el 5 está junto al 2, el 6 junto al 1 y el 9 lejos de todos
+    rows_next = {'frame': np.repeat(np.arange(1, 7), 3), 'track_id': np.tile([5, 6, 9], 6), 'team': np.zeros(18, dtype=int),
+                 'map_x': np.tile([103.0, 2.0, 500.0], 6), 'map_y': np.zeros(18)}
+    assert stitching.match_overlap_tracks(rows_prev, rows_next) == {5: 2, 6: 1}
+    assert stitching.match_overlap_tracks(rows_prev, rows_next, max_dist=2.5) == {6: 1}
+    assert stitching.match_overlap_tracks(rows_prev, rows_next, min_frames=7) == {}
+    empty = {name: values[:0] for name, values in rows_next.items()}
+    assert stitching.match_overlap_tracks(rows_prev, empty) == {}
+
+def test_stitch_track_ids_chains_matches_across_shards():
+    id_maps = stitching.stitch_track_ids([[1, 2], [4, 3, 8], [1, 2]], [{}, {3: 1, 4: 2}, {1: 4, 2: 5}])
+    assert id_maps == [{1: 1, 2: 2}, {3: 1, 4: 2, 8: 3}, {1: 2, 2: 4}] # El 5 no existe en el tramo anterior
+
+def test_merge_tracking_files_remaps_ids_and_teams_and_drops_overlap(tmp_path):
+    shards = stitching.plan_shards(30, 2, 5)
+    paths = [str(tmp_path / f'shard_{k}.parquet') for k in range(2)]
+    _write_shard(paths[0], shards[0]['first'], shards[0]['last'], [1, 2, 3], [0, 1, 0])
+    _write_shard(paths[1], shards[1]['first'], shards[1]['last'], [7, 9, 8], [1, 0, 1]) # IDs y equipos renumerados
+
+    rows_prev = stitching.read_overlap_rows(paths[0], shards[1]['first'], shards[0]['last'])
+    rows_next = stitching.read_overlap_rows(paths[1], shards[1]['first'], shards[0]['last'])
+    assert set(np.unique(rows_prev['frame'])) == set(range(11, 16))
+    matches = stitching.match_overlap_tracks(rows_prev, rows_next)
+    assert matches == {7: 1, 9: 2, 8: 3}
+    team_map = stitching.match_overlap_teams(rows_prev, rows_next, matches, 2)
+    np.testing.assert_array_equal(team_map, [1, 0])
+
+    shard_ids = [stitching.read_track_ids(paths[0]), stitching.read_track_ids(paths[1], shards[1]['output_from'])]
+    id_maps = stitching.stitch_track_ids(shard_ids, [{}, matches])
+    merged = str(tmp_path / 'merged.parquet')
+    stitching.merge_tracking_files([{'path': paths[0], 'output_from': 1, 'id_map': id_maps[0]},
+                                    {'path': paths[1], 'output_from': shards[1]['output_from'], 'id_map': id_maps[1],
+                                     'team_map': team_map}], merged, row_group_size=7)
+
+    table = pq.read_table(merged).to_pydict()
+    assert table['frame'] == sorted(table['frame']) and set(table['frame']) == set(range(1, 31))
+    assert len(table['frame']) == 30 * 4 # Sin frames de solapamiento duplicados
+    players = [(track_id, team) for label, track_id, team in zip(table['label'], table['track_id'], table['team']) if label == 0]
+    assert sorted(set(players)) == [(1, 0), (2, 1), (3, 0)] # IDs y equipos globales en todo el video
+    assert {track_id for label, track_id in zip(table['label'], table['track_id']) if label == 2} == {-1}
@@ -0,0 +1,40 @@
+import pickle
+import numpy as np
+import pytest
+from core import tracker
+
+pytest.importorskip('ultralytics')
+from ultralytics.engine.results import Boxes
+
+FRAME = np.zeros((360, 640, 3), dtype=np.uint8)
+
+def _update(players_tracker, boxes):
+    # Detecciones de jugadores (x1, y1, x2, y2) con confianza alta
+    data = np.array([[*box, 0.9, 0] for box in boxes], dtype=np.float32).reshape(-1, 6)
+    tracks = players_tracker.update(Boxes(data, FRAME.shape[:2]), FRAME)
+    return sorted(int(track_id) for track_id in tracks[:, 4])
+
+def test_each_tracker_numbers_its_own_ids():
+    first, second = tracker.create_tracker(), tracker.create_tracker()
+    boxes = [(10, 10, 40, 80), (200, 50, 230, 120)]
+    for _ in range(3): # Intercalados, como dos trabajos en hilos distintos
+        ids_first = _update(first, boxes)
+        ids_second = _update(second, boxes + [(400, 100, 430, 170)])
+    assert ids_first == [1, 2] and ids_second == [1, 2, 3]
+
+def test_restored_tracker_continues_numbering_without_touching_others():
+    players_tracker = tracker.create_tracker()
+    for _ in range(3):
+        _update(players_tracker, [(10, 10, 40, 80)])
+    state = pickle.loads(pickle.dumps(tracker.tracker_state(players_tracker))) # Como en un checkpoint
+
+    other = tracker.create_tracker()
+    for _ in range(3):
+        assert _update(other, [(300, 10, 330, 80), (500, 10, 530, 80)]) == [1, 2]
+    restored = tracker.restore_tracker(state)
+    for _ in range(2): # Restaurar no debe rebobinar la numeración del otro tracker
+        ids = _update(other, [(300, 10, 330, 80), (500, 10, 530, 80), (100, 200, 130, 270)])
+    assert ids == [1, 2, 3]
+    for _ in range(2):
+        ids = _update(restored, [(10, 10, 40, 80), (300, 200, 330, 270)])
+    assert ids == [1, 2] # El track nuevo continúa la numeración del tracker restaurado